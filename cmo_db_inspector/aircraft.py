@@ -1,55 +1,24 @@
 
 import gradio as gr
 from .interfaces import DbPathProvider
-from .utils import connect, text_grid, tags, add_text_rows
+from .utils import connect, tags, add_text_rows, delta_updates
+from .enums import get_enum_registry
+from .raw_tab import RawTableTab
+from .relation_tags import RelationTags
+from .similarity import SimilarPanel
 
 info_map:dict[str, str] = {}
 
 
-class AircraftRawTab:
-    def __init__(self, db_path_provider: DbPathProvider, elements_per_row = 5):
-        self.db_path_provider = db_path_provider
-        self.elements_per_row = elements_per_row
-        self.name_to_component: dict[str, gr.components.Component] = {}
-
-    def build(self):
-        with connect(self.db_path_provider.get_init_db_path()) as conn:
-            cur = conn.execute("PRAGMA table_info(DataAircraft)")
-            res = cur.fetchall()
-
-        headers = [r[1] for r in res]
-        types = [r[2] for r in res]
-
-        self.name_to_component.update(text_grid(headers, self.elements_per_row, info_map))
-        """
-        for chunk in chunks(list(headers), self.elements_per_row):
-            with gr.Row():
-                for index in chunk:
-                    info = info_map.get(index, None)
-                    text = gr.Text("", label=index, info=info)
-                    self.name_to_component[index] = text
-        """
-
-        return self
-    
-    def bind(self):
-        return self
-    
-    def updates(self, data, _id):
-        _id = int(_id)
-        with connect(self.db_path_provider.get_db_path(data)) as conn:
-            cur = conn.execute("SELECT * FROM DataAircraft WHERE ID = ?", (_id,))
-            res = cur.fetchone()
-        return {component: res[idx] for idx, component in enumerate(self.name_to_component.values())}
-    
-    def register_outputs(self, outputs: set):
-        for component in self.name_to_component.values():
-            outputs.add(component)
+class AircraftRawTab(RawTableTab):
+    table_name = "DataAircraft"
+    info_map = info_map
 
 class AircraftTab:
     def __init__(self, db_path_provider: DbPathProvider):
         self.db_path_provider = db_path_provider
         self.name_to_component: dict[str, gr.components.Component] = {}
+        self.relations: dict[str, RelationTags] = {}
 
     row_name_list = [
         ["Type", "DamagePoints"],
@@ -58,11 +27,27 @@ class AircraftTab:
         ["WeightEmpty", "WeightMax"]
     ]
 
+    # Paged with LIMIT/OFFSET by `RelationTags`, so each is ordered on a stable key: `(ID, filter)` parameters, or
+    # `(ID,)` for the enum-coded ones.
     tags_command_map = {
-        "Loadouts": "SELECT Name FROM DataAircraftLoadouts INNER JOIN DataLoadout ON DataAircraftLoadouts.ComponentID = DataLoadout.ID WHERE DataAircraftLoadouts.ID = ?",
-        "Sensors": "SELECT DataSensor.Name FROM DataAircraftSensors INNER JOIN DataSensor ON ComponentID=DataSensor.ID WHERE DataAircraftSensors.ID = ?",
-        "Comms": "SELECT Name FROM DataAircraftComms INNER JOIN DataComm ON ComponentID = DataComm.ID WHERE DataAircraftComms.ID= ?",
-        "Codes": "SELECT Description FROM DataAircraftCodes INNER JOIN EnumAircraftCode ON DataAircraftCodes.CodeID=EnumAircraftCode.ID WHERE DataAircraftCodes.ID = ?"
+        "Loadouts": "SELECT Name FROM DataAircraftLoadouts INNER JOIN DataLoadout ON DataAircraftLoadouts.ComponentID = DataLoadout.ID WHERE DataAircraftLoadouts.ID = ? AND Name LIKE '%' || ? || '%' ORDER BY Name, ComponentID",
+        "Sensors": "SELECT DataSensor.Name FROM DataAircraftSensors INNER JOIN DataSensor ON ComponentID=DataSensor.ID WHERE DataAircraftSensors.ID = ? AND DataSensor.Name LIKE '%' || ? || '%' ORDER BY DataSensor.Name, ComponentID",
+        "Comms": "SELECT Name FROM DataAircraftComms INNER JOIN DataComm ON ComponentID = DataComm.ID WHERE DataAircraftComms.ID= ? AND Name LIKE '%' || ? || '%' ORDER BY Name, ComponentID",
+        "Codes": "SELECT CodeID FROM DataAircraftCodes WHERE ID = ? ORDER BY CodeID"
+    }
+
+    # Per-selection lookups of `query`, `(ID,)` parameters (the propulsion component ID for "Performances").
+    query_commands = {
+        "Aircraft": "SELECT ID, Type, Name, Comments, OperatorCountry as Country, YearCommissioned, Agility, ClimbRate, DamagePoints, Length, Span, Height, WeightEmpty, WeightMax "
+                    "FROM DataAircraft WHERE ID = ?",
+        "Signatures": "SELECT Type, Front, Side, Rear, Top FROM DataAircraftSignatures WHERE ID = ?",
+        "Propulsion": "SELECT ComponentID FROM DataAircraftPropulsion WHERE DataAircraftPropulsion.ID = ?",
+        "Performances": "SELECT AltitudeBand, Throttle, Speed, AltitudeMin, AltitudeMax, Consumption FROM DataPropulsionPerformance WHERE ID = ?"
+    }
+
+    # Tags whose query returns raw enum codes, decoded with the preloaded enum registry.
+    tags_enum_map = {
+        "Codes": "EnumAircraftCode"
     }
 
     def build(self):
@@ -88,58 +73,85 @@ class AircraftTab:
                     self.name_to_component[name] = gr.DataFrame([[]], headers=headers, label=name)
 
                 for name in ["Sensors", "Comms", "Codes", "Loadouts"]:
-                    self.name_to_component[name] = tags([], label=name)
+                    relation = RelationTags(name, self.tags_command_map[name], self.tags_enum_map.get(name)).build()
+                    self.relations[name] = relation
+                    self.name_to_component[name] = relation.checkbox_group
+
+        self.similar = SimilarPanel("Aircraft", self.db_path_provider).build()
+
+        self.selected_id = gr.State(None)
+        self.last_values = gr.State(None)
 
         return self
 
     def bind(self):
+        for relation in self.relations.values():
+            relation.bind(self.db_path_provider, self.selected_id)
+        self.similar.bind(self.selected_id)
         return self
         
+    def query(self, conn, enums, _id) -> dict:
+        """Plain values of the tab (without relations), shared by `updates` and the HTTP API."""
+        values = {}
+
+        cur = conn.execute(self.query_commands["Aircraft"], (_id,))
+        res = cur.fetchone()
+        if res is None:
+            raise KeyError(_id)
+        d = {k[0]: v for k, v in zip(cur.description, res)}
+        d["Type"] = enums["EnumAircraftType"].get(d["Type"])
+        d["Country"] = enums["EnumOperatorCountry"].get(d["Country"])
+        comments = "" if d["Comments"] == "-" else f"({d['Comments']})"
+        name = f"#{d['ID']} {d['Name']} {comments} ({d['Country']}, {d['YearCommissioned']})"
+
+        values["Name"] = name
+        for name_list in self.row_name_list:
+            for name in name_list:
+                values[name] = d[name]
+
+        cur = conn.execute(self.query_commands["Signatures"], (_id,))
+        res = cur.fetchall()
+        descriptions = enums["EnumSignatureType"].decode_list([r[0] for r in res])
+        values["Signatures"] = [[desc, *r[1:]] for desc, r in zip(descriptions, res)]
+
+        row = conn.execute(self.query_commands["Propulsion"], (_id,)).fetchone()
+        values["Performances"] = []
+        if row is not None: # Gliders, balloons, ... have no propulsion
+            cur = conn.execute(self.query_commands["Performances"], (row[0],))
+            values["Performances"] = [list(r) for r in cur.fetchall()]
+
+        return values
+
     def updates(self, data, _id):
         _id = int(_id)
 
         rd = {}
 
-        with connect(self.db_path_provider.get_db_path(data)) as conn:
-
-            cur = conn.execute(
-                "SELECT DataAircraft.ID, EnumAircraftType.Description as Type, Name, Comments, EnumOperatorCountry.Description as Country, YearCommissioned, Agility, ClimbRate, DamagePoints, Length, Span, Height, WeightEmpty, WeightMax "
-                "FROM DataAircraft INNER JOIN EnumAircraftType ON Type = EnumAircraftType.ID INNER JOIN EnumOperatorCountry ON OperatorCountry=EnumOperatorCountry.ID "
-                "WHERE DataAircraft.ID = ?",
-                (_id,))
-            res = cur.fetchone()
-            d = {k[0]: v for k, v in zip(cur.description, res)}
-            comments = "" if d["Comments"] == "-" else f"({d['Comments']})"
-            name = f"#{d['ID']} {d['Name']} {comments} ({d['Country']}, {d['YearCommissioned']})"
-
-            rd[self.name_to_component["Name"]] = name
-            for name_list in self.row_name_list:
-                for name in name_list:
-                    rd[self.name_to_component[name]] = d[name]
-
-            cur = conn.execute(
-                "SELECT Description, Front, Side, Rear, Top FROM DataAircraftSignatures INNER JOIN EnumSignatureType ON Type=EnumSignatureType.ID "
-                "WHERE DataAircraftSignatures.ID = ?",
-                (_id,))
-            rd[self.name_to_component["Signatures"]] = cur.fetchall()
-
-            cur = conn.execute("SELECT ComponentID FROM DataAircraftPropulsion WHERE DataAircraftPropulsion.ID = ?", (_id,))
-            component_id = cur.fetchone()[0]
-            cur = conn.execute(
-                "SELECT AltitudeBand, Throttle, Speed, AltitudeMin, AltitudeMax, Consumption FROM DataPropulsionPerformance "
-                "WHERE ID = ?", 
-                (component_id,))
-            rd[self.name_to_component["Performances"]] = cur.fetchall()
-
-            for name, command in self.tags_command_map.items():
-                cur = conn.execute(command, (_id,))
-                res = cur.fetchall()
-
-                rl = [r[0] for r in res]
-                rd[self.name_to_component[name]] = gr.update(value=rl, choices=rl)
+        db_path = self.db_path_provider.get_db_path(data)
+        enums = get_enum_registry(db_path)
+
+        with connect(db_path) as conn:
+            values = self.query(conn, enums, _id) # Plain values, only sent when they differ from the last selection of the session
+
+            # Relations are always sent: "More" and the filter change them on the client side.
+            for relation in self.relations.values():
+                rd.update(relation.first_page(conn, enums, _id))
+                rd[relation.filter_text] = ""
+
+        changed, last_values = delta_updates(data.get(self.last_values), values)
+        rd.update({self.name_to_component[name]: value for name, value in changed.items()})
+        rd[self.selected_id] = _id
+        rd[self.last_values] = last_values
 
         return rd
 
+    def register_inputs(self, inputs: set):
+        inputs.add(self.last_values)
+
     def register_outputs(self, outputs: set):
         for component in self.name_to_component.values():
-            outputs.add(component)
+            if not isinstance(component, gr.Button):
+                outputs.add(component)
+        for relation in self.relations.values():
+            relation.register_outputs(outputs)
+        outputs.update({self.selected_id, self.last_values})
@@ -1,13 +1,23 @@
 
+import sqlite3
+import threading
 import gradio as gr
+import numpy as np
 from pathlib import Path
 from .selector import SelectorTab
-from .sensor import SensorRawTab, RadarSearchTrack, extract_Hz_value
+from .sensor import SensorRawTab, RadarSearchTrack
+from .frequency import get_frequency_catalog
 from .aircraft import AircraftRawTab, AircraftTab
 from .utils import merge_update
 from .references import ReferencesTab
 from .insights_tab import InsightsTab
 from .radar_equation_tab import RadarEquationTab
+from .lazy_tab import LazyTab
+from .lua_generator import LuaGeneratorTab
+from .force_packages import ForcePackagesTab
+from .electronic_warfare import ElectronicWarfareTab, sensor_kind
+from .sonar import SonarTab, is_sonar
+from .sidecar import sidecar_enabled
 
 css = """
 #first-page-button, #prev-page-button, #next-page-button, #end-page-button {
@@ -37,9 +47,9 @@ class App:
         with gr.Tabs() as tabs:
             with gr.TabItem("Selector", id=0):
                 self.selector_tab = SelectorTab(self.cmo_db_root).build()
-            with gr.TabItem("Aircraft Raw", id=1):
+            with gr.TabItem("Aircraft Raw", id=1) as aircraft_raw_tab_item:
                 self.aircraft_raw_tab = AircraftRawTab(self.selector_tab).build()
-            with gr.TabItem("Sensor Raw", id=2):
+            with gr.TabItem("Sensor Raw", id=2) as sensor_raw_tab_item:
                 self.sensor_raw_tab = SensorRawTab(self.selector_tab).build()
             with gr.TabItem("Aircraft", id=3) as aircraft_tab_item:
                 self.aircraft_tab = AircraftTab(self.selector_tab).build()
@@ -52,38 +62,71 @@ class App:
             with gr.TabItem("References", id=7):
                 self.references_tab = ReferencesTab().build()
             with gr.TabItem("Lua Generator", id=8):
-                pass
+                self.lua_generator_tab = LuaGeneratorTab(self.selector_tab).build()
             with gr.TabItem("Force Packages", id=9):
-                pass
+                self.force_packages_tab = ForcePackagesTab(self.selector_tab).build()
+            with gr.TabItem("Electronic Warfare", id=10) as electronic_warfare_tab_item:
+                self.electronic_warfare_tab = ElectronicWarfareTab(self.selector_tab).build()
+            with gr.TabItem("Sonar", id=11) as sonar_tab_item:
+                self.sonar_tab = SonarTab(self.selector_tab).build()
             
         self.tabs = tabs
         self.aircraft_tab_item = aircraft_tab_item
         self.radar_search_track_tab_item = radar_search_track_tab_item
         self.radar_equation_tab_item = radar_equation_tab_item
+        self.electronic_warfare_tab_item = electronic_warfare_tab_item
+        self.sonar_tab_item = sonar_tab_item
+
+        # Raw tabs aren't shown after a selection, so they are only filled once opened.
+        self.aircraft_raw_lazy = LazyTab(self.aircraft_raw_tab, aircraft_raw_tab_item, self.selector_tab)
+        self.sensor_raw_lazy = LazyTab(self.sensor_raw_tab, sensor_raw_tab_item, self.selector_tab)
+        # A sensor selection fills the specialized tab it switches to, the other ones once opened.
+        self.radar_search_track_lazy = LazyTab(self.radar_search_track, radar_search_track_tab_item, self.selector_tab)
+        self.electronic_warfare_lazy = LazyTab(self.electronic_warfare_tab, electronic_warfare_tab_item, self.selector_tab)
+        self.sonar_lazy = LazyTab(self.sonar_tab, sonar_tab_item, self.selector_tab)
+        self.specialized_sensor_lazies = [self.radar_search_track_lazy, self.electronic_warfare_lazy, self.sonar_lazy]
 
         return self
 
     def bind(self):
         gr_df_select_output = set()
+        gr_df_select_input = set()
 
+        # A selection only fills the tab it switches to, the other tabs are deferred to `LazyTab`.
         self.aircraft_tab.register_outputs(gr_df_select_output)
-        self.aircraft_raw_tab.register_outputs(gr_df_select_output)
-        self.sensor_raw_tab.register_outputs(gr_df_select_output)
         self.radar_search_track.register_outputs(gr_df_select_output)
+        self.electronic_warfare_tab.register_outputs(gr_df_select_output)
+        self.sonar_tab.register_outputs(gr_df_select_output)
+        for lazy in [self.aircraft_raw_lazy, self.sensor_raw_lazy, *self.specialized_sensor_lazies]:
+            lazy.register_outputs(gr_df_select_output)
         
         gr_df_select_output.add(self.tabs)
+
+        self.aircraft_tab.register_inputs(gr_df_select_input)
+        self.radar_search_track.register_inputs(gr_df_select_input)
+        self.electronic_warfare_tab.register_inputs(gr_df_select_input)
+        self.sonar_tab.register_inputs(gr_df_select_input)
         
-        self.selector_tab.selected_events["Aircraft"].return_update = merge_update(self.aircraft_tab.updates, self.aircraft_raw_tab.updates, self.switch_to_aircraft_tab)
-        self.selector_tab.selected_events["Sensor"].return_update = merge_update(self.sensor_raw_tab.updates, self.radar_search_track.updates, self.switch_to_specialized_sensor_tab)
+        self.selector_tab.selected_events["Aircraft"].return_update = merge_update(self.aircraft_tab.updates, self.aircraft_raw_lazy.request, self.switch_to_aircraft_tab)
+        self.selector_tab.selected_events["Sensor"].return_update = merge_update(self.sensor_raw_lazy.request, self.select_specialized_sensor_tab)
         # self.selector_tab.selected_events["Aircraft"].return_update = merge_update(self.aircraft_tab.updates, self.aircraft_raw_tab.updates)
         # self.selector_tab.selected_events["Sensor"].return_update = merge_update(self.sensor_raw_tab.updates, self.radar_search_track.updates)
 
 
-        self.selector_tab.bind(gr_df_select_output)
-        # self.sensor_raw_tab.bind()
+        self.selector_tab.bind(gr_df_select_output, gr_df_select_input)
+        self.aircraft_tab.bind()
+        self.radar_search_track.bind()
+        self.aircraft_raw_tab.bind()
+        self.sensor_raw_tab.bind()
+        for lazy in [self.aircraft_raw_lazy, self.sensor_raw_lazy, *self.specialized_sensor_lazies]:
+            lazy.bind()
 
         self.insights_tab.bind()
         self.radar_equation.bind()
+        self.lua_generator_tab.bind()
+        self.force_packages_tab.bind()
+        self.electronic_warfare_tab.bind()
+        self.sonar_tab.bind()
 
         _input_s = ["FrequencySearchAndTrack", "RadarPeakPower", "RadarVerticalBeamwidth", "RadarHorizontalBeamwidth",
              "RadarPRF", "RadarSystemNoiseLevel", "RadarProcessingGainLoss"]
@@ -91,7 +134,7 @@ class App:
                       "pulse_repetition_frequency", "system_noise_level", "processing_gain_loss", "minimum_power"]
         self.radar_search_track.name_to_component["send_to_radar_equation"].click(
             self.send_radar_params_to_radar_equation,
-            set(self.radar_search_track.name_to_component[s] for s in _input_s),
+            set(self.radar_search_track.name_to_component[s] for s in _input_s) | self.selector_tab.get_db_inputs(),
             set(self.radar_equation.ui[s] for s in _output_s) | {self.tabs}
         )
 
@@ -106,9 +149,23 @@ class App:
     def switch_to_aircraft_tab(self, data, _id):
         return {self.tabs: gr.update(selected=self.aircraft_tab_item.id)}
 
-    def switch_to_specialized_sensor_tab(self, data, _id):
-        # TODO: Branch to ECM, FCR, ESM...
-        return {self.tabs: gr.update(selected=self.radar_search_track_tab_item.id)}
+    def specialized_sensor_lazy(self, data, _id) -> LazyTab:
+        # TODO: Branch to FCR...
+        db_path = self.selector_tab.get_db_path(data)
+        if sensor_kind(db_path, _id) != "":
+            return self.electronic_warfare_lazy
+        if is_sonar(db_path, _id):
+            return self.sonar_lazy
+        return self.radar_search_track_lazy
+
+    def select_specialized_sensor_tab(self, data, _id):
+        """Fill and switch to the specialized tab of the sensor, the other ones only record the selection."""
+        selected = self.specialized_sensor_lazy(data, _id)
+        rd = {}
+        for lazy in self.specialized_sensor_lazies:
+            rd.update(lazy.fill(data, _id) if lazy is selected else lazy.request(data, _id))
+        rd[self.tabs] = gr.update(selected=selected.tab_item.id)
+        return rd
 
     def create(self):
         with gr.Blocks(analytics_enabled=False, theme=gr.themes.Default(), css=css) as demo:
@@ -118,7 +175,44 @@ class App:
             demo.load(lambda: "", [], [self.selector_tab.class_text])
         
         self.demo = demo
+        from .query_audit import enable_index_sidecar
+        enable_index_sidecar()
+        self.selector_tab.catalog.start()
+        self.warm_up()
         return self
+
+    def serve(self, host="127.0.0.1", port=7860, api=True, concurrency=None):
+        """Run the UI, with the JSON API of `http_api` under `http_api.api_prefix` unless `api` is False. With
+        `concurrency`, events go through the Gradio queue with that many workers."""
+        if concurrency is not None:
+            self.demo.queue(concurrency_count=concurrency)
+        if not api:
+            return self.demo.launch(server_name=host, server_port=port)
+
+        import uvicorn
+        from fastapi import FastAPI
+        from .http_api import EntityApi, api_prefix
+
+        server = FastAPI()
+        server.mount(api_prefix, EntityApi(self).create()) # Before Gradio, which is mounted at the root
+        server = gr.mount_gradio_app(server, self.demo, path="/")
+        uvicorn.run(server, host=host, port=port)
+
+    def warm_up(self):
+        """Prebuild the index sidecar and expensive default views of the default DB in a background thread."""
+        db_path = self.selector_tab.get_init_db_path()
+        if db_path is not None:
+            threading.Thread(target=self.warm_up_db, args=(db_path,), daemon=True).start()
+
+    def warm_up_db(self, db_path):
+        from .query_audit import build_index_sidecar
+
+        if sidecar_enabled():
+            try:
+                build_index_sidecar(db_path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Index sidecar build failed for {db_path}: {e!r}")
+        self.insights_tab.warm_up(db_path)
     
     def send_aircraft_params_to_radar_equation(self, data):
         signatures = data[self.aircraft_tab.name_to_component["Signatures"]]
@@ -137,11 +231,12 @@ class App:
 
         # print(data)
         freq_s_l = data[src_ui["FrequencySearchAndTrack"]]
-        freq = min(extract_Hz_value(s) for s in freq_s_l)
+        catalog = get_frequency_catalog(self.selector_tab.get_db_path(data))
+        freq_l = [f for f in (catalog.centre_of(s) for s in freq_s_l) if np.isfinite(f)]
 
         return {
             dst_ui["peak_power"]: data[src_ui["RadarPeakPower"]],
-            dst_ui["frequency"]: freq,
+            dst_ui["frequency"]: min(freq_l) if len(freq_l) > 0 else gr.update(),
             # dst_ui["minimum_power"]: 1e-15,
             dst_ui["vertical_beamwidth"]: data[src_ui["RadarVerticalBeamwidth"]],
             dst_ui["horizontal_beamwidth"]: data[src_ui["RadarHorizontalBeamwidth"]],
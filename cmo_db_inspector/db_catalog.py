@@ -0,0 +1,125 @@
+
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from .db_manager import db_fingerprint, retire_db
+from .figure_cache import figure_cache
+
+# Live list of the CMO DBs in a folder. A polling thread (portable, no OS file notifier needed) notices added, replaced
+# and removed files: caches of replaced or removed versions are retired and new versions are fingerprinted and
+# pre-warmed in the background, so the first search on a new DB doesn't pay for the index builds.
+
+@dataclass(frozen=True)
+class DbFile:
+    path: Path
+    size: int
+    mtime_ns: int
+    ctime: float
+
+    @classmethod
+    def from_path(cls, path: Path) -> "DbFile":
+        st = path.stat()
+        return cls(path, st.st_size, st.st_mtime_ns, st.st_ctime)
+
+    @property
+    def version(self) -> tuple:
+        return (self.size, self.mtime_ns)
+
+
+def prewarm(db_path):
+    """Build the structures every selection needs: fingerprint (sidecar location), schema, enums, name indexes and
+    the index sidecar of the hot lookups."""
+    from .schema import get_schema
+    from .enums import get_enum_registry
+    from .search_index import get_name_index
+    from .selector import table_info_map
+    from .sidecar import sidecar_enabled
+    from .query_audit import build_index_sidecar
+
+    db_fingerprint(db_path)
+    get_schema(db_path)
+    get_enum_registry(db_path)
+    for type_name in table_info_map:
+        get_name_index(db_path, type_name)
+    if sidecar_enabled():
+        build_index_sidecar(db_path)
+
+
+class DbCatalog:
+    def __init__(self, cmo_db_root: Path, pattern="*.db3", interval=5.0, warm: Optional[Callable] = prewarm):
+        self.cmo_db_root = cmo_db_root
+        self.pattern = pattern
+        self.interval = interval # seconds
+        self.warm = warm
+        self.files: dict[str, DbFile] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-catalog") # One DB warms at a time
+        self.scan(warm=False)
+
+    def scan(self, warm=True) -> tuple[list[str], list[str], list[str]]:
+        """Compare the folder with the catalog, returns the (added, replaced, removed) file names."""
+        found = {}
+        for path in self.cmo_db_root.glob(self.pattern):
+            try:
+                found[path.name] = DbFile.from_path(path)
+            except FileNotFoundError: # Deleted between glob and stat
+                pass
+
+        with self.lock:
+            old, self.files = self.files, found
+        added = [name for name in found if name not in old]
+        replaced = [name for name in found if name in old and found[name].version != old[name].version]
+        removed = [name for name in old if name not in found]
+
+        for name in replaced + removed:
+            figure_cache.retire(retire_db(old[name].path))
+        if warm and self.warm is not None:
+            for name in added + replaced:
+                self.executor.submit(self.warm_file, found[name])
+        return added, replaced, removed
+
+    def warm_file(self, db_file: DbFile):
+        with self.lock:
+            if self.files.get(db_file.path.name) != db_file: # Replaced or removed again meanwhile
+                return
+        try:
+            self.warm(db_file.path)
+        except Exception as e: # A DB still being copied fails here and is warmed again once its size settles.
+            print(f"Warm-up of {db_file.path.name} failed: {e!r}")
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                added, replaced, removed = self.scan()
+            except OSError as e: # Folder temporarily unavailable (network drive, ...)
+                print(f"DB catalog scan failed: {e!r}")
+                continue
+            if added or replaced or removed:
+                print(f"DB catalog: added={added}, replaced={replaced}, removed={removed}")
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="db-catalog", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def names(self) -> list[str]:
+        """File names, oldest first."""
+        with self.lock:
+            return [f.path.name for f in sorted(self.files.values(), key=lambda f: f.ctime)]
+
+    def paths(self) -> list[Path]:
+        with self.lock:
+            return [f.path for f in sorted(self.files.values(), key=lambda f: f.ctime)]
+
+    def __contains__(self, name: str) -> bool:
+        with self.lock:
+            return name in self.files
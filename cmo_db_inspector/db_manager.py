@@ -1,2 +1,187 @@
 import sqlite3
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+from typing import Callable
 
+# Per-DB in-memory cache. Derived structures (enum maps, indexes, ...) are built once per DB file version
+# and dropped automatically when the file changes, since the key includes its size and mtime.
+
+def db_key(db_path) -> tuple:
+    p = Path(db_path)
+    st = p.stat()
+    return (str(p.resolve()), st.st_size, st.st_mtime_ns)
+
+_per_db_cache: dict[tuple, object] = {}
+_per_db_locks: dict[tuple, threading.Lock] = {}
+_per_db_lock = threading.Lock()
+_missing = object() # Producers may return None
+
+def per_db(func):
+    """Cache `func(db_path, *args)` in memory, keyed by the DB file version and the extra (hashable) args."""
+    @wraps(func)
+    def wrapper(db_path, *args):
+        key = (func.__module__, func.__qualname__, db_key(db_path), args)
+        # The value is read once into a local: `per_db_lru` and `retire_db` may drop the key at any time.
+        value = _per_db_cache.get(key, _missing)
+        if value is not _missing:
+            return value
+        with _per_db_lock:
+            lock = _per_db_locks.setdefault(key, threading.Lock())
+        with lock: # Concurrent requests for the same DB wait for the first build instead of repeating it.
+            value = _per_db_cache.get(key, _missing)
+            if value is _missing:
+                value = func(db_path, *args)
+                with _per_db_lock: # `retire_db` walks the cache under this lock
+                    _per_db_cache[key] = value
+        return value
+    return wrapper
+
+def per_db_lru(maxsize=8):
+    """`per_db` for producers of free-form arguments (values typed in the UI): only the `maxsize` most recently used
+    results of the producer are kept."""
+    def decorator(func):
+        cached = per_db(func)
+        recent: OrderedDict[tuple, None] = OrderedDict()
+        lock = threading.Lock()
+        @wraps(func)
+        def wrapper(db_path, *args):
+            value = cached(db_path, *args)
+            key = (func.__module__, func.__qualname__, db_key(db_path), args)
+            with lock:
+                recent[key] = None
+                recent.move_to_end(key)
+                while len(recent) > maxsize:
+                    old, _ = recent.popitem(last=False)
+                    with _per_db_lock:
+                        _per_db_cache.pop(old, None)
+                        _per_db_locks.pop(old, None)
+            return value
+        return wrapper
+    return decorator
+
+# On-disk cache location. Game DB folders are often read-only (Steam), so derived files live under the user cache dir.
+
+def cache_root() -> Path:
+    root = os.environ.get("CMO_DB_INSPECTOR_CACHE")
+    return Path(root) if root else Path.home() / ".cache" / "cmo_db_inspector"
+
+@per_db
+def db_fingerprint(db_path) -> str:
+    """Content fingerprint: size, the SQLite header (which holds the change counter and schema cookie) and sampled pages."""
+    p = Path(db_path)
+    size = p.stat().st_size
+    h = hashlib.sha1(str(size).encode())
+    with open(p, "rb") as f:
+        h.update(f.read(100))
+        block = 4096
+        for i in range(16):
+            f.seek(size * i // 16 // block * block)
+            h.update(f.read(block))
+    return h.hexdigest()[:16]
+
+def db_cache_dir(db_path) -> Path:
+    d = cache_root() / f"{Path(db_path).stem}-{db_fingerprint(db_path)}"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+def export_path(db_path, prefix: str, suffix: str, keep=20) -> Path:
+    """A new file for a download, unique per request so concurrent users don't overwrite each other's. Only the `keep`
+    most recent files of `prefix` are kept (Gradio copies a returned file to its own cache right away)."""
+    d = db_cache_dir(db_path) / "exports"
+    d.mkdir(exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=d)
+    os.close(fd)
+    old = sorted(d.glob(f"{prefix}*{suffix}"), key=lambda p: p.stat().st_mtime_ns if p.exists() else 0)
+    for p in old[:-keep]:
+        p.unlink(missing_ok=True)
+    return Path(path)
+
+# Read-only connection pool per DB file version. A replaced file gets a new `db_key`, hence a new pool; the old one is
+# retired: idle connections are closed at once and borrowed ones when they are returned, so running queries finish.
+# `connection_hooks` run on every new connection, e.g. to attach the index sidecar of `query_audit`; `refresh` makes the
+# pool reopen its connections so a hook sees a change.
+
+connection_hooks: list[Callable[[str, sqlite3.Connection], None]] = []
+
+class ConnectionPool:
+    def __init__(self, db_path, max_idle=4):
+        self.db_path = str(db_path)
+        self.uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self.max_idle = max_idle
+        self.idle: list[sqlite3.Connection] = []
+        self.lock = threading.Lock()
+        self.retired = False
+        self.generation = 0
+        self.generations: dict[int, int] = {} # id(conn) -> generation it was opened in
+
+    def acquire(self) -> sqlite3.Connection:
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+            generation = self.generation
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        for hook in connection_hooks:
+            hook(self.db_path, conn)
+        with self.lock:
+            self.generations[id(conn)] = generation
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        conn.rollback()
+        with self.lock:
+            if not self.retired and len(self.idle) < self.max_idle and self.generations.get(id(conn)) == self.generation:
+                self.idle.append(conn)
+                return
+            self.generations.pop(id(conn), None)
+        conn.close()
+
+    def refresh(self):
+        """Close idle connections, and borrowed ones once returned, so the next ones run the hooks again."""
+        with self.lock:
+            self.generation += 1
+            idle, self.idle = self.idle, []
+            for conn in idle:
+                self.generations.pop(id(conn), None)
+        for conn in idle:
+            conn.close()
+
+    def retire(self):
+        with self.lock:
+            self.retired = True
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+_pools: dict[tuple, ConnectionPool] = {}
+
+def get_pool(db_path) -> ConnectionPool:
+    key = db_key(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _per_db_lock:
+            pool = _pools.setdefault(key, ConnectionPool(db_path))
+    return pool
+
+def retire_db(db_path, keep_current=True) -> set[str]:
+    """Drop pools and `per_db` entries of older versions of `db_path` (all of them if `keep_current` is False or the
+    file is gone). Returns the fingerprints of the dropped versions, so other caches can drop theirs."""
+    path = str(Path(db_path).resolve())
+    try:
+        current = db_key(db_path) if keep_current else None
+    except FileNotFoundError:
+        current = None
+    fingerprints = set()
+    with _per_db_lock:
+        for key in [k for k in _pools if k[0] == path and k != current]:
+            _pools.pop(key).retire()
+        for key in [k for k in _per_db_cache if k[2][0] == path and k[2] != current]:
+            value = _per_db_cache.pop(key)
+            _per_db_locks.pop(key, None)
+            if key[1] == "db_fingerprint":
+                fingerprints.add(value)
+    return fingerprints
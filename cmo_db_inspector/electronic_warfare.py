@@ -0,0 +1,221 @@
+
+import numpy as np
+import pandas as pd
+import gradio as gr
+from dataclasses import dataclass
+
+from .utils import connect, inv_db, nmi, skip_updates
+from .interfaces import DbPathProvider
+from .db_manager import per_db, per_db_lru, export_path
+from .sidecar import derived
+from .schema import get_schema
+from .enums import get_enum_registry
+from .frequency import FrequencyCatalog
+from .radar_table import get_radar_table, RadarTable
+from .radar_equation import radar_horizon
+
+# ESM intercept and self-screening ECM burn-through ranges of every EW sensor against every radar, as dense
+# (sensor, radar) matrices. Radar parameters come from `RadarTable` (the `IRadar` model), so both engines see the same
+# gain, wavelength and losses as the radar equation.
+#
+# - ESM intercept (one-way): R = sqrt(P_t G_t λ² / ((4π)² S)), S the ESM sensitivity (dBm), 0 dBi receiver antenna,
+#   capped at the radar horizon between the ESM platform and the emitter.
+# - Burn-through (noise jammer on the target): S/J = P_t G_t σ B_j C_1 / (P_j G_j 4π R² B_r C_2), solved for the
+#   required S/J and capped at the unjammed detection range. B_r = 1 / pulse width, B_j from `ECMBandwidth` (MHz).
+# A sensor only affects radars whose frequency falls in its band envelope; a sensor without known bands covers all.
+
+esm_columns = ["ID", "Name", "ESMSensitivity"]
+ecm_columns = ["ID", "Name", "ECMGain", "ECMPeakPower", "ECMBandwidth"]
+
+def sensor_type_ids(db_path, description: str) -> list[int]:
+    enum = get_enum_registry(db_path)["EnumSensorType"]
+    return [code for code, desc in zip(enum.ids.tolist(), enum.descriptions.tolist()) if str(desc) == description]
+
+def read_sensors(db_path, columns: list[str], type_description: str) -> pd.DataFrame:
+    """EW sensors of one `EnumSensorType`, empty if the DB lacks any of the columns the engine needs."""
+    available = get_schema(db_path).project("DataSensor", columns)
+    types = sensor_type_ids(db_path, type_description)
+    if available != columns or len(types) == 0:
+        return pd.DataFrame(columns=columns)
+    with connect(db_path) as conn:
+        res = conn.execute(
+            f"SELECT {', '.join(columns)} FROM DataSensor WHERE Type IN ({', '.join('?' * len(types))}) ORDER BY ID", types).fetchall()
+    df = pd.DataFrame(res, columns=columns)
+    df["ID"] = df["ID"].astype(np.int64)
+    return df
+
+@per_db
+@derived()
+def get_ew_bands(db_path) -> FrequencyCatalog:
+    """Band envelopes of the EW sensors, from `DataSensorFrequency` when the DB has it."""
+    table_name = "DataSensorFrequency" if "DataSensorFrequency" in get_schema(db_path) else "DataSensorFrequencySearchAndTrack"
+    enum_table = get_enum_registry(db_path)["EnumSensorFrequency"]
+    with connect(db_path) as conn:
+        sensor_frequency = pd.DataFrame(conn.execute(f"SELECT ID, Frequency FROM {table_name}").fetchall(), columns=["ID", "Frequency"])
+    return FrequencyCatalog(enum_table.ids, enum_table.descriptions, sensor_frequency)
+
+def coverage(db_path, sensor_ids: np.ndarray, radars: RadarTable) -> np.ndarray:
+    """(n_sensor, n_radar) mask of radars inside the band envelope of each sensor."""
+    bands = get_ew_bands(db_path)
+    lower = bands.sensor_frequencies(sensor_ids, "lower_min").reshape(-1, 1)
+    upper = bands.sensor_frequencies(sensor_ids, "upper_max").reshape(-1, 1)
+    f = radars.frequency.T # (1, n_radar)
+    return np.isnan(lower) | ((lower <= f) & (f <= upper))
+
+
+@dataclass
+class EwMatrix:
+    """Ranges (m) of sensors (rows) against radars (columns)."""
+    sensor_ids: np.ndarray
+    sensor_names: list[str]
+    radar_ids: np.ndarray
+    radar_names: list[str]
+    ranges: np.ndarray # float32 (n_sensor, n_radar)
+    covered: np.ndarray # bool (n_sensor, n_radar)
+
+    def row(self, sensor_id) -> int:
+        pos = np.flatnonzero(self.sensor_ids == int(sensor_id))
+        return int(pos[0]) if len(pos) else -1
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(np.round(self.ranges.astype(np.float64) / 1000 / nmi, 1), index=self.sensor_ids, columns=self.radar_ids)
+        df.index.name = "Sensor ID \\ Radar ID"
+        return df
+
+
+# The matrices take a few tens of ms and depend on typed values, so only the last few are kept, in memory.
+
+@per_db_lru()
+def get_intercept_matrix(db_path, esm_altitude: float = 10000, emitter_altitude: float = 10) -> EwMatrix:
+    esm = read_sensors(db_path, esm_columns, "ESM")
+    radars = get_radar_table(db_path)
+    sensitivity_w = inv_db(esm["ESMSensitivity"].to_numpy(dtype=np.float64) - 30).reshape(-1, 1) # dBm -> W
+    P_t, G_t, lam = radars.peak_power.T, radars.gain.T, radars.wavelength.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ranges = np.sqrt(P_t * G_t * lam ** 2 / ((4 * np.pi) ** 2 * sensitivity_w))
+    covered = coverage(db_path, esm["ID"].to_numpy(), radars)
+    ranges = np.where(covered & np.isfinite(ranges), np.minimum(ranges, radar_horizon(esm_altitude, emitter_altitude)), 0.0)
+    return EwMatrix(esm["ID"].to_numpy(), esm["Name"].tolist(), radars.df["ID"].to_numpy(dtype=np.int64), radars.df["Name"].tolist(),
+                    ranges.astype(np.float32), covered)
+
+@per_db_lru()
+def get_burn_through_matrix(db_path, dbsm: float, required_sj_db: float) -> EwMatrix:
+    ecm = read_sensors(db_path, ecm_columns, "ECM")
+    radars = get_radar_table(db_path)
+    sigma = inv_db(dbsm)
+    P_j = ecm["ECMPeakPower"].to_numpy(dtype=np.float64).reshape(-1, 1)
+    G_j = inv_db(ecm["ECMGain"].to_numpy(dtype=np.float64)).reshape(-1, 1)
+    B_j = ecm["ECMBandwidth"].to_numpy(dtype=np.float64).reshape(-1, 1) * 1e6
+    pulse_width_s = radars.column("RadarPulseWidth").T * 1e-6
+    B_r = np.where(pulse_width_s > 0, 1 / np.where(pulse_width_s > 0, pulse_width_s, 1), B_j) # Unknown: matched to the jammer
+    bandwidth_ratio = np.maximum(np.where(B_j > 0, B_j, B_r) / B_r, 1) # A jammer narrower than the receiver puts all its power in
+    losses = inv_db(radars.processing_gain_loss.T) / inv_db(radars.system_noise_level.T)
+
+    unjammed = radars.detection_range(sigma).T # (1, n_radar)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        burn_through = np.sqrt(radars.peak_power.T * radars.gain.T * sigma * bandwidth_ratio * losses /
+                               (P_j * G_j * 4 * np.pi * inv_db(required_sj_db)))
+    covered = coverage(db_path, ecm["ID"].to_numpy(), radars) & (P_j > 0)
+    ranges = np.where(covered & np.isfinite(burn_through), np.minimum(burn_through, unjammed), unjammed)
+    return EwMatrix(ecm["ID"].to_numpy(), ecm["Name"].tolist(), radars.df["ID"].to_numpy(dtype=np.int64), radars.df["Name"].tolist(),
+                    ranges.astype(np.float32), covered)
+
+@per_db
+def get_ew_kinds(db_path) -> dict[int, str]:
+    kinds = {}
+    for kind, columns in [("ESM", esm_columns), ("ECM", ecm_columns)]: # Sensors the engines can evaluate
+        kinds.update({_id: kind for _id in read_sensors(db_path, columns, kind)["ID"].tolist()})
+    return kinds
+
+def sensor_kind(db_path, _id) -> str:
+    """"ESM", "ECM" or "" for sensors the EW engines don't model."""
+    return get_ew_kinds(db_path).get(int(_id), "")
+
+
+class ElectronicWarfareTab:
+    def __init__(self, db_path_provider: DbPathProvider, limit=200):
+        self.db_path_provider = db_path_provider
+        self.limit = limit
+        self.name_to_component: dict[str, gr.components.Component] = {}
+
+    def build(self):
+        ui = self.name_to_component
+        with gr.Row():
+            with gr.Column(scale=1):
+                ui["Name"] = gr.Text("", show_label=False)
+                ui["Kind"] = gr.Text("", label="Kind")
+                ui["esm_altitude"] = gr.Number(10000, label="ESM Platform Altitude (m, ESM)")
+                ui["emitter_altitude"] = gr.Number(10, label="Emitter Altitude (m, ESM)")
+                ui["dbsm"] = gr.Number(0, label="Jammer Platform RCS (dBsm, ECM)")
+                ui["required_sj_db"] = gr.Number(0, label="Required S/J (dB, ECM)")
+                ui["update"] = gr.Button("Update")
+                ui["export"] = gr.Button("Export Matrix (CSV)")
+                ui["matrix_file"] = gr.File(label="Sensor vs Radar Matrix (nmi)")
+            with gr.Column(scale=4):
+                ui["summary"] = gr.Markdown("")
+                ui["radars"] = gr.DataFrame([[]], label="Radars", interactive=False)
+        self.selected_id = gr.State(None)
+        return self
+
+    def bind(self):
+        ui = self.name_to_component
+        inputs = self.db_path_provider.get_db_inputs() | {self.selected_id, ui["esm_altitude"], ui["emitter_altitude"], ui["dbsm"], ui["required_sj_db"]}
+        ui["update"].click(lambda data: self.updates(data, data[self.selected_id]), inputs, {ui["Name"], ui["Kind"], ui["summary"], ui["radars"], self.selected_id})
+        ui["export"].click(self.export, inputs, ui["matrix_file"])
+        return self
+
+    def matrix(self, db_path, kind, data) -> EwMatrix:
+        ui = self.name_to_component
+        if kind == "ESM":
+            return get_intercept_matrix(db_path, float(data[ui["esm_altitude"]]), float(data[ui["emitter_altitude"]]))
+        return get_burn_through_matrix(db_path, float(data[ui["dbsm"]]), float(data[ui["required_sj_db"]]))
+
+    def updates(self, data, _id):
+        ui = self.name_to_component
+        if _id is None:
+            return skip_updates([ui["radars"]])
+        db_path = self.db_path_provider.get_db_path(data)
+        kind = sensor_kind(db_path, _id)
+        if kind == "":
+            return {self.selected_id: None}
+
+        m = self.matrix(db_path, kind, data)
+        i = m.row(_id)
+        ranges_nmi = m.ranges[i].astype(np.float64) / 1000 / nmi
+        column = "Intercept Range (nmi)" if kind == "ESM" else "Burn-Through Range (nmi)"
+        df = pd.DataFrame({"ID": m.radar_ids, "Name": m.radar_names, column: np.round(ranges_nmi, 1), "In Band": m.covered[i]})
+        if kind == "ECM":
+            unjammed = get_radar_table(db_path).detection_ranges([float(data[ui["dbsm"]])])[:, 0] / 1000 / nmi
+            df.insert(2, "Unjammed (nmi)", np.round(unjammed, 1))
+        df = df.sort_values(column, ascending=False).head(self.limit)
+
+        covered = int(m.covered[i].sum())
+        summary = f"{covered} of {len(m.radar_ids)} radars in band. "
+        if kind == "ESM":
+            summary += f"Median intercept range of those: {np.median(ranges_nmi[m.covered[i]]) if covered else 0:.1f} nmi."
+        else:
+            summary += "Radars burn through at the listed range, a jammer out of band leaves the unjammed range."
+        return {
+            ui["Name"]: f"#{int(_id)} {m.sensor_names[i]}",
+            ui["Kind"]: kind,
+            ui["summary"]: summary,
+            ui["radars"]: df,
+            self.selected_id: int(_id)
+        }
+
+    def export(self, data):
+        db_path = self.db_path_provider.get_db_path(data)
+        kind = sensor_kind(db_path, data[self.selected_id]) if data[self.selected_id] is not None else ""
+        if kind == "":
+            raise gr.Error("Select an ESM or ECM sensor first, the matrix of its kind is exported")
+        m = self.matrix(db_path, kind, data)
+        path = export_path(db_path, f"{kind.lower()}_matrix_", ".csv")
+        m.to_frame().to_csv(path)
+        return str(path)
+
+    def register_inputs(self, inputs: set):
+        inputs.update({self.name_to_component[name] for name in ["esm_altitude", "emitter_altitude", "dbsm", "required_sj_db"]})
+
+    def register_outputs(self, outputs: set):
+        ui = self.name_to_component
+        outputs.update({ui["Name"], ui["Kind"], ui["summary"], ui["radars"], self.selected_id})
@@ -0,0 +1,81 @@
+
+import sqlite3
+import numpy as np
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+
+class EnumTable:
+    """An `Enum*` table (ID -> Description) held as sorted arrays for vectorized decoding."""
+    def __init__(self, name: str, ids, descriptions):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self.name = name
+        self.ids = ids[order]
+        self.descriptions = np.asarray(descriptions, dtype=object)[order]
+        self.description_map = dict(zip(self.ids.tolist(), self.descriptions.tolist()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, code):
+        return self.description_map[int(code)]
+
+    def get(self, code, default=""):
+        try:
+            return self.description_map.get(int(code), default)
+        except (TypeError, ValueError): # None / NaN
+            return default
+
+    def positions(self, codes):
+        """Positions of `codes` in `ids`, -1 for unknown (or missing) codes."""
+        codes = np.asarray(codes, dtype=np.float64)
+        if len(self.ids) == 0:
+            return np.full(codes.shape, -1)
+        idx = np.clip(np.searchsorted(self.ids, codes), 0, len(self.ids) - 1)
+        return np.where(self.ids[idx] == codes, idx, -1)
+
+    def decode(self, codes, default=""):
+        idx = self.positions(codes)
+        out = np.full(idx.shape, default, dtype=object)
+        found = idx >= 0
+        out[found] = self.descriptions[idx[found]]
+        return out
+
+    def decode_list(self, codes, default="") -> list:
+        return self.decode(codes, default).tolist()
+
+    def remap(self, mapping: dict, default):
+        """Precompute a coarser enum (e.g. country -> major power group) sharing the same IDs."""
+        descriptions = [mapping.get(d, default) for d in self.descriptions]
+        return EnumTable(self.name, self.ids, descriptions)
+
+
+class EnumRegistry:
+    def __init__(self, tables: dict[str, EnumTable]):
+        self.tables = tables
+
+    def __getitem__(self, name) -> EnumTable:
+        return self.tables[name]
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def __iter__(self):
+        return iter(self.tables)
+
+
+@per_db
+@derived()
+def get_enum_registry(db_path) -> EnumRegistry:
+    tables = {}
+    with connect(db_path) as conn:
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'Enum%'")]
+        for name in names:
+            try:
+                res = conn.execute(f"SELECT ID, Description FROM {name}").fetchall()
+            except sqlite3.OperationalError: # Not an ID -> Description table
+                continue
+            tables[name] = EnumTable(name, [r[0] for r in res], [r[1] for r in res])
+    return EnumRegistry(tables)
@@ -0,0 +1,86 @@
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .db_manager import db_fingerprint
+
+class SerializedFigure:
+    """A Plotly figure already encoded as JSON. `gr.Plot` only calls `to_json()`, so it is sent as is."""
+    def __init__(self, json_str: str):
+        self.json_str = json_str
+
+    def to_json(self) -> str:
+        return self.json_str
+
+    def __len__(self):
+        return len(self.json_str)
+
+
+class FigureCache:
+    """LRU of serialized figures keyed by (DB fingerprint, plot kind, parameters), bounded by total JSON size.
+
+    Concurrent requests for a missing key wait for the first build instead of repeating it.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: OrderedDict[tuple, SerializedFigure] = OrderedDict()
+        self.lock = threading.Lock()
+        self.build_locks: dict[tuple, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(db_path: Optional[str], kind: str, params: tuple) -> tuple:
+        return (None if db_path is None else db_fingerprint(db_path), kind, params)
+
+    def lookup(self, key) -> Optional[SerializedFigure]:
+        with self.lock:
+            fig = self.entries.get(key)
+            if fig is not None:
+                self.entries.move_to_end(key)
+            return fig
+
+    def store(self, key, fig: SerializedFigure):
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = fig
+            self.size += len(fig)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get(self, db_path: Optional[str], kind: str, params: tuple, build: Callable) -> SerializedFigure:
+        """Cached figure, `build()` (returning a Plotly figure) is only called on a miss."""
+        key = self.make_key(db_path, kind, params)
+        fig = self.lookup(key)
+        if fig is not None:
+            self.hits += 1
+            return fig
+        with self.lock:
+            build_lock = self.build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            fig = self.lookup(key)
+            if fig is None:
+                self.misses += 1
+                fig = SerializedFigure(build().to_json())
+                self.store(key, fig)
+        with self.lock:
+            self.build_locks.pop(key, None)
+        return fig
+
+    def retire(self, fingerprints: set[str]):
+        """Drop the figures of replaced DB versions."""
+        with self.lock:
+            for key in [k for k in self.entries if k[0] in fingerprints]:
+                self.size -= len(self.entries.pop(key))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+figure_cache = FigureCache()
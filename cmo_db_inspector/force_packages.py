@@ -0,0 +1,267 @@
+
+import heapq
+import math
+import multiprocessing
+import os
+import threading
+import numpy as np
+import pandas as pd
+import gradio as gr
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from .utils import connect, nmi
+from .interfaces import DbPathProvider
+from .db_manager import per_db
+from .sidecar import derived
+from .performance import get_performance_table
+from .loadouts import get_aircraft_loadouts
+from .radar_table import get_radar_table, get_signature_table
+from .missile_kp import MissileHitProbilityCalculator, AircraftTarget, Environment, GuidanceMode
+
+@dataclass
+class ReferenceMissile:
+    # A `missile_kp.Missile` standing for the threat of the mission area.
+    PoH: float = 0.7
+    max_target_speed: float = 1500
+    is_rocket_booster_or_no_power: bool = False
+    has_capable_vs_seaskimmer: bool = True
+    range_max: float = 50
+    guidance_mode: GuidanceMode = GuidanceMode.Radar
+
+@dataclass
+class Mission:
+    radar_ids: list[int] = field(default_factory=list) # Threat radars, empty: no exposure term
+    payload_kg: float = 4000 # Total payload the package has to carry
+    radius_nmi: float = 300 # hi-lo-hi radius every member must reach with its loadout
+    max_aircraft: int = 12
+    max_types: int = 3 # Distinct aircraft/loadout combinations
+    exposure_weight: float = 1.0
+    survivability_weight: float = 1.0
+    missile: ReferenceMissile = field(default_factory=ReferenceMissile)
+
+
+@per_db
+@derived()
+def get_candidate_table(db_path) -> pd.DataFrame:
+    """Every (aircraft, loadout) pair with payload, hi-lo-hi radius at that payload and the agility modifier of
+    `missile_kp` (side attack), computed as whole-fleet arrays."""
+    table = get_performance_table(db_path)
+    pairs = get_aircraft_loadouts(db_path)
+    pairs = pairs[pairs["Weight"] > 0]
+    row = pd.Index(table.ids).get_indexer(pairs["AircraftID"])
+    pairs, row = pairs[row >= 0].reset_index(drop=True), row[row >= 0]
+    slot = pairs.groupby("AircraftID").cumcount().to_numpy()
+    payload = pairs["Weight"].to_numpy(dtype=np.float64)
+
+    # One payload column per loadout slot, so `compute` evaluates each aircraft with each of its loadouts.
+    grid = np.full((len(table), slot.max() + 1 if len(slot) else 1), np.nan)
+    grid[row, slot] = payload
+    radius = table.compute(grid)["Radius hi-lo-hi (nmi)"][row, slot]
+
+    with connect(db_path) as conn:
+        agility = pd.Series(dict(conn.execute("SELECT ID, Agility FROM DataAircraft").fetchall()), dtype=np.float64)
+    weight_empty = table.column("WeightEmpty")[row]
+    weight_max = table.column("WeightMax")[row]
+    fuel = np.clip(np.minimum(table.column("Fuel")[row], weight_max - weight_empty - payload), 0, None)
+    target = AircraftTarget(agility=agility.reindex(pairs["AircraftID"]).fillna(0).to_numpy(), weight_empty=weight_empty,
+                            weight_payload=payload, weight_fuel=fuel, weight_max=weight_max)
+    calc = MissileHitProbilityCalculator(ReferenceMissile(), target, Environment(bearing=90, distance=0, on_sea=False))
+
+    return pd.DataFrame({
+        "AircraftID": pairs["AircraftID"],
+        "LoadoutID": pairs["LoadoutID"],
+        "Aircraft": table.aircraft["Name"].to_numpy()[row],
+        "Loadout": pairs["Name"],
+        "Payload (kg)": payload,
+        "Radius (nmi)": radius,
+        "Agility Mod": calc.agility_mod
+    })
+
+@per_db
+def get_radar_detection_nmi(db_path, radar_id: int) -> np.ndarray:
+    """Frontal detection range (nmi) of one radar against every aircraft of `get_signature_table`, 0 if it isn't a
+    radar. Cached per radar, so the cache is bounded by the DB whatever radar sets the missions pick."""
+    signatures = get_signature_table(db_path)
+    radars = get_radar_table(db_path).subset([radar_id])
+    if len(radars) == 0:
+        return np.zeros(len(signatures.ids))
+    ranges = radars.target_detection_ranges(signatures)[0] / 1000 / nmi
+    return np.nan_to_num(ranges, nan=0.0)
+
+def get_detection_nmi(db_path, radar_ids: tuple) -> pd.Series:
+    """Longest frontal detection range (nmi) of any of `radar_ids` against every aircraft, indexed by aircraft ID."""
+    ids = get_signature_table(db_path).ids
+    ranges = [get_radar_detection_nmi(db_path, int(radar_id)) for radar_id in dict.fromkeys(radar_ids)]
+    return pd.Series(np.max(ranges, axis=0) if ranges else 0.0, index=ids)
+
+
+def score_candidates(candidates: pd.DataFrame, detection_nmi: pd.Series, mission: Mission) -> pd.DataFrame:
+    """Feasible candidates with their per-aircraft cost, keeping only the payload/cost Pareto front."""
+    df = candidates[candidates["Radius (nmi)"] >= mission.radius_nmi].copy()
+    df["Detection (nmi)"] = detection_nmi.reindex(df["AircraftID"]).fillna(0).to_numpy()
+    poh = np.clip(mission.missile.PoH, 0, 1)
+    df["Hit Probability"] = np.clip(poh + df["Agility Mod"], 0, 1)
+    exposure = df["Detection (nmi)"] / max(df["Detection (nmi)"].max(), 1e-9) if len(df) else 0.0
+    df["Cost"] = 1 + mission.exposure_weight * exposure + mission.survivability_weight * df["Hit Probability"]
+
+    # A candidate with less payload and no lower cost than another is never needed: swapping it can only help.
+    df = df.sort_values(["Cost", "Payload (kg)"], ascending=[True, False], kind="stable")
+    payload = df["Payload (kg)"].to_numpy()
+    best_before = np.maximum.accumulate(np.append(-np.inf, payload[:-1]))
+    return df[payload > best_before].reset_index(drop=True)
+
+
+def search_branch(cost: np.ndarray, payload: np.ndarray, required: float, max_aircraft: int, max_types: int,
+                  first: int, top_k: int, max_nodes=200_000) -> tuple[list[tuple[float, tuple]], bool]:
+    """Branch and bound over packages whose first (lowest position) member is `first`.
+
+    Candidates must be sorted by cost per kg, so `cost[i] / payload[i]` bounds the cost of the payload still missing.
+    Returns the `top_k` best `(total cost, ((position, count), ...))` and whether the node budget ran out.
+    """
+    n = len(cost)
+    ratio = cost / payload
+    max_payload_suffix = np.maximum.accumulate(payload[::-1])[::-1]
+    min_cost_suffix = np.minimum.accumulate(cost[::-1])[::-1]
+    best = [] # Max-heap on cost through negation
+    nodes = 0
+
+    def threshold():
+        return -best[0][0] if len(best) >= top_k else math.inf
+
+    def visit(i, remaining, n_left, types_left, total, chosen):
+        nonlocal nodes
+        nodes += 1
+        if remaining <= 0:
+            if total < threshold():
+                heapq.heappush(best, (-total, tuple(chosen)))
+                if len(best) > top_k:
+                    heapq.heappop(best)
+            return
+        if i >= n or n_left == 0 or types_left == 0 or nodes > max_nodes:
+            return
+        bound = total + max(remaining * ratio[i], math.ceil(remaining / max_payload_suffix[i]) * min_cost_suffix[i])
+        if bound >= threshold():
+            return
+        for c in range(min(n_left, math.ceil(remaining / payload[i])), 0, -1):
+            chosen.append((i, c))
+            visit(i + 1, remaining - c * payload[i], n_left - c, types_left - 1, total + c * cost[i], chosen)
+            chosen.pop()
+        visit(i + 1, remaining, n_left, types_left, total, chosen)
+
+    for c in range(min(max_aircraft, math.ceil(required / payload[first])), 0, -1):
+        visit(first + 1, required - c * payload[first], max_aircraft - c, max_types - 1, c * cost[first], [(first, c)])
+    return sorted((-neg, chosen) for neg, chosen in best), nodes > max_nodes
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the Gradio server is threaded and a fork would copy locks held by other threads.
+            _pool = ProcessPoolExecutor(max_workers=max(1, min(8, (os.cpu_count() or 1) - 1)),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def optimize(scored: pd.DataFrame, mission: Mission, top_k=10, parallel=True) -> tuple[pd.DataFrame, bool]:
+    """Best packages for `mission` out of `scored` candidates, one branch and bound root per candidate."""
+    df = scored.assign(_ratio=scored["Cost"] / scored["Payload (kg)"]).sort_values("_ratio", kind="stable").reset_index(drop=True)
+    cost = df["Cost"].to_numpy(dtype=np.float64)
+    payload = df["Payload (kg)"].to_numpy(dtype=np.float64)
+    args = [(cost, payload, mission.payload_kg, mission.max_aircraft, mission.max_types, first, top_k) for first in range(len(df))]
+
+    if parallel and len(args) > 8:
+        results = list(get_pool().map(search_branch, *zip(*args), chunksize=max(1, len(args) // 32)))
+    else:
+        results = [search_branch(*a) for a in args]
+
+    packages = heapq.nsmallest(top_k, (p for branch, _ in results for p in branch))
+    truncated = any(t for _, t in results)
+
+    rows = []
+    for rank, (total, chosen) in enumerate(packages, 1):
+        members = df.iloc[[i for i, _ in chosen]]
+        counts = np.array([c for _, c in chosen])
+        rows.append({
+            "Rank": rank,
+            "Cost": round(total, 3),
+            "Aircraft": int(counts.sum()),
+            "Payload (kg)": round(float((members["Payload (kg)"].to_numpy() * counts).sum())),
+            "Max Detection (nmi)": round(float(members["Detection (nmi)"].max()), 1),
+            "Mean Hit Probability": round(float((members["Hit Probability"].to_numpy() * counts).sum() / counts.sum()), 3),
+            "Composition": "; ".join(f"{c}x {a} ({l})" for c, a, l in zip(counts, members["Aircraft"], members["Loadout"]))
+        })
+    return pd.DataFrame(rows, columns=["Rank", "Cost", "Aircraft", "Payload (kg)", "Max Detection (nmi)",
+                                       "Mean Hit Probability", "Composition"]), truncated
+
+
+class ForcePackagesTab:
+    def __init__(self, db_path_provider: DbPathProvider):
+        self.db_path_provider = db_path_provider
+        self.name_to_component: dict[str, gr.components.Component] = {}
+
+    def build(self):
+        ui = self.name_to_component
+        with gr.Row():
+            with gr.Column(scale=1):
+                with gr.Accordion("Mission"):
+                    ui["radars"] = gr.Text("", label="Threat Radars", placeholder="Sensor IDs or name fragments, comma separated")
+                    ui["payload_kg"] = gr.Number(4000, label="Required Payload (kg)")
+                    ui["radius_nmi"] = gr.Number(300, label="Radius hi-lo-hi (nmi)")
+                    with gr.Row():
+                        ui["max_aircraft"] = gr.Number(12, label="Max Aircraft", precision=0)
+                        ui["max_types"] = gr.Number(3, label="Max Types", precision=0)
+                with gr.Accordion("Scoring", open=False):
+                    ui["exposure_weight"] = gr.Slider(0, 5, value=1, label="Detection Exposure Weight")
+                    ui["survivability_weight"] = gr.Slider(0, 5, value=1, label="Hit Probability Weight")
+                    ui["poh"] = gr.Slider(0, 1, value=0.7, label="Threat Missile PoH")
+                    ui["top_k"] = gr.Number(10, label="Packages", precision=0)
+                ui["optimize"] = gr.Button("Optimize")
+            with gr.Column(scale=4):
+                ui["summary"] = gr.Markdown("")
+                ui["packages"] = gr.DataFrame([[]], label="Packages", interactive=False)
+                ui["candidates"] = gr.DataFrame([[]], label="Candidates (Pareto front)", interactive=False)
+        return self
+
+    def bind(self):
+        ui = self.name_to_component
+        inputs = self.db_path_provider.get_db_inputs() | {ui[name] for name in [
+            "radars", "payload_kg", "radius_nmi", "max_aircraft", "max_types", "exposure_weight", "survivability_weight", "poh", "top_k"]}
+        ui["optimize"].click(self.optimize, inputs, {ui["summary"], ui["packages"], ui["candidates"]})
+        return self
+
+    @staticmethod
+    def resolve_radars(db_path, text: str) -> list[int]:
+        radars = get_radar_table(db_path).df
+        ids = set()
+        for token in (t.strip() for t in text.split(",")):
+            if token.isdigit():
+                ids.add(int(token))
+            elif token != "":
+                ids.update(radars.loc[radars["Name"].str.contains(token, case=False, regex=False), "ID"].tolist())
+        return sorted(ids)
+
+    def optimize(self, data):
+        ui = self.name_to_component
+        db_path = self.db_path_provider.get_db_path(data)
+        mission = Mission(
+            radar_ids=self.resolve_radars(db_path, data[ui["radars"]]),
+            payload_kg=float(data[ui["payload_kg"]]), radius_nmi=float(data[ui["radius_nmi"]]),
+            max_aircraft=max(1, int(data[ui["max_aircraft"]])), max_types=max(1, int(data[ui["max_types"]])),
+            exposure_weight=float(data[ui["exposure_weight"]]), survivability_weight=float(data[ui["survivability_weight"]]),
+            missile=ReferenceMissile(PoH=float(data[ui["poh"]])))
+
+        scored = score_candidates(get_candidate_table(db_path), get_detection_nmi(db_path, tuple(mission.radar_ids)), mission)
+        packages, truncated = optimize(scored, mission, top_k=max(1, int(data[ui["top_k"]])))
+
+        summary = f"{len(mission.radar_ids)} threat radars, {len(scored)} candidates on the Pareto front, {len(packages)} packages found."
+        if truncated:
+            summary += " Some branches hit the node budget, results may not be optimal."
+        return {
+            ui["summary"]: summary,
+            ui["packages"]: packages,
+            ui["candidates"]: scored.drop(columns=["Agility Mod"]).round(3)
+        }
@@ -0,0 +1,87 @@
+
+import re
+import numpy as np
+import pandas as pd
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+from .enums import get_enum_registry
+
+unit_map = {"":1, "K":1_000, "M": 1_000_000, "G": 1_000_000_000, "T": 1_000_000_000_000, "P":1_000_000_000_000_000}
+hz_map = {
+    "Visual Light": 300e12,
+    "Near IR (0.75-8 µm)": 30e12,
+    "Far IR (8-1000 µm)": 3e12,
+    "Laser": 300e9
+}
+
+band_pattern = re.compile(r"(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*(K|M|G|T|P)?Hz")
+
+def parse_band(s: str):
+    """Return `(lower, upper)` in Hz for an `EnumSensorFrequency.Description`, or `None` if it can't be parsed."""
+    if s in hz_map:
+        return hz_map[s], hz_map[s]
+    m = band_pattern.search(s or "")
+    if m is None:
+        return None
+    left, right, unit = m.groups()
+    scale = unit_map[unit or ""]
+    return float(left) * scale, float(right) * scale
+
+
+class FrequencyCatalog:
+    """Every `EnumSensorFrequency` row parsed once into lower/upper/centre Hz arrays, plus a per-sensor min/max index."""
+    def __init__(self, ids, descriptions, sensor_frequency: pd.DataFrame):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.descriptions = list(descriptions)
+
+        bands = [parse_band(s) for s in self.descriptions]
+        self.lower = np.array([np.nan if b is None else b[0] for b in bands])
+        self.upper = np.array([np.nan if b is None else b[1] for b in bands])
+        self.centre = (self.lower + self.upper) / 2
+        self.unparsed = [(_id, s) for _id, s, b in zip(self.ids.tolist(), self.descriptions, bands) if b is None]
+
+        self.centre_map = dict(zip(self.descriptions, self.centre.tolist()))
+        self.id_to_pos = pd.Series(np.arange(len(self.ids)), index=self.ids)
+
+        # sensor_frequency: (ID, Frequency) rows of DataSensorFrequencySearchAndTrack
+        pos = self.id_to_pos.reindex(sensor_frequency["Frequency"].to_numpy()).to_numpy()
+        valid = ~np.isnan(pos)
+        pos = pos[valid].astype(np.int64)
+        df = pd.DataFrame({
+            "ID": sensor_frequency["ID"].to_numpy()[valid],
+            "lower": self.lower[pos],
+            "upper": self.upper[pos],
+            "centre": self.centre[pos]
+        })
+        g = df.groupby("ID")
+        self.sensor_index = pd.DataFrame({
+            "lower_min": g["lower"].min(),
+            "upper_max": g["upper"].max(),
+            "centre_min": g["centre"].min(),
+            "centre_max": g["centre"].max()
+        })
+
+    def centre_of(self, description: str) -> float:
+        return self.centre_map.get(description, np.nan)
+
+    def sensor_frequency(self, sensor_id, column="centre_min") -> float:
+        """The frequency used by the radar equation: the lowest band centre of the sensor (NaN if unknown)."""
+        try:
+            return float(self.sensor_index.at[int(sensor_id), column])
+        except KeyError:
+            return np.nan
+
+    def sensor_frequencies(self, sensor_ids, column="centre_min") -> np.ndarray:
+        return self.sensor_index[column].reindex(np.asarray(sensor_ids, dtype=np.int64)).to_numpy()
+
+
+@per_db
+@derived()
+def get_frequency_catalog(db_path) -> FrequencyCatalog:
+    enum_table = get_enum_registry(db_path)["EnumSensorFrequency"]
+    with connect(db_path) as conn:
+        sensor_frequency = pd.DataFrame(
+            conn.execute("SELECT ID, Frequency FROM DataSensorFrequencySearchAndTrack").fetchall(), columns=["ID", "Frequency"])
+    return FrequencyCatalog(enum_table.ids, enum_table.descriptions, sensor_frequency)
@@ -0,0 +1,194 @@
+
+import hashlib
+import json
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+
+from .db_manager import db_fingerprint
+from .sidecar import package_version
+from .enums import get_enum_registry
+from .search_index import get_name_index
+from .selector import table_info_map
+from .radar_table import get_radar_table
+from .utils import connect, nmi
+
+# JSON API over the same data as the UI, mounted next to Gradio (see `App.serve`). Every response is a function of the
+# DB content and the request, so its ETag combines the DB fingerprint, the code version and the request: a client
+# revalidating with `If-None-Match` gets a 304 without the entity being queried. Bodies are gzipped when accepted.
+
+api_prefix = "/data/v1"
+max_batch = 1000
+
+def to_jsonable(obj):
+    """numpy scalars/arrays and DataFrames to plain JSON types, NaN and infinities to null."""
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, pd.DataFrame):
+        return to_jsonable(obj.to_dict(orient="records"))
+    if isinstance(obj, np.ndarray):
+        return to_jsonable(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+def parse_ids(ids: Optional[str], body: Optional[dict] = None) -> list[int]:
+    """IDs from `?ids=1,2,3` or a `{"ids": [...]}` body."""
+    try:
+        if body is not None and "ids" in body:
+            res = [int(i) for i in body["ids"]]
+        elif ids:
+            res = [int(i) for i in ids.split(",") if i.strip()]
+        else:
+            res = []
+    except (TypeError, ValueError):
+        raise HTTPException(400, "ids must be integers")
+    if len(res) == 0:
+        raise HTTPException(400, "No ids given")
+    if len(res) > max_batch:
+        raise HTTPException(413, f"At most {max_batch} ids per request")
+    return res
+
+def parse_floats(s: Optional[str], default: list[float]) -> list[float]:
+    if not s:
+        return default
+    try:
+        return [float(x) for x in s.split(",")]
+    except ValueError:
+        raise HTTPException(400, f"Invalid number list: {s}")
+
+def entity_error(e: Exception) -> dict:
+    """Batch entry of an entity whose payload failed, in place of the payload."""
+    return {"error": f"{type(e).__name__}: {e}"}
+
+
+class EntityApi:
+    def __init__(self, app):
+        self.app = app # `App`, for the catalog and the tabs whose payloads are served
+        self.catalog = app.selector_tab.catalog
+        self.version = package_version() # Payloads come from the tabs (aircraft, sensor, relation_tags, ...)
+
+    def db_path(self, db: str):
+        if db not in self.catalog: # Also rejects paths outside of cmo_db_root
+            raise HTTPException(404, f"Unknown database: {db}")
+        return self.app.cmo_db_root / db
+
+    def etag(self, db_path, request: Request, body: bytes = b"") -> str:
+        h = hashlib.sha1(f"{db_fingerprint(db_path)}:{self.version}:{request.url.path}?{request.url.query}".encode())
+        h.update(body)
+        return f'W/"{h.hexdigest()[:20]}"' # Weak: the gzip middleware changes the bytes, not the content
+
+    def respond(self, request: Request, etag: str, build) -> Response:
+        headers = {"ETag": etag, "Cache-Control": "no-cache"} # Clients may cache, but revalidate: the DB can be replaced
+        if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        content = json.dumps(to_jsonable(build()), ensure_ascii=False, allow_nan=False)
+        return Response(content, media_type="application/json", headers=headers)
+
+    def aircraft(self, db_path, ids: list[int]) -> dict:
+        tab = self.app.aircraft_tab
+        enums = get_enum_registry(db_path)
+        rd = {}
+        with connect(db_path) as conn:
+            for _id in ids:
+                try:
+                    values = tab.query(conn, enums, _id)
+                    for name, relation in tab.relations.items():
+                        items, count = relation.fetch(conn, enums, _id, "", 0)
+                        values[name] = {"items": items, "count": count}
+                except KeyError:
+                    values = None
+                except Exception as e: # One broken entity doesn't fail the batch
+                    values = entity_error(e)
+                rd[_id] = values
+        return rd
+
+    def sensors(self, db_path, ids: list[int]) -> dict:
+        tab = self.app.radar_search_track
+        enums = get_enum_registry(db_path)
+        rd = {}
+        with connect(db_path) as conn:
+            for _id in ids:
+                try:
+                    rd[_id] = tab.query(conn, enums, db_path, _id)
+                except KeyError:
+                    rd[_id] = None
+                except Exception as e:
+                    rd[_id] = entity_error(e)
+        return rd
+
+    def radar_ranges(self, db_path, ids: list[int], dbsm: list[float]) -> dict:
+        """Detection ranges of many radars against many RCS values in one vectorized evaluation."""
+        table = get_radar_table(db_path).subset(ids)
+        ranges_km = table.detection_ranges(dbsm) / 1000
+        rd = {_id: None for _id in ids} # Not a radar, or no parseable band
+        for _id, row in zip(table.df["ID"].astype(int).tolist(), ranges_km):
+            rd[_id] = {"km": np.round(row, 1), "nmi": np.round(row / nmi, 1)}
+        return {"dbsm": dbsm, "ranges": rd}
+
+    def search(self, db_path, type_name: str, q: str, limit: int, offset: int) -> dict:
+        if type_name not in table_info_map:
+            raise HTTPException(404, f"Unknown type: {type_name}")
+        df, total = get_name_index(db_path, type_name).search(q, limit, offset)
+        return {"total": total, "rows": df}
+
+    def create(self) -> FastAPI:
+        api = FastAPI(title="CMO DB Inspector API")
+        api.add_middleware(GZipMiddleware, minimum_size=1024)
+
+        def single(rd: dict, _id: int):
+            if rd[_id] is None:
+                raise HTTPException(404, f"Unknown ID: {_id}")
+            if "error" in rd[_id]:
+                raise HTTPException(500, rd[_id]["error"])
+            return rd[_id]
+
+        @api.get("/dbs")
+        def dbs():
+            default_db = self.app.selector_tab.default_db
+            return {"dbs": self.catalog.names(), "default": None if default_db is None else default_db.name}
+
+        @api.get("/{db}/search/{type_name}")
+        def search(db: str, type_name: str, request: Request, q: str = "", limit: int = 20, offset: int = 0):
+            db_path = self.db_path(db)
+            limit = max(0, min(limit, max_batch))
+            return self.respond(request, self.etag(db_path, request), lambda: self.search(db_path, type_name, q, limit, max(offset, 0)))
+
+        @api.get("/{db}/aircraft/{_id}")
+        def aircraft(db: str, _id: int, request: Request):
+            db_path = self.db_path(db)
+            return self.respond(request, self.etag(db_path, request), lambda: single(self.aircraft(db_path, [_id]), _id))
+
+        @api.get("/{db}/sensor/{_id}")
+        def sensor(db: str, _id: int, request: Request):
+            db_path = self.db_path(db)
+            return self.respond(request, self.etag(db_path, request), lambda: single(self.sensors(db_path, [_id]), _id))
+
+        # Batches: GET with `?ids=1,2,3` (cacheable) or POST with a `{"ids": [...]}` body for long lists.
+        def batch_route(method):
+            def batch(db: str, request: Request, ids: Optional[str] = None, body: Optional[dict] = None):
+                db_path = self.db_path(db)
+                _ids = parse_ids(ids, body)
+                return self.respond(request, self.etag(db_path, request, json.dumps(body).encode()), lambda: method(db_path, _ids))
+            return batch
+
+        api.add_api_route("/{db}/aircraft", batch_route(self.aircraft), methods=["GET", "POST"])
+        api.add_api_route("/{db}/sensor", batch_route(self.sensors), methods=["GET", "POST"])
+
+        @api.api_route("/{db}/radar/ranges", methods=["GET", "POST"])
+        def radar_ranges(db: str, request: Request, ids: Optional[str] = None, dbsm: Optional[str] = None, body: Optional[dict] = None):
+            db_path = self.db_path(db)
+            _ids = parse_ids(ids, body)
+            default_dbsm = [float(x) for x in self.app.radar_search_track.dbsm_arr]
+            _dbsm = [float(x) for x in body["dbsm"]] if body and "dbsm" in body else parse_floats(dbsm, default_dbsm)
+            return self.respond(request, self.etag(db_path, request, json.dumps(body).encode()), lambda: self.radar_ranges(db_path, _ids, _dbsm))
+
+        return api
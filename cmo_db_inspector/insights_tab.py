@@ -4,6 +4,15 @@ import pandas as pd
 import numpy as np
 
 from .interfaces import DbPathProvider
+from .enums import get_enum_registry, EnumTable
+from .db_manager import per_db
+from .sidecar import derived
+from .performance import radius_frame
+from .figure_cache import figure_cache
+from .stats_cube import get_stats_cube, part_specs
+from .radar_table import penetration_frame
+from .non_escape_zone import nez_frame
+from .missile_flyout import reference_launch_altitude, reference_launch_speed
 
 country_map = {
     "United States": "USA",
@@ -23,12 +32,28 @@ country_color_discrete_map = { # Text color may not work for some browser (For e
     "Others": "grey"
 }
 
+jitter_seed = 0 # Agility jitter of the Agility/Front plot
+
+@per_db
+@derived()
+def get_country_groups(db_path) -> EnumTable:
+    return get_enum_registry(db_path)["EnumOperatorCountry"].remap(country_map, "Others")
+
 
 class InsightsTab:
     def __init__(self, db_path_provider: DbPathProvider):
         self.db_path_provider = db_path_provider
         self.name_to_component: dict[str, gr.components.Component] = {}
 
+    query_commands = {
+        "AgilityFront": "SELECT DataAircraft.ID, Name, Comments, YearCommissioned, Agility, DataAircraftSignatures.Front, OperatorCountry FROM DataAircraft "
+                        "INNER JOIN DataAircraftSignatures ON DataAircraft.ID=DataAircraftSignatures.ID "
+                        "WHERE DataAircraftSignatures.Type = 5001",
+        "Sensor3D": "SELECT DataSensor.Name, RangeMax, RadarPeakPower, RadarProcessingGainLoss FROM DataSensor "
+                    "INNER JOIN DataSensorCapabilities ON DataSensor.ID=DataSensorCapabilities.ID "
+                    "WHERE DataSensorCapabilities.CodeID = 1001 AND DataSensor.Type = 2001" # 1001: Radar, 2001: Air Search
+    }
+
     def build(self):
         with gr.Row():
             with gr.Column(scale = 1):
@@ -37,12 +62,35 @@ class InsightsTab:
                     self.name_to_component["hover_check_box_group"] = gr.CheckboxGroup(
                         choices=["Comments", "Year", "Non-Jittering Agility"], 
                         value=["Comments", "Year", "Non-Jittering Agility"], label="Hover Info")
-                    self.name_to_component["jittering"] = gr.Slider(0, 0.05, value=0.05, label="Jittering")
+                    self.name_to_component["jittering"] = gr.Slider(0, 0.05, value=0.05, label="Jittering", info="Fixed seed, the same options give the same plot")
                     self.name_to_component["plot_agility_front"] = gr.Button("Plot")
                 with gr.Accordion("Sensor (RangeMax, RadarPeakPower, RadarProcessingGainLoss)"):
                     self.name_to_component["plot_sensor_3d"] = gr.Button("Plot")
+                with gr.Accordion("Combat Radius (All Aircraft)"):
+                    self.name_to_component["radius_payload"] = gr.Number(2000, label="Payload (kg)")
+                    self.name_to_component["radius_sort_by"] = gr.Dropdown(
+                        ["Radius hi-lo-hi (nmi)", "Radius lo-lo-lo (nmi)", "Ferry Range (nmi)", "Endurance (h)"],
+                        value="Radius hi-lo-hi (nmi)", label="Sort By")
+                    self.name_to_component["radius_min"] = gr.Number(0, label="Minimum (Sort By unit)")
+                    self.name_to_component["radius_table"] = gr.Button("List")
+                with gr.Accordion("Low-Altitude Penetration (All Radars)"):
+                    self.name_to_component["penetration_sensor_altitude"] = gr.Number(10, label="Sensor Altitude (m)")
+                    self.name_to_component["penetration_dbsm"] = gr.Number(0, label="Target RCS (dBsm)")
+                    self.name_to_component["penetration_table"] = gr.Button("List")
+                with gr.Accordion("Non-Escape Zone (All Weapons)"):
+                    self.name_to_component["nez_launch_altitude"] = gr.Number(reference_launch_altitude, label="Launch Altitude (m)")
+                    self.name_to_component["nez_launch_speed"] = gr.Number(reference_launch_speed, label="Launch Speed (kt)")
+                    self.name_to_component["nez_target_speed"] = gr.Number(450, label="Target Speed (kt)")
+                    self.name_to_component["nez_table"] = gr.Button("List")
+                with gr.Accordion("Statistics (Group By)"):
+                    self.name_to_component["stats_part"] = gr.Radio(list(part_specs), value="Aircraft", label="Facts")
+                    self.name_to_component["stats_group_by"] = gr.CheckboxGroup(
+                        choices=["Country", "Decade", "Type", "Generation"], value=["Country"], label="Group By")
+                    self.name_to_component["stats_filters"] = gr.Text("", label="Filters", placeholder="Decade=1980s; Country=USA")
+                    self.name_to_component["stats_table"] = gr.Button("Aggregate")
             with gr.Column(scale=4):
                 self.name_to_component["plot"] = gr.Plot(show_label=False)
+                self.name_to_component["table"] = gr.DataFrame([[]], label="Table", interactive=False)
 
         return self
 
@@ -50,33 +98,53 @@ class InsightsTab:
         
         inputs = self.db_path_provider.get_db_inputs() | {self.name_to_component[name] for name in ["major_powers", "jittering", "hover_check_box_group"]}
         self.name_to_component["plot_agility_front"].click(
-            self.plot_agility_front, inputs, self.name_to_component["plot"])
+            self.plot_agility_front, inputs, self.name_to_component["plot"], api_name="plot_agility_front")
+
+        self.name_to_component["plot_sensor_3d"].click(self.plot_sensor_3d, self.db_path_provider.get_db_inputs(), self.name_to_component["plot"], api_name="plot_sensor_3d")
+
+        inputs = self.db_path_provider.get_db_inputs() | {self.name_to_component[name] for name in ["radius_payload", "radius_sort_by", "radius_min"]}
+        self.name_to_component["radius_table"].click(self.list_radius, inputs, self.name_to_component["table"], api_name="list_radius")
+
+        inputs = self.db_path_provider.get_db_inputs() | {self.name_to_component[name] for name in ["penetration_sensor_altitude", "penetration_dbsm"]}
+        self.name_to_component["penetration_table"].click(self.list_penetration, inputs, self.name_to_component["table"], api_name="list_penetration")
 
-        self.name_to_component["plot_sensor_3d"].click(self.plot_sensor_3d, self.db_path_provider.get_db_inputs(), self.name_to_component["plot"])
+        inputs = self.db_path_provider.get_db_inputs() | {self.name_to_component[name] for name in ["nez_launch_altitude", "nez_launch_speed", "nez_target_speed"]}
+        self.name_to_component["nez_table"].click(self.list_nez, inputs, self.name_to_component["table"], api_name="list_nez")
+
+        inputs = self.db_path_provider.get_db_inputs() | {self.name_to_component[name] for name in ["stats_part", "stats_group_by", "stats_filters"]}
+        self.name_to_component["stats_table"].click(self.aggregate_stats, inputs, self.name_to_component["table"], api_name="aggregate_stats")
         
         return self
 
     def plot_agility_front(self, data):
+        return self.agility_front_figure(
+            self.db_path_provider.get_db_path(data),
+            data[self.name_to_component["major_powers"]],
+            data[self.name_to_component["jittering"]],
+            data[self.name_to_component["hover_check_box_group"]])
+
+    def agility_front_figure(self, db_path, major_powers, jittering, hover_options):
+        params = (bool(major_powers), float(jittering), tuple(sorted(hover_options)))
+        return figure_cache.get(db_path, "agility_front", params, lambda: self.build_agility_front(db_path, *params))
+
+    def build_agility_front(self, db_path, major_powers: bool, jittering: float, hover_options: tuple):
         import plotly.express as px
 
-        df = pd.read_sql_query(
-            "SELECT DataAircraft.ID, Name, Comments, YearCommissioned, Agility, DataAircraftSignatures.Front, Description AS Country FROM DataAircraft "
-            "INNER JOIN DataAircraftSignatures ON DataAircraft.ID=DataAircraftSignatures.ID "
-            "INNER JOIN EnumOperatorCountry ON OperatorCountry = EnumOperatorCountry.ID "
-            "WHERE DataAircraftSignatures.Type = 5001",
-            "sqlite:///" + str(self.db_path_provider.get_db_path(data)))
+        df = pd.read_sql_query(self.query_commands["AgilityFront"], "sqlite:///" + str(db_path))
 
         color_discrete_map = None
-        if data[self.name_to_component["major_powers"]]:
-            df["Country"] = df.Country.map(lambda x: country_map.get(x, "Others"))
+        if major_powers:
+            df["Country"] = get_country_groups(db_path).decode(df["OperatorCountry"].to_numpy())
             color_discrete_map = country_color_discrete_map
+        else:
+            df["Country"] = get_enum_registry(db_path)["EnumOperatorCountry"].decode(df["OperatorCountry"].to_numpy())
 
-        jittering = data[self.name_to_component["jittering"]]
         if jittering > 0:
             df["NonJitteringAgility"] = df["Agility"].copy()
-            df["Agility"] = df["Agility"] + np.random.randn(df["Agility"].size) * jittering
+            # Seeded, so the cached figure is the one a rebuild would give: the same DB and options always jitter alike.
+            df["Agility"] = df["Agility"] + np.random.default_rng(jitter_seed).standard_normal(df["Agility"].size) * jittering
 
-        hover_options = set(data[self.name_to_component["hover_check_box_group"]])
+        hover_options = set(hover_options)
         if "Comments" in hover_options:
             mask = df["Comments"] != "-"
             df.loc[mask, "Name"] = df.loc[mask, "Name"] + " (" + df.loc[mask, "Comments"] + ")"
@@ -99,15 +167,68 @@ class InsightsTab:
         return fig
     
     def plot_sensor_3d(self, data):
+        return self.sensor_3d_figure(self.db_path_provider.get_db_path(data))
+
+    def sensor_3d_figure(self, db_path):
+        return figure_cache.get(db_path, "sensor_3d", (), lambda: self.build_sensor_3d(db_path))
+
+    def build_sensor_3d(self, db_path):
         import plotly.express as px
 
-        df = pd.read_sql_query(
-            "SELECT * FROM DataSensor "
-            "INNER JOIN DataSensorCapabilities ON DataSensor.ID=DataSensorCapabilities.ID "
-            "WHERE DataSensorCapabilities.CodeID = 1001 AND DataSensor.Type = 2001", # 1001: Radar, 2001: Air Search
-            "sqlite:///" + str(self.db_path_provider.get_db_path(data)))
+        df = pd.read_sql_query(self.query_commands["Sensor3D"], "sqlite:///" + str(db_path))
         
         fig = px.scatter_3d(df, x="RangeMax", y="RadarPeakPower", z="RadarProcessingGainLoss", custom_data=["Name"])
         fig.update_traces(hovertemplate='%{customdata[0]}')
 
         return fig
+
+    def warm_up(self, db_path):
+        """Build the default plots and the statistics cube in the background so the first click is a cache lookup."""
+        defaults = [self.name_to_component[name].value for name in ["major_powers", "jittering", "hover_check_box_group"]]
+        try:
+            self.agility_front_figure(db_path, *defaults)
+            self.sensor_3d_figure(db_path)
+            get_stats_cube(db_path)
+        except Exception as e: # Warm-up is best effort, a failing plot will raise again on click.
+            print(f"Plot warm-up failed: {e!r}")
+
+    def aggregate_stats(self, data):
+        """Answered from the precomputed cube, see `stats_cube`."""
+        filters = {}
+        for item in data[self.name_to_component["stats_filters"]].split(";"):
+            if item.strip() == "":
+                continue
+            dim, sep, value = item.partition("=")
+            if not sep:
+                raise gr.Error(f"Invalid filter {item!r}, expected Dimension=Value")
+            filters[dim.strip()] = value.strip()
+        cube = get_stats_cube(self.db_path_provider.get_db_path(data))
+        try:
+            return cube.query(data[self.name_to_component["stats_part"]], data[self.name_to_component["stats_group_by"]], filters).round(2)
+        except KeyError as e:
+            raise gr.Error(e.args[0])
+
+    def list_penetration(self, data, limit=200):
+        """Radars sorted by their range against the lowest target, the ones a low flyer can't sneak under first."""
+        df = penetration_frame(
+            self.db_path_provider.get_db_path(data),
+            float(data[self.name_to_component["penetration_sensor_altitude"]]),
+            float(data[self.name_to_component["penetration_dbsm"]]))
+        return df.sort_values(df.columns[3], ascending=False).head(limit)
+
+    def list_nez(self, data, limit=200):
+        """Weapons sorted by their non-escape range for one launch, from their flyouts (`non_escape_zone`)."""
+        values = [data[self.name_to_component[name]] for name in ["nez_launch_altitude", "nez_launch_speed", "nez_target_speed"]]
+        launch_altitude, launch_speed, target_speed = (float(v) if v is not None else default for v, default in zip(
+            values, [reference_launch_altitude, reference_launch_speed, 450.0]))
+        df = nez_frame(self.db_path_provider.get_db_path(data), launch_altitude, launch_speed, target_speed)
+        return df.sort_values("Non-Escape (nmi)", ascending=False).head(limit)
+
+    def list_radius(self, data, limit=200):
+        # A cleared number field comes as None: no payload, no minimum.
+        payload, minimum = data[self.name_to_component["radius_payload"]], data[self.name_to_component["radius_min"]]
+        df = radius_frame(self.db_path_provider.get_db_path(data), float(payload) if payload is not None else 0.0)
+        sort_by = data[self.name_to_component["radius_sort_by"]]
+        if minimum is not None:
+            df = df[df[sort_by] >= minimum]
+        return df.sort_values(sort_by, ascending=False).head(limit)
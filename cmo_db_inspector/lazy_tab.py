@@ -0,0 +1,48 @@
+
+import gradio as gr
+
+from .interfaces import DbPathProvider
+from .utils import skip_updates
+
+class LazyTab:
+    """Defers `tab.updates(data, _id)` until the tab is opened.
+
+    A selection only records the requested ID; the `TabItem.select` handler fills the tab if the (DB, ID) it shows
+    is stale. `tab` provides `updates`, `register_inputs` and `register_outputs` like `RawTableTab`. `fill` loads it
+    at once instead, for the tab a selection switches to.
+    """
+    def __init__(self, tab, tab_item: gr.TabItem, db_path_provider: DbPathProvider):
+        self.tab = tab
+        self.tab_item = tab_item
+        self.db_path_provider = db_path_provider
+        self.requested_id = gr.State(None)
+        self.loaded_key = gr.State(None) # (DB path, ID) currently shown
+
+    def request(self, data, _id):
+        return {self.requested_id: int(_id)}
+
+    def fill(self, data, _id):
+        rd = self.tab.updates(data, _id)
+        rd[self.requested_id] = int(_id)
+        rd[self.loaded_key] = (str(self.db_path_provider.get_db_path(data)), int(_id))
+        return rd
+
+    def bind(self):
+        inputs = self.db_path_provider.get_db_inputs() | {self.requested_id, self.loaded_key}
+        self.tab.register_inputs(inputs)
+        outputs = {self.loaded_key}
+        self.tab.register_outputs(outputs)
+        self.tab_item.select(self.load, inputs, outputs)
+        return self
+
+    def load(self, data):
+        _id = data[self.requested_id]
+        key = (str(self.db_path_provider.get_db_path(data)), _id)
+        if _id is None or key == data[self.loaded_key]:
+            return skip_updates([self.loaded_key])
+        rd = self.tab.updates(data, _id)
+        rd[self.loaded_key] = key
+        return rd
+
+    def register_outputs(self, outputs: set):
+        outputs.update({self.requested_id, self.loaded_key})
@@ -0,0 +1,369 @@
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from .db_manager import cache_root
+
+# Load generator for a running app. Virtual users replay a browsing session (search and paging in the selector, row
+# selection, the radar equation, Insights plots) through the endpoints the browser calls: `/run/predict`, or the
+# `/queue/join` websocket for events going through the queue. Every user has its own session hash, so `gr.State`
+# and the search debounce behave as for separate analysts. Events are addressed by the `api_name`s of the `bind`
+# methods and their inputs are mapped through `/config`, starting from the default values and following the outputs
+# like the browser does. Runs are saved as JSON under `runs_dir()` to compare queue concurrency or cache changes.
+
+@dataclass
+class Action:
+    api_name: str
+    overrides: dict = field(default_factory=dict) # Input label -> value, or a callable taking the user's `random.Random`
+
+aircraft_queries = ["", "F-", "Su-", "MiG", "Eagle", "Tornado", "E-", "J-"]
+sensor_queries = ["", "AN/", "APG", "Radar", "ESM", "Sonar"]
+
+scenario = [
+    Action("change_type", {"Type": "Aircraft"}),
+    Action("search", {"Class": lambda rng: rng.choice(aircraft_queries)}),
+    Action("next_page"),
+    Action("select_row"),
+    Action("change_type", {"Type": "Sensor"}),
+    Action("search", {"Class": lambda rng: rng.choice(sensor_queries)}),
+    Action("select_row"),
+    Action("radar_single", {"radar cross section (dBsm)": lambda rng: rng.randint(-20, 20)}),
+    Action("radar_3d"),
+    Action("plot_agility_front"),
+    Action("plot_sensor_3d"),
+    Action("aggregate_stats"),
+]
+
+def runs_dir() -> Path:
+    d = cache_root() / "load_tests"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+class AppConfig:
+    """The parts of the Gradio `/config` needed to call events by api_name."""
+    def __init__(self, config: dict):
+        self.components = {c["id"]: c for c in config["components"]}
+        self.enable_queue = bool(config.get("enable_queue"))
+        self.dependencies = {d["api_name"]: (i, d) for i, d in enumerate(config["dependencies"]) if d.get("api_name")}
+
+    def default(self, component_id):
+        return self.components[component_id].get("props", {}).get("value")
+
+    def label(self, component_id) -> Optional[str]:
+        return self.components[component_id].get("props", {}).get("label")
+
+    def queued(self, dependency: dict) -> bool:
+        return self.enable_queue if dependency.get("queue") is None else bool(dependency["queue"])
+
+
+class Session:
+    """One virtual user: a session hash and the values its components hold."""
+    def __init__(self, config: AppConfig, base_url: str, client, rng: random.Random):
+        self.config = config
+        self.base_url = base_url.rstrip("/")
+        self.client = client
+        self.rng = rng
+        self.session_hash = uuid.uuid4().hex[:11]
+        self.values = {}
+
+    def value(self, component_id):
+        return self.values.get(component_id, self.config.default(component_id))
+
+    def inputs(self, dependency: dict, overrides: dict) -> list:
+        data = []
+        for component_id in dependency["inputs"]:
+            label = self.config.label(component_id)
+            if label in overrides:
+                value = overrides[label]
+                value = value(self.rng) if callable(value) else value
+                self.values[component_id] = value
+            data.append(self.value(component_id))
+        return data
+
+    def event_data(self, api_name: str, dependency: dict) -> Optional[dict]:
+        if api_name != "select_row":
+            return None
+        table = self.value(dependency["targets"][0][0]) # [(component id, event name)]
+        rows = (table or {}).get("data") or []
+        rows = [row for row in rows if row and row[0] not in ("", None)]
+        if not rows:
+            return None
+        i = self.rng.randrange(len(rows))
+        return {"index": [i, 0], "value": rows[i][0]}
+
+    def apply(self, dependency: dict, output: dict):
+        for component_id, value in zip(dependency["outputs"], output.get("data", [])):
+            if isinstance(value, dict) and value.get("__type__") == "update":
+                if "value" in value:
+                    self.values[component_id] = value["value"]
+            else:
+                self.values[component_id] = value
+
+    async def call(self, action: Action) -> Optional[tuple[float, bool, str]]:
+        """Run an event, returning (latency in s, success, error), or None if it can't apply (nothing to select)."""
+        fn_index, dependency = self.config.dependencies[action.api_name]
+        event_data = self.event_data(action.api_name, dependency)
+        if action.api_name == "select_row" and event_data is None:
+            return None
+        body = {"data": self.inputs(dependency, action.overrides), "event_data": event_data,
+                "fn_index": fn_index, "session_hash": self.session_hash}
+
+        t = time.perf_counter()
+        try:
+            if self.config.queued(dependency):
+                output, ok = await self.call_queue(body)
+            else:
+                output, ok = await self.call_http(body)
+        except Exception as e: # Connection errors and timeouts count as failed events
+            return time.perf_counter() - t, False, repr(e)
+        latency = time.perf_counter() - t
+
+        if ok:
+            self.apply(dependency, output)
+            return latency, True, ""
+        return latency, False, str(output.get("error"))
+
+    async def call_http(self, body: dict) -> tuple[dict, bool]:
+        response = await self.client.post(f"{self.base_url}/run/predict", json=body)
+        output = response.json()
+        return output, response.status_code == 200 and "error" not in output
+
+    async def call_queue(self, body: dict) -> tuple[dict, bool]:
+        import websockets
+
+        url = "ws" + self.base_url[len("http"):] + "/queue/join"
+        async with websockets.connect(url, max_size=None) as ws:
+            while True:
+                msg = json.loads(await ws.recv())
+                if msg["msg"] == "send_hash":
+                    await ws.send(json.dumps({"fn_index": body["fn_index"], "session_hash": self.session_hash}))
+                elif msg["msg"] == "send_data":
+                    await ws.send(json.dumps(body))
+                elif msg["msg"] == "queue_full":
+                    return {"error": "queue full"}, False
+                elif msg["msg"] == "process_completed":
+                    return msg["output"] or {}, bool(msg["success"])
+
+
+class ProcessSampler:
+    """CPU and memory of the server process, read from /proc (Linux), sampled every `interval` s."""
+    def __init__(self, pid: Optional[int], interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples: list[dict] = []
+
+    def available(self) -> bool:
+        return self.pid is not None and Path(f"/proc/{self.pid}/stat").exists()
+
+    def read(self) -> tuple[float, float, int]:
+        """CPU seconds, RSS in MiB and thread count."""
+        stat = Path(f"/proc/{self.pid}/stat").read_text()
+        fields = stat[stat.rindex(")") + 2:].split() # The command name may contain spaces
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK") # utime + stime
+        status = dict(line.split(":", 1) for line in Path(f"/proc/{self.pid}/status").read_text().splitlines() if ":" in line)
+        rss = int(status["VmRSS"].split()[0]) / 1024
+        return cpu, rss, int(status["Threads"])
+
+    async def run(self, stop: asyncio.Event):
+        if not self.available():
+            return
+        t0, (cpu0, _, _) = time.perf_counter(), self.read()
+        t_prev, cpu_prev = t0, cpu0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                cpu, rss, threads = self.read()
+            except (OSError, KeyError, ValueError): # The server exited
+                return
+            t = time.perf_counter()
+            self.samples.append({"t": round(t - t0, 3), "cpu_percent": round((cpu - cpu_prev) / (t - t_prev) * 100, 1),
+                                 "rss_mib": round(rss, 1), "threads": threads})
+            t_prev, cpu_prev = t, cpu
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {}
+        df = pd.DataFrame(self.samples)
+        return {"CPU mean (%)": round(df["cpu_percent"].mean(), 1), "CPU max (%)": df["cpu_percent"].max(),
+                "RSS start (MiB)": df["rss_mib"].iloc[0], "RSS max (MiB)": df["rss_mib"].max(), "Threads max": int(df["threads"].max())}
+
+
+async def virtual_user(k: int, config: AppConfig, base_url: str, client, deadline: float, think: float, ramp_delay: float,
+                       seed: int, records: list):
+    rng = random.Random(seed + k)
+    session = Session(config, base_url, client, rng)
+    await asyncio.sleep(ramp_delay)
+    while time.perf_counter() < deadline:
+        for action in scenario:
+            if time.perf_counter() >= deadline:
+                return
+            if action.api_name not in config.dependencies:
+                continue
+            t = time.perf_counter()
+            result = await session.call(action)
+            if result is not None:
+                latency, ok, error = result
+                records.append({"User": k, "Event": action.api_name, "Start": t, "Latency": latency, "Ok": ok, "Error": error})
+            if think > 0:
+                await asyncio.sleep(rng.expovariate(1 / think))
+
+async def run_load(base_url: str, users: int, duration: float, think: float, ramp: float, pid: Optional[int] = None,
+                   seed=0, timeout=120.0) -> tuple[pd.DataFrame, float, ProcessSampler]:
+    """Drive `users` virtual users for `duration` s, returning the event records, the elapsed time and the sampler
+    of the server process (empty without `pid`)."""
+    import httpx
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=users + 4)) as client:
+        response = await client.get(f"{base_url.rstrip('/')}/config")
+        response.raise_for_status()
+        config = AppConfig(response.json())
+        missing = sorted({action.api_name for action in scenario} - set(config.dependencies))
+        if missing:
+            print(f"Skipping events the app doesn't expose: {', '.join(missing)}")
+
+        sampler = ProcessSampler(pid)
+        stop = asyncio.Event()
+        sampling = asyncio.create_task(sampler.run(stop))
+        records: list[dict] = []
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[virtual_user(k, config, base_url, client, deadline, think, ramp * k / users, seed, records)
+                               for k in range(users)])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await sampling
+
+    df = pd.DataFrame(records, columns=["User", "Event", "Start", "Latency", "Ok", "Error"])
+    df["Start"] -= start
+    return df, elapsed, sampler
+
+def summarize(records: pd.DataFrame, elapsed: float) -> pd.DataFrame:
+    """Throughput and latency percentiles (ms) per event type, with an "All" row."""
+    rows = []
+    groups = [(event, df) for event, df in records.groupby("Event", sort=False)] + [("All", records)]
+    for event, df in groups:
+        ok = df["Latency"][df["Ok"]] * 1000
+        rows.append({
+            "Event": event, "Count": len(df), "Errors": int((~df["Ok"]).sum()),
+            "Throughput (/s)": round(len(df) / elapsed, 2) if elapsed > 0 else float("nan"),
+            **{f"p{q} (ms)": round(ok.quantile(q / 100), 1) if len(ok) else float("nan") for q in [50, 90, 95, 99]},
+            "Max (ms)": round(ok.max(), 1) if len(ok) else float("nan"),
+        })
+    return pd.DataFrame(rows)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(db_root, port: int, concurrency: Optional[int] = None, timeout=300.0) -> subprocess.Popen:
+    """Run `start_app` on `db_root` in a child process and wait until it serves `/config`."""
+    import httpx
+
+    cmd = [sys.executable, "-m", "cmo_db_inspector.start_app", str(db_root), "--port", str(port)]
+    if concurrency is not None:
+        cmd += ["--concurrency", str(concurrency)]
+    proc = subprocess.Popen(cmd)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"The server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/config", timeout=5).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise TimeoutError(f"The server didn't start in {timeout} s")
+
+def save_run(label: str, settings: dict, records: pd.DataFrame, elapsed: float, sampler: ProcessSampler) -> Path:
+    path = runs_dir() / f"{time.strftime('%Y%m%d-%H%M%S')}-{label}.json"
+    run = {
+        "label": label, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "settings": settings, "elapsed": elapsed,
+        "summary": summarize(records, elapsed).to_dict("records"), "resources": sampler.summary(),
+        "samples": sampler.samples, "records": records.to_dict("records"),
+    }
+    path.write_text(json.dumps(run, indent=1, default=str))
+    return path
+
+def load_run(name) -> dict:
+    path = Path(name)
+    if not path.exists():
+        path = runs_dir() / (name if name.endswith(".json") else f"{name}.json")
+    return json.loads(path.read_text())
+
+def compare(names: list[str], metrics=("Throughput (/s)", "p50 (ms)", "p95 (ms)", "Errors")) -> pd.DataFrame:
+    """Metrics per event type (rows) of saved runs side by side (columns: metric, run)."""
+    frames = {}
+    for name in names:
+        run = load_run(name)
+        key = run["label"] if run["label"] not in frames else f"{run['label']} {run['created']}"
+        frames[key] = pd.DataFrame(run["summary"]).set_index("Event")[list(metrics)]
+    return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the app's Gradio events with concurrent virtual users.")
+    parser.add_argument("--url", default=None, help="Base URL of a running app, default: start one with --db-root")
+    parser.add_argument("--db-root", help="CMO DB folder to start a server on (its CPU and memory are sampled)")
+    parser.add_argument("--concurrency", type=int, help="Queue workers of the started server, default: no queue")
+    parser.add_argument("--pid", type=int, help="Server process to sample when using --url")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds")
+    parser.add_argument("--think", type=float, default=1.0, help="Mean think time between events (s, exponential)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which the users start")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="run", help="Name of the saved run")
+    parser.add_argument("--compare", nargs="+", metavar="RUN", help="Compare saved runs (paths or names) instead of running")
+    args = parser.parse_args()
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", None)
+    if args.compare:
+        print(compare(args.compare).to_string())
+        return
+    if (args.url is None) == (args.db_root is None):
+        parser.error("Give exactly one of --url and --db-root")
+
+    proc = None
+    url, pid = args.url, args.pid
+    if args.db_root is not None:
+        port = free_port()
+        proc = start_server(args.db_root, port, args.concurrency)
+        url, pid = f"http://127.0.0.1:{port}", proc.pid
+    try:
+        records, elapsed, sampler = asyncio.run(run_load(url, args.users, args.duration, args.think, args.ramp, pid, args.seed))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    settings = {k: v for k, v in vars(args).items() if k not in ("compare", "label")}
+    print(summarize(records, elapsed).to_string(index=False))
+    for key, value in sampler.summary().items():
+        print(f"{key}: {value}")
+    for error, n in records.loc[~records["Ok"], "Error"].value_counts().head(5).items():
+        print(f"{n} x {error}")
+    print(f"Saved to {save_run(args.label, settings, records, elapsed, sampler)}")
+
+if __name__ == "__main__":
+    main()
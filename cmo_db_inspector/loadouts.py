@@ -0,0 +1,65 @@
+
+import pandas as pd
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+from .performance import get_performance_table
+from .missile_kp import AircraftTarget
+
+loadout_columns = ["LoadoutID", "Name", "Weight", "WeaponCount", "StoreTypes"]
+
+def compute_loadout_weights(db_path) -> pd.DataFrame:
+    """Weight (kg) and store counts of every loadout, in one set-based pass over DataLoadoutWeapons ⋈ DataWeapon."""
+    with connect(db_path) as conn:
+        loadouts = pd.DataFrame(conn.execute("SELECT ID, Name FROM DataLoadout").fetchall(), columns=["LoadoutID", "Name"])
+        stores = pd.DataFrame(conn.execute(
+            "SELECT DataLoadoutWeapons.ID, DataLoadoutWeapons.ComponentID, DataLoadoutWeapons.DefaultLoad, DataWeapon.Weight "
+            "FROM DataLoadoutWeapons INNER JOIN DataWeapon ON DataLoadoutWeapons.ComponentID = DataWeapon.ID").fetchall(),
+            columns=["LoadoutID", "WeaponID", "DefaultLoad", "Weight"])
+
+    stores["Weight"] = stores["DefaultLoad"].fillna(0) * stores["Weight"].fillna(0)
+    g = stores.groupby("LoadoutID")
+    agg = pd.DataFrame({
+        "Weight": g["Weight"].sum(),
+        "WeaponCount": g["DefaultLoad"].sum(),
+        "StoreTypes": g["WeaponID"].nunique()
+    })
+    df = loadouts.join(agg, on="LoadoutID")
+    df[["Weight", "WeaponCount", "StoreTypes"]] = df[["Weight", "WeaponCount", "StoreTypes"]].fillna(0)
+    return df[loadout_columns]
+
+@per_db
+@derived()
+def get_loadout_weights(db_path) -> pd.DataFrame:
+    """`compute_loadout_weights`, persisted in the DB's sidecar."""
+    return compute_loadout_weights(db_path)
+
+@per_db
+@derived()
+def get_aircraft_loadouts(db_path) -> pd.DataFrame:
+    """Every (aircraft, loadout) pair with the loadout aggregates."""
+    with connect(db_path) as conn:
+        pairs = pd.DataFrame(conn.execute("SELECT ID, ComponentID FROM DataAircraftLoadouts").fetchall(), columns=["AircraftID", "LoadoutID"])
+    return pairs.merge(get_loadout_weights(db_path), on="LoadoutID", how="inner")
+
+
+def aircraft_target(db_path, aircraft_id, loadout_id=None, **kwargs) -> AircraftTarget:
+    """A `missile_kp.MissileTarget` for an aircraft carrying a loadout, with weights filled from the DB.
+
+    Fuel is the internal capacity, limited by what WeightMax leaves after the payload. Other fields come from `kwargs`.
+    """
+    aircraft_id = int(aircraft_id)
+    weights = get_loadout_weights(db_path).set_index("LoadoutID")["Weight"]
+    weight_payload = float(weights.get(int(loadout_id), 0.0)) if loadout_id is not None else 0.0
+
+    row = get_performance_table(db_path).aircraft.set_index("ID").loc[aircraft_id]
+    weight_fuel = float(max(0.0, min(row["Fuel"], row["WeightMax"] - row["WeightEmpty"] - weight_payload)))
+
+    with connect(db_path) as conn:
+        agility, = conn.execute("SELECT Agility FROM DataAircraft WHERE ID = ?", (aircraft_id,)).fetchone()
+
+    params = dict(agility=agility, weight_empty=float(row["WeightEmpty"]), weight_payload=weight_payload,
+                  weight_fuel=weight_fuel, weight_max=float(row["WeightMax"]))
+    params.update(kwargs)
+    return AircraftTarget(**params)
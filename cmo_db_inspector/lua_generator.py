@@ -0,0 +1,245 @@
+
+import math
+import itertools
+import numpy as np
+import gradio as gr
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from .utils import connect, batched
+from .interfaces import DbPathProvider
+from .schema import get_schema
+from .relations import get_relation_index
+from .db_manager import export_path
+from .search_index import get_name_index, table_info_map
+
+# Lua `type` of `ScenEdit_AddUnit` -> DB table
+unit_tables = {
+    "Aircraft": "DataAircraft",
+    "Ship": "DataShip",
+    "Submarine": "DataSubmarine",
+    "Facility": "DataFacility"
+}
+
+@dataclass
+class UnitRequest:
+    type: str # Key of `unit_tables`
+    dbid: int
+    loadout_id: Optional[int] = None # Aircraft only, None: first loadout of the aircraft
+    count: int = 1
+
+@dataclass
+class LuaOptions:
+    side: str = "Blue"
+    latitude: float = 0.0 # Grid origin (north-west corner)
+    longitude: float = 0.0
+    spacing_nmi: float = 5.0
+    columns: int = 20
+    altitude: float = 6000 # m, aircraft only
+    heading: float = 0
+    base: str = "" # Aircraft are parked at this base (with `ScenEdit_SetLoadout`) instead of airborne
+    emcon: str = "" # e.g. "Radar=Active", applied to units carrying sensors
+
+def lua_str(s) -> str:
+    s = str(s).replace("\\", "\\\\").replace("'", "\\'").replace("\n", "\\n").replace("\r", "")
+    return f"'{s}'"
+
+def parse_unit_list(lines: Iterable[str]) -> Iterator[UnitRequest]:
+    """Saved unit list, one `Type, DBID[, LoadoutID][, Count]` per line. Empty LoadoutID means the default one;
+    blank lines and lines starting with `#` are skipped."""
+    for line in lines:
+        line = line.strip()
+        if len(line) == 0 or line.startswith("#"):
+            continue
+        fields = [f.strip() for f in line.split(",")]
+        if fields[0] not in unit_tables:
+            raise gr.Error(f"Unknown unit type {fields[0]!r} in line {line!r}, expected one of {list(unit_tables)}")
+        try:
+            dbid = int(fields[1])
+            loadout_id = int(fields[2]) if len(fields) > 2 and fields[2] != "" else None
+            count = int(fields[3]) if len(fields) > 3 and fields[3] != "" else 1
+        except (IndexError, ValueError):
+            raise gr.Error(f"Can't parse line {line!r}, expected `Type, DBID[, LoadoutID][, Count]`")
+        yield UnitRequest(fields[0], dbid, loadout_id, count)
+
+def query_units(db_path, type_name: str, match_str: str, limit: int, count=1) -> Iterator[UnitRequest]:
+    """Units matching a selector-like Name query, ranked like the selector when it has a name index for the type."""
+    if unit_tables[type_name] not in get_schema(db_path):
+        raise gr.Error(f"This DB has no {unit_tables[type_name]} table")
+    if type_name in table_info_map:
+        index = get_name_index(db_path, type_name)
+        for dbid in index.frame["ID"].to_numpy()[index.match(match_str)[:limit]].tolist():
+            yield UnitRequest(type_name, dbid, None, count)
+        return
+
+    with connect(db_path) as conn:
+        cursor = conn.execute(f"SELECT ID FROM {unit_tables[type_name]} WHERE Name LIKE '%' || ? || '%' LIMIT ?", (match_str, limit))
+        for dbid, in cursor:
+            yield UnitRequest(type_name, dbid, None, count)
+
+
+class UnitResolver:
+    """Batch lookups for `generate_lua`: names come from one `IN (...)` query per type and batch, loadouts and
+    sensors from the in-memory relation index."""
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.schema = get_schema(db_path)
+        self.relation_index = get_relation_index(db_path)
+
+    def link_table(self, type_name, suffix) -> Optional[str]:
+        name = unit_tables[type_name] + suffix
+        return name if name in self.relation_index else None
+
+    def resolve(self, conn, batch: list[UnitRequest]) -> list[tuple[UnitRequest, str, Optional[int], bool]]:
+        """(request, name, loadout_id, has_sensor) for requests whose DBID exists."""
+        names = {}
+        has_sensor = {}
+        for type_name in {r.type for r in batch}:
+            if unit_tables[type_name] not in self.schema:
+                continue
+            ids = sorted({r.dbid for r in batch if r.type == type_name})
+            placeholders = ",".join("?" * len(ids))
+            res = conn.execute(f"SELECT ID, Name FROM {unit_tables[type_name]} WHERE ID IN ({placeholders})", ids).fetchall()
+            names.update({(type_name, _id): name for _id, name in res})
+
+            sensors = self.link_table(type_name, "Sensors")
+            degree = self.relation_index.links[sensors].forward.degree(ids) if sensors else np.zeros(len(ids))
+            has_sensor.update({(type_name, _id): d > 0 for _id, d in zip(ids, degree)})
+
+        loadouts = self.link_table("Aircraft", "Loadouts")
+        rl = []
+        for r in batch:
+            key = (r.type, r.dbid)
+            if key not in names:
+                continue
+            loadout_id = r.loadout_id
+            if r.type == "Aircraft" and loadout_id is None and loadouts:
+                candidates = self.relation_index.forward(loadouts, r.dbid)
+                loadout_id = int(candidates[0]) if len(candidates) > 0 else None
+            rl.append((r, names[key], loadout_id, has_sensor[key]))
+        return rl
+
+
+def unit_lua(type_name, name, dbid, loadout_id, has_sensor, position: int, options: LuaOptions) -> Iterator[str]:
+    params = [f"type={lua_str(type_name)}", f"side={lua_str(options.side)}", f"name={lua_str(name)}", f"dbid={dbid}"]
+    at_base = type_name == "Aircraft" and options.base != ""
+    if at_base:
+        params.append(f"base={lua_str(options.base)}")
+    else:
+        row, col = divmod(position, max(1, int(options.columns)))
+        lat = options.latitude - row * options.spacing_nmi / 60
+        lon = options.longitude + col * options.spacing_nmi / (60 * max(0.01, math.cos(math.radians(options.latitude))))
+        params += [f"latitude={lat:.5f}", f"longitude={lon:.5f}", f"heading={options.heading:g}"]
+        if type_name == "Aircraft":
+            params.append(f"altitude={options.altitude:g}")
+    if type_name == "Aircraft" and loadout_id is not None and not at_base:
+        params.append(f"loadoutid={loadout_id}")
+
+    yield "ScenEdit_AddUnit({" + ", ".join(params) + "})\n"
+    if at_base and loadout_id is not None:
+        yield f"ScenEdit_SetLoadout({{unitname={lua_str(name)}, LoadoutID={loadout_id}, TimeToReady_Minutes=0}})\n"
+    if options.emcon != "" and has_sensor:
+        yield f"ScenEdit_SetEMCON('Unit', {lua_str(name)}, {lua_str(options.emcon)})\n"
+
+def generate_lua(db_path, units: Iterable[UnitRequest], options: LuaOptions, batch_size=500) -> Iterator[str]:
+    """Lua lines for `units`, produced lazily: only one batch of requests is resolved and held at a time."""
+    resolver = UnitResolver(db_path)
+    yield f"-- Generated by cmo_db_inspector from {db_path}\n"
+    position = itertools.count()
+    serial = itertools.count(1)
+    with connect(db_path) as conn:
+        for batch in batched(units, batch_size):
+            for r, name, loadout_id, has_sensor in resolver.resolve(conn, batch):
+                for _ in range(r.count):
+                    yield from unit_lua(r.type, f"{name} #{next(serial)}", r.dbid, loadout_id, has_sensor, next(position), options)
+
+def write_lua(lines: Iterable[str], path, head=200) -> tuple[int, list[str]]:
+    """Stream `lines` into `path`, return the line count and the first `head` lines (for a preview)."""
+    n = 0
+    head_lines = []
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line)
+            if n < head:
+                head_lines.append(line)
+            n += 1
+    return n, head_lines
+
+
+class LuaGeneratorTab:
+    def __init__(self, db_path_provider: DbPathProvider):
+        self.db_path_provider = db_path_provider
+        self.name_to_component: dict[str, gr.components.Component] = {}
+
+    def build(self):
+        ui = self.name_to_component
+        with gr.Row():
+            with gr.Column(scale=1):
+                ui["source"] = gr.Radio(["Query", "Unit List"], value="Query", label="Source")
+                with gr.Accordion("Query"):
+                    ui["type"] = gr.Dropdown(list(unit_tables), value="Aircraft", label="Type")
+                    ui["match_str"] = gr.Text("", label="Class (Name contains)")
+                    with gr.Row():
+                        ui["limit"] = gr.Number(100, label="Max Classes", precision=0)
+                        ui["count"] = gr.Number(1, label="Units per Class", precision=0)
+                with gr.Accordion("Unit List", open=False):
+                    ui["unit_list"] = gr.Textbox("", lines=6, label="Type, DBID[, LoadoutID][, Count]",
+                                                 placeholder="Aircraft, 307\nAircraft, 307, 12, 4")
+                    ui["unit_list_file"] = gr.File(label="Or a saved unit list file", file_types=[".txt", ".csv"])
+                with gr.Accordion("Placement"):
+                    ui["side"] = gr.Text("Blue", label="Side")
+                    with gr.Row():
+                        ui["latitude"] = gr.Number(0, label="Latitude")
+                        ui["longitude"] = gr.Number(0, label="Longitude")
+                    with gr.Row():
+                        ui["spacing_nmi"] = gr.Number(5, label="Spacing (nmi)")
+                        ui["columns"] = gr.Number(20, label="Columns", precision=0)
+                    with gr.Row():
+                        ui["altitude"] = gr.Number(6000, label="Aircraft Altitude (m)")
+                        ui["heading"] = gr.Number(0, label="Heading")
+                    ui["base"] = gr.Text("", label="Base (optional, aircraft are parked with their loadout)")
+                    ui["emcon"] = gr.Text("Radar=Active", label="EMCON for units with sensors (optional)")
+                ui["generate"] = gr.Button("Generate")
+            with gr.Column(scale=3):
+                ui["file"] = gr.File(label="Lua Script", interactive=False)
+                ui["summary"] = gr.Markdown("")
+                ui["preview"] = gr.Code("", language=None, label="Preview", interactive=False)
+        return self
+
+    def bind(self):
+        ui = self.name_to_component
+        inputs = self.db_path_provider.get_db_inputs() | {ui[name] for name in [
+            "source", "type", "match_str", "limit", "count", "unit_list", "unit_list_file",
+            "side", "latitude", "longitude", "spacing_nmi", "columns", "altitude", "heading", "base", "emcon"]}
+        ui["generate"].click(self.generate, inputs, {ui["file"], ui["summary"], ui["preview"]})
+        return self
+
+    def get_units(self, data, db_path) -> Iterator[UnitRequest]:
+        ui = self.name_to_component
+        if data[ui["source"]] == "Query":
+            return query_units(db_path, data[ui["type"]], data[ui["match_str"]], int(data[ui["limit"]]), max(1, int(data[ui["count"]])))
+        unit_list_file = data[ui["unit_list_file"]]
+        if unit_list_file is not None:
+            return self.iter_file_units(unit_list_file.name)
+        return parse_unit_list(data[ui["unit_list"]].splitlines())
+
+    @staticmethod
+    def iter_file_units(path) -> Iterator[UnitRequest]:
+        with open(path, encoding="utf-8") as f:
+            yield from parse_unit_list(f)
+
+    def get_options(self, data) -> LuaOptions:
+        ui = self.name_to_component
+        return LuaOptions(**{name: data[ui[name]] for name in [
+            "side", "latitude", "longitude", "spacing_nmi", "columns", "altitude", "heading", "base", "emcon"]})
+
+    def generate(self, data):
+        ui = self.name_to_component
+        db_path = self.db_path_provider.get_db_path(data)
+        path = export_path(db_path, "cmo_units_", ".lua")
+        n, head = write_lua(generate_lua(db_path, self.get_units(data, db_path), self.get_options(data)), path)
+        return {
+            ui["file"]: str(path),
+            ui["summary"]: f"{n} lines" + (f", preview shows the first {len(head)}" if len(head) < n else ""),
+            ui["preview"]: "".join(head)
+        }
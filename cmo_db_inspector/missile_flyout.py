@@ -0,0 +1,214 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Union
+
+# Point-mass flyout of a missile in level flight at its launch altitude: boost, optional sustain, then coast, with ISA
+# density and a generic Mach-dependent drag curve. Every field of `Airframe` and every launch condition broadcasts,
+# so one integration runs a whole grid of launch conditions, or many weapons, as parallel lanes.
+#
+# The DB has no thrust data, so the nominal impulse of each weapon is scaled (`calibrate`) until the reference flyout
+# reaches its `range_max`. The flyout then predicts how launch altitude, launch speed and target motion move that range.
+
+T = Union[np.ndarray, float]
+
+g0 = 9.80665
+knot = 1852 / 3600 # m/s
+nominal_isp = 250 # s, solid rocket, scaled by the calibration
+min_speed = 150.0 # m/s, slower missiles can't maneuver onto the target anymore
+default_steps = 1500
+default_samples = 300
+
+reference_launch_altitude = 9000.0 # m
+reference_launch_speed = 450.0 # kt
+
+# The integration horizon is the flight time over `range_max` at a typical average speed (seeker, battery or fuel
+# limit). A fixed horizon would let even the smallest impulse coast past a short `range_max` from the reference launch.
+rocket_mean_speed = 600.0 # m/s
+cruise_mean_speed = 250.0 # m/s, sustained motors cruise at about 300 m/s
+min_max_time = 5.0 # s
+
+mach_points = np.array([0.0, 0.8, 1.0, 1.2, 2.0, 3.0, 5.0])
+drag_points = np.array([0.30, 0.32, 0.55, 0.60, 0.45, 0.35, 0.25]) # Zero-lift drag coefficient of a generic missile body
+
+def atmosphere(altitude: T) -> tuple[T, T]:
+    """ISA density (kg/m^3) and speed of sound (m/s) at an altitude (m)."""
+    h = np.clip(altitude, 0, 30_000)
+    temperature = np.maximum(288.15 - 0.0065 * h, 216.65)
+    density = np.where(h <= 11_000, 1.225 * (temperature / 288.15) ** 4.2559, 0.36392 * np.exp(-(h - 11_000) / 6341.62))
+    return density, np.sqrt(1.4 * 287.05 * temperature)
+
+def drag_coefficient(mach: T) -> T:
+    return np.interp(mach, mach_points, drag_points)
+
+
+@dataclass
+class Airframe:
+    weight: T # kg at launch
+    burnout_weight: T # kg once the propellant is burnt
+    diameter: T # m
+    boost_time: T = 3.0 # s
+    sustain_time: T = 0.0 # s, 0 for a boost-coast motor
+    boost_fraction: T = 1.0 # Share of the propellant burnt by the boost
+    impulse_scale: T = 1.0 # Multiplier of `nominal_isp`, see `calibrate`
+    max_time: T = 120.0 # s, integration horizon (seeker, battery)
+
+    @property
+    def reference_area(self) -> T:
+        return np.pi * (np.asarray(self.diameter) / 2) ** 2
+
+def motor_profile(weight, burnout_weight, diameter, range_max_nmi, sustained: bool, impulse_scale: T = 1.0) -> Airframe:
+    """Airframe of a weapon from its DB figures. Rockets burn everything in a 3 s boost; sustained motors (air
+    breathers) boost with 20% of it and cruise on the rest for about the time to fly `range_max` at 300 m/s. Both
+    fly for the time to cover `range_max` at their mean speed."""
+    range_m = np.asarray(range_max_nmi, dtype=np.float64) * 1852
+    if not sustained:
+        return Airframe(weight, burnout_weight, diameter, impulse_scale=impulse_scale,
+                        max_time=np.maximum(range_m / rocket_mean_speed, min_max_time))
+    return Airframe(weight, burnout_weight, diameter, sustain_time=np.maximum(range_m / 300, 10.0), boost_fraction=0.2,
+                    impulse_scale=impulse_scale, max_time=np.maximum(range_m / cruise_mean_speed, min_max_time))
+
+
+def flyout(airframe: Airframe, launch_altitude: T, launch_speed: T, n_steps=default_steps, samples=default_samples) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Time (s), distance flown (m) and speed (m/s), each of shape `lanes + (samples,)`, where the lanes broadcast the
+    airframe fields with the launch altitude (m) and speed (m/s).
+
+    Each lane has its own step, `max_time / n_steps`. Burns are integrated by their overlap with each step, so a
+    short boost in a long step keeps its impulse, and the drag is integrated implicitly (v / (1 + k v dt) is exact
+    for a pure drag deceleration), which stays stable with the long steps of cruise missiles.
+    """
+    fields = [airframe.weight, airframe.burnout_weight, airframe.reference_area, airframe.boost_time, airframe.sustain_time,
+              airframe.boost_fraction, airframe.impulse_scale, airframe.max_time, launch_altitude, launch_speed]
+    shape = np.broadcast_shapes(*(np.shape(x) for x in fields))
+    (weight, burnout_weight, area, boost_time, sustain_time, boost_fraction, impulse_scale, max_time, altitude,
+     speed) = (np.broadcast_to(np.asarray(x, dtype=np.float64), shape) for x in fields)
+
+    propellant = np.maximum(weight - burnout_weight, 0)
+    boost_rate = propellant * boost_fraction / np.maximum(boost_time, 1e-9) # kg/s
+    sustain_rate = np.where(sustain_time > 0, propellant * (1 - boost_fraction) / np.maximum(sustain_time, 1e-9), 0)
+    exhaust_speed = nominal_isp * g0 * impulse_scale
+    density, sound = atmosphere(altitude) # Level flight, so both are constant along the lane
+    drag_factor = 0.5 * density * area
+
+    dt = max_time / n_steps
+    stride = max(n_steps // samples, 1)
+    v = speed.copy()
+    x = np.zeros(shape)
+    m = weight.copy()
+    times, distance, velocity = [], [], []
+    for i in range(n_steps):
+        t0 = i * dt
+        boost = np.clip(np.minimum(t0 + dt, boost_time) - t0, 0, dt) # Seconds of each burn within the step
+        sustain = np.clip(np.minimum(t0 + dt, boost_time + sustain_time) - np.maximum(t0, boost_time), 0, dt)
+        dm = boost_rate * boost + sustain_rate * sustain
+        m_mid = m - dm / 2
+        k = drag_factor * drag_coefficient(v / sound) / m_mid
+        v_new = (v + exhaust_speed * dm / m_mid) / (1 + k * v * dt)
+        x = x + (v + v_new) / 2 * dt
+        v, m = v_new, m - dm
+        if (i + 1) % stride == 0:
+            times.append(t0 + dt)
+            distance.append(x)
+            velocity.append(v)
+    return np.stack(times, axis=-1), np.stack(distance, axis=-1), np.stack(velocity, axis=-1)
+
+def reachable_range(times, distance, speed, aspect: T = 0.0, target_speed: T = 0.0) -> np.ndarray:
+    """Farthest launch range (m) from which the flyouts meet a target on a straight line, over the last axis.
+
+    The target flies at `target_speed` (m/s) with `aspect` (deg) between its heading and the line to the launcher,
+    0 head-on and 180 running away. An intercept at t needs the missile to have flown as far as the target then is,
+    while faster than both `min_speed` and the target. Inputs broadcast, e.g. (alt, speed, 1, 1, t) flyouts with
+    (aspect, 1, 1) and (target speed, 1) conditions.
+    """
+    a = np.deg2rad(np.asarray(aspect, dtype=np.float64))[..., None]
+    target_speed = np.asarray(target_speed, dtype=np.float64)[..., None]
+    lateral = target_speed * np.sin(a) * times
+    closing = target_speed * np.cos(a) * times
+    valid = (speed >= np.maximum(min_speed, target_speed)) & (distance >= lateral)
+    r = np.sqrt(np.maximum(distance ** 2 - lateral ** 2, 0)) + closing
+    return np.maximum(np.where(valid, r, 0.0).max(axis=-1), 0.0)
+
+
+def calibrate(airframe: Airframe, range_max_nmi: T, launch_altitude=reference_launch_altitude,
+              launch_speed=reference_launch_speed, n_scales=48, rounds=2, n_steps=default_steps) -> np.ndarray:
+    """`impulse_scale` giving each airframe (fields of shape (n,) or scalars) its `range_max` against a stationary
+    target from the reference launch. Every round flies `n_scales` candidate scales per weapon as parallel lanes and
+    narrows the bracket around the crossing. Scales stay within [1e-2, 1e3]: weapons whose range isn't reached by
+    the largest scale, or is already passed by the smallest, get NaN, so callers keep their static range."""
+    target = np.atleast_1d(np.asarray(range_max_nmi, dtype=np.float64)) * 1852
+    lo = np.full(target.shape, np.log(1e-2))
+    hi = np.full(target.shape, np.log(1e3))
+    fields = {name: np.asarray(getattr(airframe, name), dtype=np.float64)[..., None] for name in airframe.__dataclass_fields__}
+    converged = np.ones(target.shape, dtype=bool)
+    for k in range(rounds):
+        log_scales = lo[:, None] + (hi - lo)[:, None] * np.linspace(0, 1, n_scales) # (n, n_scales)
+        lanes = Airframe(**{**fields, "impulse_scale": np.exp(log_scales)})
+        ranges = reachable_range(*flyout(lanes, launch_altitude, launch_speed * knot, n_steps=n_steps))
+        above = ranges >= target[:, None]
+        if k == 0:
+            converged = above.any(axis=1) & ~above[:, 0]
+        j = np.where(above.any(axis=1), above.argmax(axis=1), n_scales - 1) # First scale reaching the range
+        i = np.maximum(j - 1, 0)
+        lo, hi = log_scales[np.arange(len(j)), i], log_scales[np.arange(len(j)), j]
+    return np.where(converged, np.exp(hi), np.nan)
+
+
+def interp_grid(axes: list[np.ndarray], values: np.ndarray, points: list) -> np.ndarray:
+    """Multilinear interpolation of `values` (one dimension per axis) at broadcast `points`, clamped to the grid."""
+    points = np.broadcast_arrays(*(np.asarray(p, dtype=np.float64) for p in points))
+    corners = []
+    for axis, p in zip(axes, points):
+        p = np.clip(p, axis[0], axis[-1])
+        i = np.clip(np.searchsorted(axis, p, side="right") - 1, 0, max(len(axis) - 2, 0))
+        span = axis[np.minimum(i + 1, len(axis) - 1)] - axis[i]
+        w = np.where(span > 0, (p - axis[i]) / np.where(span > 0, span, 1), 0.0)
+        corners.append(((i, 1 - w), (np.minimum(i + 1, len(axis) - 1), w)))
+    out = np.zeros(points[0].shape)
+    for choice in np.ndindex(*(2,) * len(axes)):
+        index, weight = [], 1.0
+        for (lo, hi), c in zip(corners, choice):
+            idx, w = hi if c else lo
+            index.append(idx)
+            weight = weight * w
+        out = out + weight * values[tuple(index)]
+    return out
+
+def fold_aspect(bearing: T) -> T:
+    """Bearing (deg, any sign) to the aspect 0~180 of `reachable_range`, left and right being symmetric."""
+    b = np.asarray(bearing, dtype=np.float64) % 360
+    return np.where(b > 180, 360 - b, b)
+
+
+@dataclass
+class RangeTable:
+    """Kinematic ranges (nmi) of a weapon over launch altitude (m), launch speed (kt), target aspect (deg, 0 head-on)
+    and target speed (kt)."""
+    launch_altitudes: np.ndarray
+    launch_speeds: np.ndarray
+    aspects: np.ndarray
+    target_speeds: np.ndarray
+    ranges: np.ndarray # (altitude, launch speed, aspect, target speed)
+    range_max: float = np.nan # nmi, the static range it was calibrated to
+
+    def lookup(self, launch_altitude: T, launch_speed: T, bearing: T, target_speed: T) -> T:
+        return interp_grid([self.launch_altitudes, self.launch_speeds, self.aspects, self.target_speeds], self.ranges,
+                           [launch_altitude, launch_speed, fold_aspect(bearing), target_speed])
+
+    def non_escape_range(self, launch_altitude: T, launch_speed: T, target_speed: T) -> T:
+        """Range (nmi) inside which the target can't outrun the missile by turning away at its speed."""
+        return self.lookup(launch_altitude, launch_speed, 180.0, target_speed)
+
+default_grid = dict(
+    launch_altitudes=np.array([0, 1_000, 3_000, 6_000, 9_000, 12_000, 15_000, 18_000], dtype=np.float64),
+    launch_speeds=np.array([0, 200, 350, 450, 600, 800, 1000, 1300], dtype=np.float64),
+    aspects=np.arange(0, 181, 15, dtype=np.float64),
+    target_speeds=np.array([0, 250, 450, 650, 900, 1200], dtype=np.float64),
+)
+
+def range_table(airframe: Airframe, range_max: float = np.nan, n_steps=default_steps, **grid) -> RangeTable:
+    """Fly the launch grid of a calibrated airframe in one integration and reduce it for every target condition."""
+    g = {**default_grid, **{k: np.asarray(v, dtype=np.float64) for k, v in grid.items()}}
+    times, distance, speed = flyout(airframe, g["launch_altitudes"][:, None], g["launch_speeds"][None, :] * knot, n_steps=n_steps)
+    ranges = np.stack([
+        reachable_range(times[:, :, None], distance[:, :, None], speed[:, :, None], g["aspects"], ts * knot)
+        for ts in g["target_speeds"]], axis=-1) / 1852 # One target speed at a time keeps the temporaries small
+    return RangeTable(g["launch_altitudes"], g["launch_speeds"], g["aspects"], g["target_speeds"], ranges, float(range_max))
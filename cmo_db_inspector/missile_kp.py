@@ -1,23 +1,24 @@
 
+import numpy as np
 from typing import Protocol, Optional
 from enum import Enum
 from dataclasses import dataclass
 
 class Proficiency(Enum):
-    Novice: 1
-    Cadet: 2
-    Regular: 3
-    Veteran: 4
-    Ace: 5
+    Novice = 1
+    Cadet = 2
+    Regular = 3
+    Veteran = 4
+    Ace = 5
 
 class TerminalManeuver(Enum):
-    PopUp: 1
-    ZigZag: 2
-    Random: 3
+    PopUp = 1
+    ZigZag = 2
+    Random = 3
 
 class GuidanceMode(Enum):
-    Radar: 1
-    IR: 2
+    Radar = 1
+    IR = 2
 
 class Missile(Protocol):
     PoH: float # Probability of Hit (base hit probability)
@@ -26,6 +27,7 @@ class Missile(Protocol):
     has_capable_vs_seaskimmer: bool # Weapon Code 2006
     range_max: float # nmi
     guidance_mode: GuidanceMode
+    # Optional `range_table` (a `missile_flyout.RangeTable`, see `non_escape_zone.weapon_missile`), replaces `range_max`
 
 class MissileTarget(Protocol):
     speed: float # kt
@@ -45,10 +47,34 @@ class MissileTarget(Protocol):
     altitude_max: float
     is_missile: bool # missile or aircraft
 
+@dataclass
+class AircraftTarget:
+    # A concrete `MissileTarget`, see `loadouts.aircraft_target` to fill the weights from the DB.
+    # Agility and weights may also be arrays: the agility coefficients then evaluate a whole fleet at once.
+    agility: float
+    weight_empty: float
+    weight_payload: float
+    weight_fuel: float
+    weight_max: float
+    speed: float = 450
+    altitude: float = 6000
+    altitude_max: float = 15000
+    has_supermanouverability: bool = False
+    experience: Proficiency = Proficiency.Regular
+    damaged: float = 0.0
+    terminal_maneuver: Optional[TerminalManeuver] = None
+    proficiency: Optional[Proficiency] = Proficiency.Regular
+    rcs: float = 1.0
+    ir_detection_distance: float = 1.0
+    is_missile: bool = False
+
+@dataclass
 class Environment:
     bearing: float # degree
     distance: float # nmi # "required" distance (or "elapsed" range when the missile touchs the target)
     on_sea: bool
+    launch_altitude: float = 9000 # m, only used with a range table
+    launch_speed: float = 450 # kt, only used with a range table
 
 proficiency_agility_coef_map = {
     Proficiency.Novice: 0.3,
@@ -59,7 +85,7 @@ proficiency_agility_coef_map = {
 }
 
 terminal_maneuver_coef_map = {
-    TerminalManeuver.PoPUp: 3 / 4, # Weapon Code 6121
+    TerminalManeuver.PopUp: 3 / 4, # Weapon Code 6121
     TerminalManeuver.ZigZag: 2 / 3, # Weapon Code 6122
     TerminalManeuver.Random: 1 / 2 # Weapon Code 6123
 }
@@ -70,15 +96,49 @@ class MissileHitProbilityCalculator:
     target: MissileTarget
     env: Environment
 
+    @property
+    def effective_range(self) -> float:
+        """Range (nmi) against this target: looked up in the missile's range table for the launch altitude and speed,
+        the target aspect (bearing) and speed, else the static `range_max`."""
+        m, t, e = self.missile, self.target, self.env
+        table = getattr(m, "range_table", None)
+        if table is None:
+            return m.range_max
+        return float(table.lookup(e.launch_altitude, e.launch_speed, e.bearing, t.speed))
+
+    @property
+    def distance_knee(self) -> float:
+        """Fraction of the effective range below which the distance costs nothing: the non-escape range with a range
+        table, else the fixed CMO knee."""
+        m, t, e = self.missile, self.target, self.env
+        table = getattr(m, "range_table", None)
+        if table is None:
+            return 0.5 if m.is_rocket_booster_or_no_power else 0.75
+        effective_range = self.effective_range
+        if effective_range <= 0:
+            return 0.0
+        return float(np.clip(table.non_escape_range(e.launch_altitude, e.launch_speed, t.speed) / effective_range, 0, 1))
+
     @property
     def distance_coef(self) -> float:
         m, t, e = self.missile, self.target, self.env
 
-        p = e.distance / m.range_max
-        pf = 0.5 if m.is_rocket_booster_or_no_power else 0.75
-        if p < pf:
+        effective_range = self.effective_range
+        pf = 0.5 if m.is_rocket_booster_or_no_power else 0.75 # Coefficient at the edge of the range
+        if getattr(m, "range_table", None) is None:
+            p = e.distance / effective_range
+            if p < pf:
+                return 1
+            return pf + (1-pf) * (1 - (p - pf)/(1 - pf))
+
+        # Beyond the flyout range the missile can't reach the target at all.
+        if effective_range <= 0 or e.distance > effective_range:
+            return 0
+        p = e.distance / effective_range
+        knee = self.distance_knee
+        if p <= knee:
             return 1
-        return pf + (1-pf) * (1 - (p - pf)/(1 - pf))
+        return pf + (1-pf) * (1 - (p - knee)/(1 - knee))
     
     @property
     def speed_mod(self) -> float:
@@ -114,12 +174,12 @@ class MissileHitProbilityCalculator:
         m, t, e = self.missile, self.target, self.env
         weight_current = t.weight_empty + t.weight_payload + t.weight_fuel
         weight_valid = t.weight_max - (t.weight_empty + 0.6 * t.weight_fuel)
-        loadout_coef = min(0.99, weight_current - (t.weight_empty+0.6*t.weight_fuel) / weight_valid)
+        loadout_coef = np.minimum(0.99, (weight_current - (t.weight_empty+0.6*t.weight_fuel)) / weight_valid)
         return 0.4 + 0.6 * (1-loadout_coef)
     
     @property
     def agility_damaged_coef(self) -> float:
-        return 1 - self.t.damaged
+        return 1 - self.target.damaged
     
     @property
     def agility_angle_coef(self) -> float:
@@ -1,2 +1,119 @@
 
-# TODO: Non Escape Zone or "effective" range 
\ No newline at end of file
+import warnings
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Optional
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+from .schema import get_schema
+from .missile_kp import GuidanceMode
+from .missile_flyout import (RangeTable, motor_profile, calibrate, flyout, reachable_range, range_table, knot,
+                             reference_launch_altitude, reference_launch_speed)
+
+# Non-escape zone and effective range of the DB weapons from their flyouts (`missile_flyout`). Weapons without a
+# positive `AirRangeMax` are left out, `missile_kp` then keeps the static range for them.
+
+weapon_columns = ["ID", "Name", "Weight", "BurnoutWeight", "Diameter", "AirRangeMax"]
+required_columns = ["ID", "Name", "Weight", "AirRangeMax"]
+default_diameter = 0.2 # m
+default_burnout_fraction = 0.6 # BurnoutWeight / Weight when the DB doesn't give it
+
+@per_db
+@derived()
+def get_weapon_airframes(db_path) -> pd.DataFrame:
+    """Weapons with an air range and the figures of their airframe, defaults filling the columns the DB lacks."""
+    columns = get_schema(db_path).project("DataWeapon", weapon_columns)
+    if not set(required_columns) <= set(columns):
+        return pd.DataFrame(columns=weapon_columns)
+    with connect(db_path) as conn:
+        df = pd.DataFrame(conn.execute(f"SELECT {', '.join(columns)} FROM DataWeapon WHERE AirRangeMax > 0 AND Weight > 0 ORDER BY ID").fetchall(),
+                          columns=columns)
+    df = df.reindex(columns=weapon_columns)
+    df["Weight"] = df["Weight"].astype(np.float64)
+    burnout = df["BurnoutWeight"].astype(np.float64)
+    df["BurnoutWeight"] = burnout.where((burnout > 0) & (burnout < df["Weight"]), df["Weight"] * default_burnout_fraction)
+    diameter = df["Diameter"].astype(np.float64)
+    df["Diameter"] = diameter.where(diameter > 0, default_diameter)
+    df["AirRangeMax"] = df["AirRangeMax"].astype(np.float64)
+    return df
+
+def weapon_airframe(df: pd.DataFrame, sustained: bool, impulse_scale=1.0):
+    return motor_profile(df["Weight"].to_numpy(), df["BurnoutWeight"].to_numpy(), df["Diameter"].to_numpy(),
+                         df["AirRangeMax"].to_numpy(), sustained, impulse_scale)
+
+@per_db
+@derived()
+def get_impulse_scales(db_path, sustained=False) -> pd.Series:
+    """Calibrated impulse scale of every weapon (index: ID), in one parallel integration of the whole list. NaN for
+    weapons the flyout model can't fit to their `AirRangeMax`."""
+    df = get_weapon_airframes(db_path)
+    if len(df) == 0:
+        return pd.Series(dtype=np.float64)
+    scales = calibrate(weapon_airframe(df, sustained), df["AirRangeMax"].to_numpy())
+    if np.isnan(scales).any():
+        warnings.warn(f"No impulse scale fits the AirRangeMax of {np.isnan(scales).sum()} weapons, they keep their static range: "
+                      + ", ".join(df["Name"][np.isnan(scales)].head(10)), RuntimeWarning)
+    return pd.Series(scales, index=df["ID"].to_numpy())
+
+@per_db
+@derived()
+def get_range_table(db_path, weapon_id: int, sustained=False) -> Optional[RangeTable]:
+    """Range table of a weapon, None if it has no air range or the flyout model can't fit it (`calibrate`). Calibrates
+    only this weapon, so it's cheap on demand."""
+    df = get_weapon_airframes(db_path)
+    df = df[df["ID"] == int(weapon_id)]
+    if len(df) == 0:
+        return None
+    row = df.iloc[0]
+    def airframe(scale):
+        return motor_profile(row["Weight"], row["BurnoutWeight"], row["Diameter"], row["AirRangeMax"], sustained, scale)
+    scale = calibrate(airframe(1.0), row["AirRangeMax"])[0]
+    if np.isnan(scale):
+        warnings.warn(f"No impulse scale fits the AirRangeMax of {row['Name']}, it keeps its static range", RuntimeWarning)
+        return None
+    return range_table(airframe(scale), float(row["AirRangeMax"]))
+
+
+@dataclass
+class WeaponMissile:
+    # A `missile_kp.Missile` for a DB weapon, see `weapon_missile`. `range_table` replaces the static range.
+    PoH: float
+    max_target_speed: float
+    range_max: float
+    range_table: Optional[RangeTable] = None
+    is_rocket_booster_or_no_power: bool = True
+    has_capable_vs_seaskimmer: bool = False
+    guidance_mode: GuidanceMode = GuidanceMode.Radar
+
+def weapon_missile(db_path, weapon_id, PoH=0.7, max_target_speed=1500, sustained=False, **kwargs) -> Optional[WeaponMissile]:
+    """A `missile_kp.Missile` for a DB weapon with its flyout range table, None if it has no air range. The DB
+    doesn't tell the motor type, so `sustained` (air breather) is given and the rest comes from `kwargs`. Weapons
+    the flyout model can't fit keep their static `AirRangeMax` without a table."""
+    df = get_weapon_airframes(db_path)
+    df = df[df["ID"] == int(weapon_id)]
+    if len(df) == 0:
+        return None
+    table = get_range_table(db_path, int(weapon_id), bool(sustained))
+    range_max = table.range_max if table is not None else float(df["AirRangeMax"].iloc[0])
+    return WeaponMissile(PoH=PoH, max_target_speed=max_target_speed, range_max=range_max, range_table=table,
+                         is_rocket_booster_or_no_power=not sustained, **kwargs)
+
+
+def nez_frame(db_path, launch_altitude=reference_launch_altitude, launch_speed=reference_launch_speed, target_speed=450.0,
+              sustained=False) -> pd.DataFrame:
+    """Head-on, beam and tail (non-escape) ranges (nmi) of every weapon for one launch, flown as one batch. NaN for
+    the weapons `calibrate` couldn't fit."""
+    df = get_weapon_airframes(db_path)
+    if len(df) == 0:
+        return pd.DataFrame(columns=["ID", "Name", "AirRangeMax (nmi)", "Head-On (nmi)", "Beam (nmi)", "Non-Escape (nmi)"])
+    scales = get_impulse_scales(db_path, bool(sustained)).reindex(df["ID"]).to_numpy()
+    times, distance, speed = flyout(weapon_airframe(df, sustained, scales), launch_altitude, launch_speed * knot)
+    ranges = reachable_range(times[:, None], distance[:, None], speed[:, None], np.array([0.0, 90.0, 180.0]), target_speed * knot) / 1852
+    ranges[np.isnan(scales)] = np.nan # Not calibrated: no flyout range
+    return pd.DataFrame({
+        "ID": df["ID"], "Name": df["Name"], "AirRangeMax (nmi)": df["AirRangeMax"],
+        "Head-On (nmi)": ranges[:, 0].round(1), "Beam (nmi)": ranges[:, 1].round(1), "Non-Escape (nmi)": ranges[:, 2].round(1)
+    })
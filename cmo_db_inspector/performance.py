@@ -0,0 +1,140 @@
+
+import warnings
+import numpy as np
+import pandas as pd
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+from .schema import get_schema
+
+consumption_period_h = 1 / 60 # DataPropulsionPerformance.Consumption is kg per minute
+throttle_loiter, throttle_cruise, throttle_full, throttle_flank = 1, 2, 3, 4
+
+# Mission profile assumptions
+reserve_fraction = 0.1 # Fuel kept for landing & holding
+low_leg_nmi = 50 # Low-altitude dash into and out of the target area for hi-lo-hi
+combat_minutes = 2 # At full throttle, low altitude
+payload_consumption_coef = 0.5 # Consumption multiplier is 1 + coef * payload / WeightMax (drag & weight of stores)
+
+
+class PerformanceTable:
+    """Propulsion curves of every aircraft as dense (aircraft, altitude band, throttle) arrays.
+
+    Missing band/throttle combinations are NaN, so every metric is a NaN-aware reduction over those axes.
+    """
+    def __init__(self, aircraft: pd.DataFrame, curves: pd.DataFrame):
+        # aircraft: ID, Name, WeightEmpty, WeightMax, Fuel; curves: ID (aircraft), AltitudeBand, Throttle, Speed, Consumption
+        self.aircraft = aircraft.reset_index(drop=True)
+        self.ids = self.aircraft["ID"].to_numpy(dtype=np.int64)
+        self.bands = np.sort(curves["AltitudeBand"].unique()) if len(curves) else np.array([1])
+        self.throttles = np.array([throttle_loiter, throttle_cruise, throttle_full, throttle_flank])
+
+        shape = (len(self.ids), len(self.bands), len(self.throttles))
+        self.speed = np.full(shape, np.nan)
+        self.consumption = np.full(shape, np.nan)
+
+        i = pd.Index(self.ids).get_indexer(curves["ID"])
+        j = np.searchsorted(self.bands, curves["AltitudeBand"].to_numpy())
+        k = pd.Index(self.throttles).get_indexer(curves["Throttle"])
+        valid = (i >= 0) & (k >= 0)
+        self.speed[i[valid], j[valid], k[valid]] = curves["Speed"].to_numpy()[valid]
+        self.consumption[i[valid], j[valid], k[valid]] = curves["Consumption"].to_numpy()[valid]
+        self.consumption[self.consumption <= 0] = np.nan
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, name) -> np.ndarray:
+        return self.aircraft[name].to_numpy(dtype=np.float64)
+
+    def as_grid(self, payload) -> np.ndarray:
+        """Broadcast payload (kg) to (n, k): a scalar or a row is shared by every aircraft."""
+        payload = np.asarray(payload, dtype=np.float64)
+        if payload.ndim < 2:
+            payload = payload.reshape(1, -1)
+        return np.broadcast_to(payload, (len(self), payload.shape[1]))
+
+    def consumption_factor(self, payload) -> np.ndarray:
+        return 1 + payload_consumption_coef * payload / self.column("WeightMax")[:, None]
+
+    def fuel_rate(self, throttle, payload) -> np.ndarray:
+        """(n, band, k) kg/h."""
+        t = int(np.searchsorted(self.throttles, throttle))
+        return self.consumption[:, :, t, None] / consumption_period_h * self.consumption_factor(payload)[:, None, :]
+
+    def usable_fuel(self, payload) -> np.ndarray:
+        """(n, k) fuel in kg, limited by internal capacity and by the takeoff weight left after the payload."""
+        fuel = self.column("Fuel")[:, None]
+        headroom = (self.column("WeightMax") - self.column("WeightEmpty"))[:, None] - payload
+        return np.clip(np.minimum(fuel, headroom), 0, None) * (1 - reserve_fraction)
+
+    def efficiency(self, throttle, payload) -> np.ndarray:
+        """(n, band, k) nmi per kg at the given throttle."""
+        t = int(np.searchsorted(self.throttles, throttle))
+        return self.speed[:, :, t, None] / self.fuel_rate(throttle, payload)
+
+    def compute(self, payload) -> dict[str, np.ndarray]:
+        """Every metric as (n, k) arrays, for every aircraft and every payload of the grid."""
+        payload = self.as_grid(payload)
+        fuel = self.usable_fuel(payload)
+
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # All-NaN slices (aircraft without curves) stay NaN
+
+            # Endurance: cheapest band & throttle
+            min_rate = np.nanmin(self.consumption.reshape(len(self), -1), axis=1)[:, None] / consumption_period_h * self.consumption_factor(payload)
+            endurance_h = fuel / min_rate
+
+            cruise = self.efficiency(throttle_cruise, payload)
+            ferry_range = fuel * np.nanmax(cruise, axis=1)
+
+            e_hi = np.nanmax(cruise, axis=1) # Best band
+            e_lo = cruise[:, 0, :] # Lowest band
+            combat_fuel = self.fuel_rate(throttle_full, payload)[:, 0, :] * combat_minutes / 60
+            fuel_mission = fuel - np.nan_to_num(combat_fuel)
+
+            lo_lo_lo = np.clip(fuel_mission * e_lo / 2, 0, None)
+            hi_lo_hi = low_leg_nmi + (fuel_mission - 2 * low_leg_nmi / e_lo) * e_hi / 2
+            hi_lo_hi = np.where(hi_lo_hi >= low_leg_nmi, hi_lo_hi, lo_lo_lo) # Too short to climb: fly the whole profile low
+
+        return {
+            "Endurance (h)": endurance_h,
+            "Ferry Range (nmi)": ferry_range,
+            "Radius hi-lo-hi (nmi)": hi_lo_hi,
+            "Radius lo-lo-lo (nmi)": lo_lo_lo
+        }
+
+    def to_frame(self, payload_kg: float) -> pd.DataFrame:
+        df = self.aircraft[["ID", "Name", "Fuel"]].copy()
+        df["Payload (kg)"] = payload_kg
+        for name, arr in self.compute([payload_kg]).items():
+            df[name] = np.round(arr[:, 0], 1)
+        return df
+
+
+@per_db
+@derived()
+def get_performance_table(db_path) -> PerformanceTable:
+    # `Consumption` is per engine, `ComponentNumber` is the number of engines of the row.
+    engines = "IFNULL(NULLIF(ComponentNumber, 0), 1)" if get_schema(db_path).project("DataAircraftPropulsion", ["ComponentNumber"]) else "1"
+    with connect(db_path) as conn:
+        aircraft = pd.DataFrame(conn.execute(
+            "SELECT DataAircraft.ID, Name, WeightEmpty, WeightMax, IFNULL(Fuel, 0) FROM DataAircraft "
+            "LEFT JOIN (SELECT DataAircraftFuels.ID, SUM(Capacity) AS Fuel FROM DataAircraftFuels "
+            "INNER JOIN DataFuel ON DataAircraftFuels.ComponentID = DataFuel.ID GROUP BY DataAircraftFuels.ID) AS F "
+            "ON DataAircraft.ID = F.ID").fetchall(),
+            columns=["ID", "Name", "WeightEmpty", "WeightMax", "Fuel"])
+        curves = pd.DataFrame(conn.execute(
+            f"SELECT DataAircraftPropulsion.ID, AltitudeBand, Throttle, Speed, Consumption * {engines} FROM DataAircraftPropulsion "
+            "INNER JOIN DataPropulsionPerformance ON DataAircraftPropulsion.ComponentID = DataPropulsionPerformance.ID").fetchall(),
+            columns=["ID", "AltitudeBand", "Throttle", "Speed", "Consumption"])
+    # Aircraft with several propulsion rows (e.g. mixed engines) run them together: the fastest curve sets the speed
+    # and the consumptions add up.
+    curves = curves.groupby(["ID", "AltitudeBand", "Throttle"], as_index=False).agg(Speed=("Speed", "max"), Consumption=("Consumption", "sum"))
+    return PerformanceTable(aircraft, curves)
+
+def radius_frame(db_path, payload_kg: float) -> pd.DataFrame:
+    """Metrics of every aircraft for one payload. Not cached: the payload is typed freely and the vectorized pass over
+    the cached table is cheap."""
+    return get_performance_table(db_path).to_frame(payload_kg)
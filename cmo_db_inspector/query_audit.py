@@ -0,0 +1,287 @@
+
+import argparse
+import os
+import re
+import sqlite3
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from .db_manager import db_cache_dir, get_pool, connection_hooks
+from .sidecar import package_version, sidecar_enabled
+
+# Registry of the SQL statements of the tabs, an auditor running `EXPLAIN QUERY PLAN` and timing each of them, and an
+# index sidecar for the lookups the game DB can't serve without a full scan (its link tables have no index).
+#
+# The game DB stays untouched and SQLite only indexes tables of the same database, so the sidecar `indexes.sqlite`
+# holds indexed copies of the tables that need one. Pooled connections attach it and shadow those tables with TEMP
+# views of the copies (temp objects are resolved before `main`), so the statements use the indexes unchanged.
+
+index_sidecar_name = "indexes.sqlite"
+
+@dataclass(frozen=True)
+class SampleId:
+    """A parameter bound to an existing ID of `table_name` when a statement is timed."""
+    table_name: str
+
+@dataclass
+class QuerySpec:
+    name: str
+    sql: str
+    params: tuple = ()
+    hot: bool = False # Runs on every selection or request, instead of once per DB behind a cached producer
+
+
+def registered_queries() -> list[QuerySpec]:
+    """The statements are defined where they are used; this collects them."""
+    from .selector import table_info_map
+    from .aircraft import AircraftTab
+    from .sensor import RadarSearchTrack
+    from .insights_tab import InsightsTab
+    from .lua_generator import unit_tables
+
+    specs = []
+    for name, info in table_info_map.items():
+        specs.append(QuerySpec(f"Selector.{name}.count", info.count_command, ("eagle",), hot=True))
+        specs.append(QuerySpec(f"Selector.{name}.page", info.select_command_ranged, ("eagle", 50, 0), hot=True))
+        specs.append(QuerySpec(f"Selector.{name}.index", info.select_command_root))
+        specs.append(QuerySpec(f"Raw.{name}", f"SELECT * FROM {info.table_name} WHERE ID = ?", (SampleId(info.table_name),), hot=True))
+
+    for name, sql in AircraftTab.query_commands.items():
+        table_name = "DataPropulsionPerformance" if name == "Performances" else "DataAircraft"
+        specs.append(QuerySpec(f"AircraftTab.{name}", sql, (SampleId(table_name),), hot=True))
+    for tab, table_name in [(AircraftTab, "DataAircraft"), (RadarSearchTrack, "DataSensor")]:
+        for name, sql in tab.tags_command_map.items():
+            params = (SampleId(table_name),) if name in tab.tags_enum_map else (SampleId(table_name), "")
+            specs.append(QuerySpec(f"{tab.__name__}.{name}", sql, params, hot=True))
+    specs.append(QuerySpec("RadarSearchTrack.query", RadarSearchTrack.query_command, (SampleId("DataSensor"),), hot=True))
+
+    for name, sql in InsightsTab.query_commands.items():
+        specs.append(QuerySpec(f"InsightsTab.{name}", sql))
+    for name, table_name in unit_tables.items():
+        specs.append(QuerySpec(f"LuaGenerator.{name}", f"SELECT ID, Name FROM {table_name} WHERE ID IN (?)", (SampleId(table_name),), hot=True))
+    return specs
+
+
+def open_connection(db_path, index_sidecar=False) -> sqlite3.Connection:
+    """A private read-only connection, with the index sidecar attached if asked and built."""
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    if index_sidecar:
+        attach_index_sidecar(db_path, conn)
+    return conn
+
+def resolve_params(conn, params: tuple) -> tuple:
+    rl = []
+    for p in params:
+        if isinstance(p, SampleId):
+            row = conn.execute(f"SELECT ID FROM {p.table_name} WHERE ID IS NOT NULL LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM {p.table_name})").fetchone()
+            p = 0 if row is None else row[0]
+        rl.append(p)
+    return tuple(rl)
+
+def explain(conn, sql: str, params: tuple) -> list[str]:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+def time_query(conn, sql: str, params: tuple, repeat: int) -> tuple[float, int]:
+    """Median wall time (ms) and row count."""
+    timings, n = [], 0
+    for _ in range(repeat):
+        t = time.perf_counter()
+        n = len(conn.execute(sql, params).fetchall())
+        timings.append((time.perf_counter() - t) * 1000)
+    return statistics.median(timings) if timings else float("nan"), n
+
+
+sql_keywords = {"INNER", "LEFT", "RIGHT", "OUTER", "CROSS", "JOIN", "ON", "WHERE", "GROUP", "ORDER", "LIMIT", "USING", "NATURAL", "AS"}
+scan_re = re.compile(r"^SCAN (?:\w+\.)?(\w+)$")
+automatic_re = re.compile(r"^SEARCH (?:\w+\.)?(\w+) USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX \(([^)]*)\)")
+source_re = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+operand = r"(?:(\w+)\.)?(\w+|\?)"
+equality_re = re.compile(operand + r"\s*=\s*" + operand)
+
+def table_aliases(sql: str) -> dict[str, str]:
+    """Name or alias used in the plan -> table name."""
+    aliases = {}
+    for table_name, alias in source_re.findall(sql):
+        aliases[table_name] = table_name
+        if alias and alias.upper() not in sql_keywords:
+            aliases[alias] = table_name
+    return aliases
+
+def equality_columns(sql: str, table_name: str, alias: str, columns: set[str]) -> list[str]:
+    """Columns of one table compared with `=` in the statement, those compared with a parameter or constant first."""
+    bound, joined = [], []
+    for q1, c1, q2, c2 in equality_re.findall(sql):
+        for q, c, other in [(q1, c1, c2), (q2, c2, c1)]:
+            if c in columns and q in ("", table_name, alias):
+                target = bound if other == "?" or other.isdigit() else joined
+                if c not in target:
+                    target.append(c)
+    return bound or joined
+
+def recommend(conn, sql: str, plan: list[str]) -> list[tuple[str, tuple[str, ...]]]:
+    """(table, columns) indexes that would turn the full scans and automatic indexes of a plan into searches."""
+    schema = get_schema_of(conn)
+    aliases = table_aliases(sql)
+    rl = []
+    for detail in plan:
+        if m := automatic_re.match(detail):
+            table_name = aliases.get(m.group(1), m.group(1))
+            columns = tuple(c.split("=")[0].strip() for c in m.group(2).split(" AND "))
+        elif m := scan_re.match(detail):
+            table_name = aliases.get(m.group(1), m.group(1))
+            columns = tuple(equality_columns(sql, table_name, m.group(1), schema.get(table_name, set()))[:2])
+        else:
+            continue
+        if table_name in schema and columns and (table_name, columns) not in rl:
+            rl.append((table_name, columns))
+    return rl
+
+def get_schema_of(conn) -> dict[str, set[str]]:
+    # `get_schema` is keyed by DB path, the auditor may run on a connection with shadowed tables, so read `main` here.
+    tables = [r[0] for r in conn.execute("SELECT name FROM main.sqlite_master WHERE type='table'")]
+    return {t: {r[1] for r in conn.execute(f"PRAGMA main.table_info([{t}])")} for t in tables}
+
+
+def audit(db_path, repeat=5, index_sidecar=False, specs: Optional[list[QuerySpec]] = None) -> pd.DataFrame:
+    """Plan, flags, timing and recommended indexes of every registered statement."""
+    specs = registered_queries() if specs is None else specs
+    rows = []
+    conn = open_connection(db_path, index_sidecar)
+    try:
+        for spec in specs:
+            try:
+                params = resolve_params(conn, spec.params)
+                plan = explain(conn, spec.sql, params)
+                ms, n = time_query(conn, spec.sql, params, repeat)
+            except sqlite3.Error as e: # A table or column this DB version doesn't have
+                rows.append({"Name": spec.name, "Hot": spec.hot, "Plan": f"Error: {e}"})
+                continue
+            rows.append({
+                "Name": spec.name,
+                "Hot": spec.hot,
+                "Full Scan": any(scan_re.match(d) for d in plan),
+                "Temp B-Tree": any("USE TEMP B-TREE" in d for d in plan),
+                "Median (ms)": round(ms, 3),
+                "Rows": n,
+                "Recommended Index": "; ".join(f"{t}({', '.join(c)})" for t, c in recommend(conn, spec.sql, plan)),
+                "Plan": " | ".join(plan),
+            })
+    finally:
+        conn.close()
+    return pd.DataFrame(rows)
+
+def recommend_indexes(db_path, specs: Optional[list[QuerySpec]] = None) -> dict[str, list[tuple[str, ...]]]:
+    """Table -> index columns, for the hot statements."""
+    specs = registered_queries() if specs is None else specs
+    rd: dict[str, list[tuple[str, ...]]] = {}
+    conn = open_connection(db_path)
+    try:
+        for spec in specs:
+            if not spec.hot:
+                continue
+            try:
+                plan = explain(conn, spec.sql, resolve_params(conn, spec.params))
+            except sqlite3.Error:
+                continue
+            for table_name, columns in recommend(conn, spec.sql, plan):
+                if columns not in rd.setdefault(table_name, []):
+                    rd[table_name].append(columns)
+    finally:
+        conn.close()
+    return rd
+
+
+def index_sidecar_path(db_path) -> Path:
+    return db_cache_dir(db_path) / index_sidecar_name
+
+def read_manifest(path: Path) -> Optional[list[tuple[str, str]]]:
+    """(table, index) rows of a sidecar built by this code version, None otherwise. The version covers the whole
+    package since the recommendations come from the statements of every tab."""
+    if not path.exists():
+        return None
+    conn = sqlite3.connect(path.as_uri() + "?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT table_name, index_name, version FROM manifest").fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    if any(version != package_version() for _, _, version in rows):
+        return None
+    return [(t, i) for t, i, _ in rows]
+
+def build_index_sidecar(db_path, force=False) -> Path:
+    """Write the indexed copies recommended for the hot statements, unless a sidecar of this version exists. Pooled
+    connections of the DB are refreshed so they pick it up."""
+    path = index_sidecar_path(db_path)
+    if not force and read_manifest(path) is not None:
+        return path
+    recommendations = recommend_indexes(db_path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = open_connection(db_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS idx", (str(tmp),))
+        conn.execute("CREATE TABLE idx.manifest (table_name TEXT, index_name TEXT, columns TEXT, version TEXT)")
+        version = package_version()
+        for table_name, column_sets in recommendations.items():
+            conn.execute(f"CREATE TABLE idx.[{table_name}] AS SELECT * FROM main.[{table_name}]")
+            for columns in column_sets:
+                index_name = f"ix_{table_name}_{'_'.join(columns)}"
+                conn.execute(f"CREATE INDEX idx.[{index_name}] ON [{table_name}] ({', '.join(f'[{c}]' for c in columns)})")
+                conn.execute("INSERT INTO idx.manifest VALUES (?, ?, ?, ?)", (table_name, index_name, ",".join(columns), version))
+        conn.commit()
+        conn.execute("ANALYZE idx")
+        conn.commit()
+        conn.execute("DETACH DATABASE idx")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    get_pool(db_path).refresh()
+    return path
+
+def attach_index_sidecar(db_path, conn: sqlite3.Connection):
+    """Connection hook: shadow the indexed tables with TEMP views of the sidecar copies."""
+    path = index_sidecar_path(db_path)
+    manifest = read_manifest(path)
+    if not manifest:
+        return
+    try:
+        conn.execute("ATTACH DATABASE ? AS idx", (path.as_uri() + "?mode=ro",))
+        for table_name in sorted({t for t, _ in manifest}):
+            conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS [{table_name}] AS SELECT * FROM idx.[{table_name}]")
+    except sqlite3.Error as e:
+        print(f"Index sidecar attach failed for {db_path}: {e!r}")
+
+def enable_index_sidecar():
+    """Attach built index sidecars to every new pooled connection (no-op when sidecars are disabled)."""
+    if sidecar_enabled() and attach_index_sidecar not in connection_hooks:
+        connection_hooks.append(attach_index_sidecar)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit the query plans of the registered statements against a CMO DB.")
+    parser.add_argument("db_path")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per statement (median is reported)")
+    parser.add_argument("--build", action="store_true", help="Build the index sidecar and audit again with it")
+    parser.add_argument("--csv", help="Write the report(s) to this CSV file")
+    args = parser.parse_args()
+
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200, "display.max_colwidth", 60):
+        report = audit(args.db_path, args.repeat).assign(Sidecar=False)
+        print(report.drop(columns="Plan"))
+        if args.build:
+            print(f"Index sidecar: {build_index_sidecar(args.db_path, force=True)}")
+            after = audit(args.db_path, args.repeat, index_sidecar=True).assign(Sidecar=True)
+            print(after.drop(columns="Plan"))
+            report = pd.concat([report, after], ignore_index=True)
+    if args.csv:
+        report.to_csv(args.csv, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,18 @@ from .utils import light_speed, inv_db
 # T = npt.ArrayLike
 T = Union[np.ndarray, float]
 
+earth_radius = 6_371_000 # m
+refraction_k = 4 / 3 # Effective earth radius factor of the standard atmosphere
+default_scan_interval = 5.0 # s, for sensors without a positive `ScanInterval`
+false_alarm_probability = 1e-6
+reference_pd = 0.5 # Single-scan Pd at the power-limited detection range
+max_scans = 4096
+
+def radar_horizon(sensor_altitude: T, target_altitude: T, k=refraction_k) -> T:
+    """Line-of-sight range (m) between two altitudes (m) over a smooth earth with standard refraction."""
+    r = k * earth_radius
+    return np.sqrt(2 * r * np.maximum(sensor_altitude, 0)) + np.sqrt(2 * r * np.maximum(target_altitude, 0))
+
 class IRadar(Protocol):
     @property
     def peak_power(self) -> T:
@@ -67,3 +79,86 @@ class IRadar(Protocol):
     
     def detection_range(self, radar_cross_section: float) -> T:
         return np.minimum(self.adjusted_range(radar_cross_section), self.PRF_range)
+
+    # Target altitude bounds (m) of the sensor, unbounded unless the implementation knows them.
+    @property
+    def altitude_min(self) -> T:
+        return -np.inf
+
+    @property
+    def altitude_max(self) -> T:
+        return np.inf
+
+    @property
+    def scan_interval(self) -> T:
+        return default_scan_interval
+
+
+def altitude_bounds(altitude_min: T, altitude_max: T, altitude_min_asl: T, altitude_max_asl: T) -> tuple[T, T]:
+    """Target altitude bounds from the `DataSensor` AGL and ASL limits, read as one band over a sea-level surface.
+    A non-positive maximum means no limit."""
+    lo = np.maximum(altitude_min, altitude_min_asl)
+    hi = np.minimum(np.where(np.asarray(altitude_max) > 0, altitude_max, np.inf),
+                    np.where(np.asarray(altitude_max_asl) > 0, altitude_max_asl, np.inf))
+    return lo, hi
+
+def coverage_grid(radar: IRadar, sensor_altitudes, target_altitudes, dbsm_arr) -> np.ndarray:
+    """Detection ranges (m) limited by the radar horizon and the target altitude bounds of the radars, as a
+    (n_radar, n_sensor_altitude, n_target_altitude, n_rcs) array. `radar` is a single radar or a columnar table
+    (properties of shape (n, 1)); everything is broadcast in one evaluation.
+    """
+    sensor_altitudes = np.asarray(sensor_altitudes, dtype=np.float64).reshape(1, -1, 1, 1)
+    target_altitudes = np.asarray(target_altitudes, dtype=np.float64).reshape(1, 1, -1, 1)
+    rcs_m2 = inv_db(np.asarray(dbsm_arr, dtype=np.float64)).reshape(1, -1)
+
+    free_space = np.atleast_2d(radar.detection_range(rcs_m2)) # (n_radar, n_rcs)
+    n = free_space.shape[0]
+    free_space = free_space.reshape(n, 1, 1, -1)
+    horizon = radar_horizon(sensor_altitudes, target_altitudes)
+    lo = np.broadcast_to(np.asarray(radar.altitude_min, dtype=np.float64).reshape(-1, 1, 1, 1), (n, 1, 1, 1))
+    hi = np.broadcast_to(np.asarray(radar.altitude_max, dtype=np.float64).reshape(-1, 1, 1, 1), (n, 1, 1, 1))
+    visible = (lo <= target_altitudes) & (target_altitudes <= hi)
+    return np.where(visible, np.minimum(free_space, horizon), 0.0)
+
+
+def reference_snr(pd=reference_pd, pfa=false_alarm_probability) -> float:
+    """Single-scan SNR (linear) giving `pd` against a Swerling I target."""
+    return np.log(pfa) / np.log(pd) - 1
+
+def single_scan_pd(range_m: T, power_range: T, max_range: T = np.inf, pfa=false_alarm_probability) -> T:
+    """Swerling I detection probability, Pd = Pfa^(1 / (1 + SNR)). The SNR falls as R^-4 from `reference_snr` at
+    `power_range`, the radar equation range, and nothing is detected beyond `max_range` (PRF range, horizon)."""
+    with np.errstate(divide="ignore", over="ignore"):
+        snr = reference_snr(pfa=pfa) * (power_range / np.maximum(range_m, 1.0)) ** 4
+    return np.where(range_m <= max_range, pfa ** (1 / (1 + snr)), 0.0)
+
+def cumulative_pd(radar: IRadar, dbsm_arr, start_ranges, closing_speeds, offsets, times) -> np.ndarray:
+    """Cumulative detection probability along straight closing trajectories, scans spaced by the scan interval of
+    each radar, as a (n_radar, n_rcs, n_trajectory, n_time) array.
+
+    `dbsm_arr` is a row of RCS values shared by every radar, or a (n_radar, n_rcs) array (e.g. the front/side/rear
+    signature in the band of each radar). Trajectory k starts at `start_ranges[k]` (m) along track, closes at
+    `closing_speeds[k]` (m/s) and passes `offsets[k]` (m) abeam of the radar. Scans beyond `max_scans` are dropped.
+    """
+    dbsm = np.atleast_2d(np.asarray(dbsm_arr, dtype=np.float64))
+    start_ranges, closing_speeds, offsets = (np.asarray(x, dtype=np.float64).reshape(1, 1, -1, 1) for x in (start_ranges, closing_speeds, offsets))
+    times = np.asarray(times, dtype=np.float64)
+
+    power = np.atleast_2d(radar.adjusted_range(inv_db(dbsm))) # (n_radar, n_rcs)
+    n = power.shape[0]
+    power = power.reshape(n, -1, 1, 1)
+    prf_range = np.broadcast_to(np.asarray(radar.PRF_range, dtype=np.float64).reshape(-1, 1, 1, 1), (n, 1, 1, 1))
+    scan = np.asarray(radar.scan_interval, dtype=np.float64).reshape(-1, 1, 1, 1)
+    scan = np.broadcast_to(np.where(scan > 0, scan, default_scan_interval), (n, 1, 1, 1))
+
+    n_scans = int(min(np.ceil(times.max(initial=0) / scan.min()) + 1, max_scans))
+    scan_times = scan * np.arange(n_scans).reshape(1, 1, 1, -1) # (n_radar, 1, 1, n_scans)
+    along = start_ranges - closing_speeds * scan_times
+    ranges = np.sqrt(along ** 2 + offsets ** 2) # (n_radar, 1, n_trajectory, n_scans)
+    pd = single_scan_pd(ranges, power, prf_range)
+    with np.errstate(divide="ignore"):
+        log_miss = np.cumsum(np.log1p(-pd), axis=-1) # (n_radar, n_rcs, n_trajectory, n_scans)
+
+    done = np.clip(np.floor(times.reshape(1, 1, 1, -1) / scan).astype(np.int64), 0, n_scans - 1) # Last scan by each time
+    done = np.broadcast_to(done, log_miss.shape[:-1] + (len(times),))
+    return 1 - np.exp(np.take_along_axis(log_miss, done, axis=-1))
@@ -5,6 +5,7 @@ import numpy as np
 
 from .radar_equation import IRadar
 from .utils import nmi, inv_db
+from .figure_cache import figure_cache
 
 class RadarUI(IRadar):
     def __init__(self, ui, data):
@@ -95,8 +96,8 @@ class RadarEquationTab:
         def u(s):
             return {self.ui[name] for name in s}
 
-        self.ui["calculate_single"].click(self.calculate_single, u(radar_inputs | single_inputs), u(derived_outputs | single_outputs))
-        self.ui["calculate_3d"].click(self.calculate_3d, u(radar_inputs | _3d_inputs), u(derived_outputs | _3d_outputs))
+        self.ui["calculate_single"].click(self.calculate_single, u(radar_inputs | single_inputs), u(derived_outputs | single_outputs), api_name="radar_single")
+        self.ui["calculate_3d"].click(self.calculate_3d, u(radar_inputs | _3d_inputs), u(derived_outputs | _3d_outputs), api_name="radar_3d")
 
         return self
     
@@ -149,10 +150,13 @@ class RadarEquationTab:
 
         df_pivoted = pd.concat(sdf_list) # TODO: There should be a pandas method to make it prettier.
 
-        import plotly.express as px
+        def build():
+            import plotly.express as px
+            return px.line_polar(df_pivoted, r='Range', theta='Direction', line_close=True, color="Band", title="Detection Range (m)")
 
-        fig = px.line_polar(df_pivoted, r='Range', theta='Direction', line_close=True, color="Band", title="Detection Range (m)")
-        _rd["result_3d_plot"] = fig
+        # The figure only depends on the plotted ranges, so radars and targets giving the same ranges share it.
+        params = tuple(df_pivoted.itertuples(index=False, name=None))
+        _rd["result_3d_plot"] = figure_cache.get(None, "detection_range_polar", params, build)
 
         return {self.ui[name]: value for name, value in _rd.items()}
 
@@ -0,0 +1,172 @@
+
+import numpy as np
+import pandas as pd
+
+from .radar_equation import IRadar, altitude_bounds, coverage_grid
+from .frequency import get_frequency_catalog, parse_band
+from .enums import get_enum_registry
+from .utils import connect, inv_db, nmi
+from .db_manager import per_db
+from .sidecar import derived
+
+radar_columns = ["ID", "Name", "RadarPeakPower", "RadarVerticalBeamwidth", "RadarHorizontalBeamwidth",
+                 "RadarPRF", "RadarSystemNoiseLevel", "RadarProcessingGainLoss", "RadarPulseWidth",
+                 "AltitudeMin", "AltitudeMax", "AltitudeMin_ASL", "AltitudeMax_ASL", "ScanInterval"]
+
+class RadarTable(IRadar):
+    """Columnar `IRadar` over every search & track radar of a DB.
+
+    Properties are column vectors of shape (n, 1), so `detection_range` broadcasts against a row of RCS values.
+    """
+    def __init__(self, df: pd.DataFrame, minimum_power=1e-15):
+        self.df = df.reset_index(drop=True)
+        self._minimum_power = minimum_power
+
+    def __len__(self):
+        return len(self.df)
+
+    def column(self, name) -> np.ndarray:
+        return self.df[name].to_numpy(dtype=np.float64).reshape(-1, 1)
+
+    @property
+    def peak_power(self):
+        return self.column("RadarPeakPower")
+
+    @property
+    def frequency(self):
+        return self.column("Frequency")
+
+    @property
+    def minimum_power(self):
+        return self._minimum_power
+
+    @property
+    def vertical_beamwidth(self):
+        return self.column("RadarVerticalBeamwidth")
+
+    @property
+    def horizontal_beamwidth(self):
+        return self.column("RadarHorizontalBeamwidth")
+
+    @property
+    def pulse_repetition_frequency(self):
+        return self.column("RadarPRF")
+
+    @property
+    def system_noise_level(self):
+        return self.column("RadarSystemNoiseLevel")
+
+    @property
+    def processing_gain_loss(self):
+        return self.column("RadarProcessingGainLoss")
+
+    @property
+    def altitude_min(self):
+        return altitude_bounds(*(self.column(c) for c in ["AltitudeMin", "AltitudeMax", "AltitudeMin_ASL", "AltitudeMax_ASL"]))[0]
+
+    @property
+    def altitude_max(self):
+        return altitude_bounds(*(self.column(c) for c in ["AltitudeMin", "AltitudeMax", "AltitudeMin_ASL", "AltitudeMax_ASL"]))[1]
+
+    @property
+    def scan_interval(self):
+        return self.column("ScanInterval")
+
+    def subset(self, ids) -> "RadarTable":
+        return RadarTable(self.df[self.df["ID"].isin(ids)], self._minimum_power)
+
+    def detection_ranges(self, dbsm_arr) -> np.ndarray:
+        """(n_radar, n_rcs) detection ranges in meters."""
+        rcs_m2 = inv_db(np.asarray(dbsm_arr, dtype=np.float64)).reshape(1, -1)
+        return self.detection_range(rcs_m2)
+
+    def signature_columns(self, signatures: "SignatureTable") -> np.ndarray:
+        """Position of the signature band used by each radar: the band containing its frequency, else the closest one."""
+        f = self.frequency # (n_radar, 1)
+        inside = (signatures.lower <= f) & (f <= signatures.upper)
+        closest = np.argmin(np.abs(np.log(f) - np.log(np.sqrt(signatures.lower * signatures.upper))), axis=1)
+        return np.where(inside.any(axis=1), np.argmax(inside, axis=1), closest)
+
+    def target_detection_ranges(self, signatures: "SignatureTable", aspect="Front") -> np.ndarray:
+        """(n_radar, n_target) detection ranges in meters against every target of `signatures`, using the band each radar sees."""
+        if len(signatures.types) == 0:
+            return np.full((len(self), len(signatures)), np.nan)
+        dbsm = signatures.dbsm[aspect][:, self.signature_columns(signatures)].T # (n_radar, n_target)
+        return self.detection_range(inv_db(dbsm))
+
+
+@per_db
+@derived()
+def get_radar_table(db_path) -> RadarTable:
+    """Radars with a positive peak power, PRF and beamwidths and at least one parseable band."""
+    with connect(db_path) as conn:
+        res = conn.execute(
+            f"SELECT {', '.join(radar_columns)} FROM DataSensor "
+            "WHERE RadarPeakPower > 0 AND RadarPRF > 0 AND RadarVerticalBeamwidth > 0 AND RadarHorizontalBeamwidth > 0").fetchall()
+    df = pd.DataFrame(res, columns=radar_columns)
+    df["Frequency"] = get_frequency_catalog(db_path).sensor_frequencies(df["ID"])
+    df = df[np.isfinite(df["Frequency"])]
+    return RadarTable(df)
+
+
+class SignatureTable:
+    """Radar signatures (dBsm) of every aircraft as dense (aircraft, band) arrays per aspect.
+
+    Bands come from the `EnumSignatureType` descriptions (e.g. "Radar, A-D Band (30-2000 MHz)"); missing values are NaN.
+    """
+    aspects = ["Front", "Side", "Rear", "Top"]
+
+    def __init__(self, ids, types, descriptions, rows: pd.DataFrame):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.types = np.asarray(types, dtype=np.int64)
+        self.descriptions = list(descriptions)
+        bands = [parse_band(s) for s in self.descriptions]
+        self.lower = np.array([b[0] for b in bands])
+        self.upper = np.array([b[1] for b in bands])
+
+        i = pd.Index(self.ids).get_indexer(rows["ID"])
+        j = pd.Index(self.types).get_indexer(rows["Type"])
+        valid = (i >= 0) & (j >= 0)
+        self.dbsm = {}
+        for aspect in self.aspects:
+            arr = np.full((len(self.ids), len(self.types)), np.nan)
+            arr[i[valid], j[valid]] = rows[aspect].to_numpy(dtype=np.float64)[valid]
+            self.dbsm[aspect] = arr
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, ids) -> np.ndarray:
+        return pd.Index(self.ids).get_indexer(np.asarray(ids, dtype=np.int64))
+
+
+@per_db
+@derived()
+def get_signature_table(db_path) -> SignatureTable:
+    """Radar-band signatures of every aircraft, see `SignatureTable`."""
+    enum = get_enum_registry(db_path)["EnumSignatureType"]
+    radar_types = [(code, desc) for code, desc in zip(enum.ids.tolist(), enum.descriptions.tolist())
+                   if "Radar" in str(desc) and parse_band(desc) is not None]
+    types = [code for code, _ in radar_types]
+    with connect(db_path) as conn:
+        ids = [r[0] for r in conn.execute("SELECT ID FROM DataAircraft ORDER BY ID").fetchall()]
+        rows = pd.DataFrame(conn.execute(
+            f"SELECT ID, Type, {', '.join(SignatureTable.aspects)} FROM DataAircraftSignatures "
+            f"WHERE Type IN ({', '.join('?' * len(types))})", types).fetchall(),
+            columns=["ID", "Type", *SignatureTable.aspects])
+    return SignatureTable(ids, types, [desc for _, desc in radar_types], rows)
+
+
+penetration_altitudes = [15, 30, 60, 150, 300, 1000] # Target altitudes (m) of the low-altitude penetration table
+
+def penetration_frame(db_path, sensor_altitude: float, dbsm: float) -> pd.DataFrame:
+    """Detection range (nmi) of every radar against a low flying target, limited by the radar horizon and the target
+    altitude bounds of the radar. One `coverage_grid` evaluation over the whole fleet, not cached: the inputs are typed
+    freely and it takes a few ms."""
+    radars = get_radar_table(db_path)
+    ranges = coverage_grid(radars, [sensor_altitude], penetration_altitudes, [dbsm])[:, 0, :, 0] / 1000 / nmi
+    free_space = radars.detection_ranges([dbsm])[:, 0] / 1000 / nmi
+    df = pd.DataFrame({"ID": radars.df["ID"].astype(int), "Name": radars.df["Name"], "Free Space (nmi)": free_space.round(1)})
+    for j, altitude in enumerate(penetration_altitudes):
+        df[f"{altitude} m (nmi)"] = ranges[:, j].round(1)
+    return df
@@ -0,0 +1,102 @@
+
+import gradio as gr
+from typing import Optional
+
+from .interfaces import DbPathProvider
+from .utils import connect, text_grid, delta_updates
+from .schema import get_schema, resolve_sections
+
+class RawTableTab:
+    """Shows every column of one `Data*` row, projected by column name from the schema catalog.
+
+    Only the columns of the visible sections are fetched and only the values which changed since the last selection
+    (of the same session) are sent.
+    """
+    table_name: str = ""
+    section_arr: Optional[list] = None # See `schema.resolve_sections`, None means a single section
+    info_map: dict[str, str] = {}
+
+    def __init__(self, db_path_provider: DbPathProvider, elements_per_row = 5):
+        self.db_path_provider = db_path_provider
+        self.elements_per_row = elements_per_row
+        self.name_to_component: dict[str, gr.components.Component] = {}
+        self.section_columns: dict[str, list[str]] = {}
+        self.section_to_component: dict[str, gr.components.Component] = {}
+        self.sections_checkbox_group = None
+
+    def build(self):
+        columns = get_schema(self.db_path_provider.get_init_db_path()).columns(self.table_name)
+
+        if self.section_arr is None:
+            self.section_columns[""] = columns
+            self.name_to_component.update(text_grid(columns, self.elements_per_row, self.info_map))
+        else:
+            sections = resolve_sections(columns, self.section_arr)
+            section_names = [section_name for section_name, _ in sections]
+            self.sections_checkbox_group = gr.CheckboxGroup(section_names, value=section_names, label="Sections")
+            for section_name, indexes in sections:
+                self.section_columns[section_name] = indexes
+                with gr.Accordion(section_name) as accordion:
+                    self.name_to_component.update(text_grid(indexes, self.elements_per_row, self.info_map))
+                self.section_to_component[section_name] = accordion
+
+        self.selected_id = gr.State(None)
+        self.last_values = gr.State(None)
+
+        return self
+
+    def bind(self):
+        if self.sections_checkbox_group is not None:
+            inputs = self.db_path_provider.get_db_inputs() | {self.sections_checkbox_group, self.selected_id, self.last_values}
+            outputs = set()
+            self.register_outputs(outputs)
+            outputs.update(self.section_to_component.values())
+            self.sections_checkbox_group.change(self.update_sections, inputs, outputs)
+        return self
+
+    def get_visible_sections(self, data) -> list[str]:
+        if self.sections_checkbox_group is None:
+            return list(self.section_columns)
+        return data.get(self.sections_checkbox_group, list(self.section_columns))
+
+    def updates(self, data, _id):
+        _id = int(_id)
+        db_path = self.db_path_provider.get_db_path(data)
+
+        columns = [c for section_name in self.get_visible_sections(data) for c in self.section_columns[section_name]]
+        present = get_schema(db_path).project(self.table_name, columns)
+
+        if len(present) == 0:
+            return {self.selected_id: _id}
+
+        with connect(db_path) as conn:
+            cur = conn.execute(f"SELECT {', '.join(f'[{c}]' for c in present)} FROM {self.table_name} WHERE ID = ?", (_id,))
+            res = cur.fetchone()
+
+        if res is None:
+            return {self.selected_id: _id}
+
+        row = dict(zip(present, res))
+        values = {c: row.get(c, "") for c in columns} # Columns the selected DB version doesn't have are cleared.
+        changed, last_values = delta_updates(data.get(self.last_values), values)
+
+        rd = {self.name_to_component[name]: value for name, value in changed.items()}
+        rd.update({self.selected_id: _id, self.last_values: last_values})
+        return rd
+
+    def update_sections(self, data):
+        visible = set(self.get_visible_sections(data))
+        rd = {accordion: gr.update(visible=section_name in visible) for section_name, accordion in self.section_to_component.items()}
+        if data[self.selected_id] is not None:
+            rd.update(self.updates(data, data[self.selected_id]))
+        return rd
+
+    def register_inputs(self, inputs: set):
+        inputs.update({self.selected_id, self.last_values})
+        if self.sections_checkbox_group is not None:
+            inputs.add(self.sections_checkbox_group)
+
+    def register_outputs(self, outputs: set):
+        for component in self.name_to_component.values():
+            outputs.add(component)
+        outputs.update({self.selected_id, self.last_values})
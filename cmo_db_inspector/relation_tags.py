@@ -0,0 +1,85 @@
+
+import gradio as gr
+from typing import Optional
+
+from .utils import connect, tags, skip_updates
+from .enums import get_enum_registry, EnumRegistry
+
+class RelationTags:
+    """Tags of a one-to-many relation (aircraft -> loadouts, ...), loaded one page at a time.
+
+    `command` takes `(ID, filter)` parameters and must have an ORDER BY on a stable key, since pages are fetched with
+    LIMIT/OFFSET by separate queries. Enum relations instead take `(ID,)`, return raw codes and are decoded and
+    filtered in Python (they only have a handful of rows).
+    """
+    def __init__(self, name: str, command: str, enum_name: Optional[str] = None, page_size=50):
+        self.name = name
+        self.command = command
+        self.enum_name = enum_name
+        self.page_size = page_size
+
+    def build(self):
+        self.checkbox_group = tags([], label=self.name)
+        with gr.Row():
+            self.filter_text = gr.Text("", show_label=False, placeholder=f"Filter {self.name} (Enter)", scale=4)
+            self.more_button = gr.Button("More", size="sm", scale=1)
+        self.items = gr.State([])
+        self.count = gr.State(0)
+        return self
+
+    def bind(self, db_path_provider, selected_id):
+        inputs = db_path_provider.get_db_inputs() | {selected_id, self.filter_text, self.items, self.count}
+        outputs = {self.checkbox_group, self.items, self.count}
+
+        def first_page(data):
+            if data[selected_id] is None:
+                return skip_updates([self.checkbox_group])
+            db_path = db_path_provider.get_db_path(data)
+            with connect(db_path) as conn:
+                return self.first_page(conn, get_enum_registry(db_path), data[selected_id], data[self.filter_text])
+
+        def next_page(data):
+            if data[selected_id] is None:
+                return skip_updates([self.checkbox_group])
+            db_path = db_path_provider.get_db_path(data)
+            with connect(db_path) as conn:
+                return self.next_page(conn, get_enum_registry(db_path), data[selected_id], data[self.filter_text], data[self.items], data[self.count])
+
+        self.filter_text.submit(first_page, inputs, outputs)
+        self.more_button.click(next_page, inputs, outputs)
+        return self
+
+    def fetch(self, conn, enums: EnumRegistry, _id, match_str: str, offset: int) -> tuple[list, Optional[int]]:
+        """Return one page and, for the first page only, the total count."""
+        if self.enum_name is not None:
+            codes = [r[0] for r in conn.execute(self.command, (_id,)).fetchall()]
+            rl = enums[self.enum_name].decode_list(codes)
+            rl = [s for s in rl if match_str.lower() in s.lower()]
+            return rl[offset:offset+self.page_size], len(rl)
+
+        count = None
+        if offset == 0:
+            count = conn.execute(f"SELECT COUNT(*) FROM ({self.command})", (_id, match_str)).fetchone()[0]
+        res = conn.execute(self.command + " LIMIT ? OFFSET ?", (_id, match_str, self.page_size, offset)).fetchall()
+        return [r[0] for r in res], count
+
+    def render(self, items: list, count: int) -> dict:
+        label = self.name if len(items) >= count else f"{self.name} ({len(items)}/{count})"
+        return {
+            self.checkbox_group: gr.update(value=items, choices=items, label=label),
+            self.items: items,
+            self.count: count
+        }
+
+    def first_page(self, conn, enums: EnumRegistry, _id, match_str="") -> dict:
+        items, count = self.fetch(conn, enums, int(_id), match_str, 0)
+        return self.render(items, count)
+
+    def next_page(self, conn, enums: EnumRegistry, _id, match_str, items: list, count: int) -> dict:
+        if len(items) >= count:
+            return skip_updates([self.checkbox_group])
+        page, _ = self.fetch(conn, enums, int(_id), match_str, len(items))
+        return self.render(items + page, count)
+
+    def register_outputs(self, outputs: set):
+        outputs.update({self.checkbox_group, self.items, self.count, self.filter_text})
@@ -0,0 +1,128 @@
+
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Optional
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+from .schema import get_schema, SchemaCatalog
+
+class Adjacency:
+    """Compressed sparse row adjacency: sorted `keys`, `indptr` offsets into `indices`."""
+    def __init__(self, src: np.ndarray, dst: np.ndarray):
+        order = np.lexsort((dst, src))
+        src, dst = src[order], dst[order]
+        self.keys, starts = np.unique(src, return_index=True)
+        self.indptr = np.append(starts, len(src)).astype(np.int64)
+        self.indices = dst
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, keys) -> np.ndarray:
+        keys = np.atleast_1d(np.asarray(keys, dtype=np.int64))
+        if len(self.keys) == 0:
+            return np.full(keys.shape, -1)
+        pos = np.clip(np.searchsorted(self.keys, keys), 0, len(self.keys) - 1)
+        return np.where(self.keys[pos] == keys, pos, -1)
+
+    def degree(self, keys) -> np.ndarray:
+        pos = self.positions(keys)
+        deg = self.indptr[pos + 1] - self.indptr[pos]
+        return np.where(pos >= 0, deg, 0)
+
+    def neighbors(self, key) -> np.ndarray:
+        pos = self.positions(key)[0]
+        if pos < 0:
+            return self.indices[:0]
+        return self.indices[self.indptr[pos]:self.indptr[pos+1]]
+
+    def neighbors_many(self, keys) -> np.ndarray:
+        """Concatenated neighbors (with repetitions) of `keys`."""
+        pos = self.positions(keys)
+        pos = pos[pos >= 0]
+        if len(pos) == 0:
+            return self.indices[:0]
+        starts, ends = self.indptr[pos], self.indptr[pos + 1]
+        lengths = ends - starts
+        # Vectorized concatenation of the slices starts[i]:ends[i]
+        offsets = np.repeat(starts - np.cumsum(np.append(0, lengths[:-1])), lengths)
+        return self.indices[np.arange(lengths.sum()) + offsets]
+
+
+@dataclass
+class LinkTable:
+    table_name: str # e.g. DataAircraftSensors
+    entity_table: str # e.g. DataAircraft
+    component_table: Optional[str] # e.g. DataSensor, None if it can't be inferred
+    forward: Adjacency # entity ID -> ComponentID
+    reverse: Adjacency # ComponentID -> entity ID
+
+
+def split_link_table_name(table_name: str, schema: SchemaCatalog):
+    """DataAircraftSensors -> (DataAircraft, DataSensor), using the longest entity table name which is a prefix."""
+    for end in range(len(table_name) - 1, len("Data"), -1):
+        entity_table = table_name[:end]
+        if entity_table in schema and entity_table != table_name:
+            suffix = table_name[end:]
+            for candidate in ["Data" + suffix, "Data" + suffix.rstrip("s"), "Data" + suffix[:-2] if suffix.endswith("es") else None]:
+                if candidate in schema:
+                    return entity_table, candidate
+            return entity_table, None
+    return None, None
+
+
+class RelationIndex:
+    """Forward and reverse CSR indexes for every `Data*` link table with `ID` and `ComponentID` columns."""
+    def __init__(self, links: dict[str, LinkTable]):
+        self.links = links
+
+    def __contains__(self, table_name):
+        return table_name in self.links
+
+    def forward(self, table_name, _id) -> np.ndarray:
+        return self.links[table_name].forward.neighbors(_id)
+
+    def reverse(self, table_name, component_id) -> np.ndarray:
+        return self.links[table_name].reverse.neighbors(component_id)
+
+    def tables_by_component(self, component_table) -> list[str]:
+        return [name for name, link in self.links.items() if link.component_table == component_table]
+
+    def hop(self, ids, path: list[tuple[str, str]]) -> np.ndarray:
+        """Follow `(table_name, "forward" | "reverse")` steps from `ids`, e.g. sensor -> aircraft -> loadouts:
+        `[("DataAircraftSensors", "reverse"), ("DataAircraftLoadouts", "forward")]`."""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        for table_name, direction in path:
+            ids = np.unique(getattr(self.links[table_name], direction).neighbors_many(ids))
+        return ids
+
+    def co_occurrence(self, table_name, component_id) -> pd.Series:
+        """How many entities carry each other component together with `component_id`, descending."""
+        link = self.links[table_name]
+        entities = link.reverse.neighbors(component_id)
+        others = link.forward.neighbors_many(np.unique(entities))
+        others = others[others != component_id]
+        values, counts = np.unique(others, return_counts=True)
+        return pd.Series(counts, index=values).sort_values(ascending=False, kind="stable")
+
+
+@per_db
+@derived()
+def get_relation_index(db_path) -> RelationIndex:
+    schema = get_schema(db_path)
+    links = {}
+    with connect(db_path) as conn:
+        for table_name in schema.tables:
+            if not table_name.startswith("Data") or not {"ID", "ComponentID"} <= set(schema.columns(table_name)):
+                continue
+            res = conn.execute(f"SELECT ID, ComponentID FROM {table_name} WHERE ID IS NOT NULL AND ComponentID IS NOT NULL").fetchall()
+            arr = np.array(res, dtype=np.int64).reshape(-1, 2)
+            entity_table, component_table = split_link_table_name(table_name, schema)
+            links[table_name] = LinkTable(
+                table_name, entity_table, component_table,
+                forward=Adjacency(arr[:, 0], arr[:, 1]),
+                reverse=Adjacency(arr[:, 1], arr[:, 0]))
+    return RelationIndex(links)
@@ -0,0 +1,61 @@
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+
+class SchemaCatalog:
+    """Table -> ordered `(column, type)` list of a DB, as reported by `PRAGMA table_info`."""
+    def __init__(self, tables: dict[str, list[tuple[str, str]]]):
+        self.tables = tables
+
+    def __contains__(self, table_name):
+        return table_name in self.tables
+
+    def columns(self, table_name) -> list[str]:
+        return [name for name, _ in self.tables.get(table_name, [])]
+
+    def types(self, table_name) -> dict[str, str]:
+        return dict(self.tables.get(table_name, []))
+
+    def has_column(self, table_name, column) -> bool:
+        return column in self.types(table_name)
+
+    def project(self, table_name, columns) -> list[str]:
+        """Keep the requested columns the table actually has, in the requested order."""
+        available = self.types(table_name)
+        return [c for c in columns if c in available]
+
+
+def read_schema(db_path) -> dict[str, list[tuple[str, str]]]:
+    tables = {}
+    with connect(db_path) as conn:
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+        for name in names:
+            res = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+            tables[name] = [(r[1], r[2]) for r in res]
+    return tables
+
+@per_db
+@derived()
+def get_schema(db_path) -> SchemaCatalog:
+    """Schema of a DB, persisted in the DB's sidecar."""
+    return SchemaCatalog(read_schema(db_path))
+
+def resolve_sections(columns: list[str], section_arr: list) -> list[tuple[str, list[str]]]:
+    """Group columns into sections by the name of each section's first column.
+
+    `section_arr` rows are `[legacy offset, section name, first column]`. The legacy offset is only used when the first
+    column is missing from this DB version, so a column inserted or removed elsewhere doesn't shift every label.
+    """
+    starts = []
+    for offset, section_name, first_column in section_arr:
+        start = columns.index(first_column) if first_column in columns else offset
+        if starts and start <= starts[-1][0]:
+            start = max(offset, starts[-1][0] + 1)
+        starts.append((min(start, len(columns)), section_name))
+
+    sections = []
+    for idx, (start, section_name) in enumerate(starts):
+        end = starts[idx + 1][0] if idx + 1 < len(starts) else len(columns)
+        sections.append((section_name, columns[start:end]))
+    return sections
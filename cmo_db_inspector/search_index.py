@@ -0,0 +1,136 @@
+
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+from .enums import get_enum_registry, EnumRegistry
+
+# Tables listed by the selector. They live here rather than in `selector` so the name indexes built over them don't
+# import the UI module.
+
+@dataclass
+class TableInfo:
+    name: str
+    table_name: str
+    select_command_root: str
+    headers: list[str]
+    enum_columns: dict[str, str] = field(default_factory=dict) # header -> Enum* table, decoded in Python instead of joined
+        
+    @property
+    def count_command(self) -> str:
+        return f"SELECT COUNT(*) FROM {self.table_name} WHERE Name LIKE '%' || ? || '%'"
+
+    @property
+    def select_command_free(self) -> str:
+        return self.select_command_root + " WHERE Name LIKE '%' || ? || '%'"
+    
+    @property
+    def select_command_ranged(self) -> str:
+        return self.select_command_free + " LIMIT ? OFFSET ?"
+
+    def to_frame(self, res, enum_registry: EnumRegistry) -> pd.DataFrame:
+        df = pd.DataFrame(res, columns=self.headers)
+        for header, enum_name in self.enum_columns.items():
+            df[header] = enum_registry[enum_name].decode(df[header].to_numpy())
+        return df
+    
+table_info_map = {
+    "Aircraft": TableInfo(
+        name="Aircraft", table_name="DataAircraft", 
+        select_command_root="SELECT ID, Name, Comments, OperatorCountry, YearCommissioned FROM DataAircraft",
+        headers=["ID", "Name", "Comments", "Country", "Year Commissioned"],
+        enum_columns={"Country": "EnumOperatorCountry"}
+    ),
+    "Sensor": TableInfo(
+        name="Sensor", table_name="DataSensor",
+        select_command_root="SELECT ID, Name, Comments, Role, Generation FROM DataSensor",
+        headers=["ID", "Name", "Comments", "Role", "Generation"],
+        enum_columns={"Role": "EnumSensorRole", "Generation": "EnumSensorGeneration"}
+    )
+}
+
+
+class NameIndex:
+    """In-memory n-gram (n <= 3) postings over the lower-cased `Name` of every row of a selector table.
+
+    A query intersects the postings of its n-grams, starting from the rarest, verifies the substring on the few
+    remaining candidates and ranks exact matches, then prefix matches, then other substring matches.
+    """
+    max_n = 3
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame.reset_index(drop=True)
+        self.names = np.array(self.frame["Name"].fillna("").astype(str).str.lower().tolist(), dtype=str)
+
+        self.name_list = self.names.tolist() # Plain `str` substring tests are faster than `np.char.find`
+
+        # Sorted names answer exact and prefix matches with two binary searches.
+        self.sorted_order = np.argsort(self.names, kind="stable").astype(np.int32)
+        self.sorted_names = self.names[self.sorted_order]
+
+        postings = defaultdict(list)
+        for pos, name in enumerate(self.names):
+            grams = {name[i:i+n] for n in range(1, self.max_n + 1) for i in range(len(name) - n + 1)}
+            for gram in grams:
+                postings[gram].append(pos)
+        self.postings = {gram: np.array(arr, dtype=np.int32) for gram, arr in postings.items()}
+        self.all_positions = np.arange(len(self.names), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def grams(self, q: str) -> set[str]:
+        n = min(len(q), self.max_n)
+        return {q[i:i+n] for i in range(len(q) - n + 1)}
+
+    def candidates(self, q: str) -> np.ndarray:
+        if len(q) == 0:
+            return self.all_positions
+        arr_list = sorted((self.postings.get(gram, self.all_positions[:0]) for gram in self.grams(q)), key=len)
+        cand = arr_list[0]
+        for arr in arr_list[1:]:
+            if len(cand) <= 16: # Few enough to verify directly
+                break
+            mask = np.zeros(len(self.names), dtype=bool)
+            mask[arr] = True
+            cand = cand[mask[cand]]
+        return cand
+
+    def match(self, q: str) -> np.ndarray:
+        """Matching row positions, ranked."""
+        q = q.lower()
+        cand = self.candidates(q)
+        if len(q) == 0:
+            return cand
+        if len(q) > self.max_n:
+            name_list = self.name_list
+            cand = cand[np.array([q in name_list[i] for i in cand.tolist()], dtype=bool)]
+
+        lo = np.searchsorted(self.sorted_names, q, "left")
+        exact_hi = np.searchsorted(self.sorted_names, q, "right")
+        prefix_hi = np.searchsorted(self.sorted_names, q + "\U0010ffff", "left")
+        rank = np.full(len(self.names), 2, dtype=np.int8)
+        rank[self.sorted_order[lo:prefix_hi]] = 1
+        rank[self.sorted_order[lo:exact_hi]] = 0
+        return cand[np.argsort(rank[cand], kind="stable")]
+
+    def page(self, pos: np.ndarray, limit: int, offset: int) -> pd.DataFrame:
+        return self.frame.iloc[pos[offset:offset+limit]].reset_index(drop=True)
+
+    def search(self, q: str, limit: int, offset: int) -> tuple[pd.DataFrame, int]:
+        """Return one page of the ranked matches and the total number of matches."""
+        pos = self.match(q)
+        return self.page(pos, limit, offset), len(pos)
+
+
+@per_db
+@derived()
+def get_name_index(db_path, type_name: str) -> NameIndex:
+    table_info = table_info_map[type_name]
+    with connect(db_path) as conn:
+        res = conn.execute(table_info.select_command_root).fetchall()
+    return NameIndex(table_info.to_frame(res, get_enum_registry(db_path)))
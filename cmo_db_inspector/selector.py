@@ -1,68 +1,49 @@
 from contextlib import contextmanager
-from dataclasses import dataclass
 import sqlite3
 from pathlib import Path
 import gradio as gr
 import math
+import time
+from typing import Optional
 
 import pandas as pd # Gradio force pandas usage anyway.
 
-from .utils import connect
-
-@dataclass
-class TableInfo:
-    name: str
-    table_name: str
-    select_command_root: str
-    headers: list[str]
-        
-    @property
-    def select_command_free(self) -> str:
-        return self.select_command_root + " WHERE Name LIKE '%' || ? || '%'"
-    
-    @property
-    def select_command_ranged(self) -> str:
-        return self.select_command_free + " LIMIT ? OFFSET ?"
-    
-table_info_map = {
-    "Aircraft": TableInfo(
-        name="Aircraft", table_name="DataAircraft", 
-        select_command_root="SELECT DataAircraft.ID, Name, Comments, EnumOperatorCountry.Description, YearCommissioned FROM DataAircraft INNER JOIN EnumOperatorCountry ON DataAircraft.OperatorCountry=EnumOperatorCountry.ID",
-        headers=["ID", "Name", "Comments", "Country", "Year Commissioned"]
-    ),
-    "Sensor": TableInfo(
-        name="Sensor", table_name="DataSensor",
-        select_command_root="SELECT DataSensor.ID, Name, Comments, EnumSensorRole.Description, EnumSensorGeneration.Description FROM DataSensor INNER JOIN EnumSensorRole ON DataSensor.Role=EnumSensorRole.ID INNER JOIN EnumSensorGeneration on Generation=EnumSensorGeneration.ID",
-        headers=["ID", "Name", "Comments", "Role", "Generation"]
-    )
-}
+from .utils import connect, skip_updates
+from .enums import get_enum_registry
+from .search_index import get_name_index, TableInfo, table_info_map
+from .db_catalog import DbCatalog
 
 # data_type = ['Aircraft', 'Ship', 'Submarine', 'Facility', 'Ground Unit', 'Satellite', 'Weapon', 'Sensor']
 
 def pick_default_db(db_list: list[Path]):
-    if len(db_list) == 0:
+    """Pick among the full DBs (slim snapshots only if there are no others), then prefer the fresh slim snapshot
+    of the picked one."""
+    from .snapshot import is_slim, prefer_snapshot
+
+    candidates = [p for p in db_list if not is_slim(p)] or db_list
+    if len(candidates) == 0:
         return None
-    elif len(db_list) == 1:
-        return db_list[0]
+    elif len(candidates) == 1:
+        return prefer_snapshot(candidates[0], db_list)
     
-    db_list_sorted = sorted(db_list, key=lambda p:p.stat().st_ctime)
+    db_list_sorted = sorted(candidates, key=lambda p:p.stat().st_ctime)
     if db_list_sorted[-1].stat().st_size >= db_list_sorted[-2].stat().st_size:
-        return db_list_sorted[-1]
-    return db_list_sorted[-2]
+        return prefer_snapshot(db_list_sorted[-1], db_list)
+    return prefer_snapshot(db_list_sorted[-2], db_list)
 
 class SelectedEvent:
     def __init__(self):
         self.return_update = None
 
 class SelectorTab:
-    def __init__(self, cmo_db_root: Path, row_per_page=20):
+    def __init__(self, cmo_db_root: Path, row_per_page=20, use_index=True, debounce=0.15):
         self.cmo_db_root = cmo_db_root
         self.row_per_page = row_per_page
-        
-        self.db_list = list(cmo_db_root.glob("*.db3"))
-        self.db_list.sort(key=lambda p:p.stat().st_ctime)
-        
-        self.default_db = pick_default_db(self.db_list)
+        self.use_index = use_index # Search the in-memory name index instead of SQLite LIKE queries
+        self.debounce = debounce # seconds
+
+        self.catalog = DbCatalog(cmo_db_root) # Polled by `App.create`, new DBs show up without a restart
+        self.default_db = pick_default_db(self.catalog.paths())
 
         self.selected_events = {
             "Aircraft": SelectedEvent(),
@@ -73,7 +54,7 @@ class SelectorTab:
         with gr.Row():
             with gr.Column():
                 with gr.Row():
-                    self.cmo_dababase_dropdown = gr.Dropdown([p.name for p in self.db_list], label="CMO Database", value=self.default_db.name)
+                    self.cmo_dababase_dropdown = gr.Dropdown(self.catalog.names(), label="CMO Database", value=self.default_db.name)
                     self.type_dropdown = gr.Dropdown(list(table_info_map), label="Type", value="Aircraft")
                 with gr.Row():
                     # gr.Text("F/A", label="Class")
@@ -90,32 +71,47 @@ class SelectorTab:
                     self.end_page_button = gr.Button("End", elem_id="end-page-button").style(size="sm") # gr.Button("End Page")
             with gr.Column():
                 self.gr_df = gr.DataFrame([[]], interactive=False) #, datatype=["str", "str"])
+                self.search_state = gr.State({}) # Latest keystroke of the session, Gradio deep-copies the value per session
                 # self.gr_df = gr.DataFrame([[]], headers=["ID", "Name", "Comments", "Country/Role", "Year/Generation"]) #, datatype=["str", "str"])
                 # self.gr_df = gr.DataFrame([[]])#, headers=["ID", "Name"]), datatype=["str", "str"])
             
         return self
     
-    def bind(self, gr_df_select_output: set):
+    def bind(self, gr_df_select_output: set, gr_df_select_input: Optional[set] = None):
         inputs = {self.cmo_dababase_dropdown, self.type_dropdown, self.page_index_number, self.class_text}
         
         outputs = [self.gr_df, self.page_index_number, self.page_count_number]
         
-        self.first_page_button.click(lambda data: self.update(data, page_target=1), inputs, outputs)
-        self.prev_page_button.click(lambda data: self.update(data, page_offset=-1), inputs, outputs)
-        self.next_page_button.click(lambda data: self.update(data, page_offset=1), inputs, outputs)
-        self.end_page_button.click(lambda data: self.update(data, page_target=-1), inputs, outputs)
+        # The api_names are the handles of `load_test` (and of scripted clients), keep them stable.
+        self.first_page_button.click(lambda data: self.update(data, page_target=1), inputs, outputs, api_name="first_page")
+        self.prev_page_button.click(lambda data: self.update(data, page_offset=-1), inputs, outputs, api_name="prev_page")
+        self.next_page_button.click(lambda data: self.update(data, page_offset=1), inputs, outputs, api_name="next_page")
+        self.end_page_button.click(lambda data: self.update(data, page_target=-1), inputs, outputs, api_name="end_page")
+
+        self.cmo_dababase_dropdown.focus(self.refresh_db_choices, None, self.cmo_dababase_dropdown)
 
-        for component in [self.type_dropdown, self.cmo_dababase_dropdown, self.class_text]:
-            component.change(lambda data: self.update(data), inputs, outputs)
+        for component, api_name in [(self.type_dropdown, "change_type"), (self.cmo_dababase_dropdown, "change_db")]:
+            component.change(lambda data: self.update(data), inputs, outputs, api_name=api_name)
+        self.class_text.change(self.search, inputs | {self.search_state}, outputs, api_name="search")
 
-        self.gr_df.select(self.select, {self.gr_df, self.type_dropdown, self.cmo_dababase_dropdown}, gr_df_select_output)
+        select_inputs = {self.gr_df, self.type_dropdown, self.cmo_dababase_dropdown} | (gr_df_select_input or set())
+        self.gr_df.select(self.select, select_inputs, gr_df_select_output, api_name="select_row")
 
         self.gr_df_select_output = gr_df_select_output
 
         return self
     
+    @property
+    def db_list(self) -> list[Path]:
+        return self.catalog.paths()
+
+    def refresh_db_choices(self):
+        return gr.update(choices=self.catalog.names())
+
     def get_db_path(self, data):
         db_name = data[self.cmo_dababase_dropdown]
+        if db_name not in self.catalog:
+            raise gr.Error(f"{db_name} was removed from {self.cmo_db_root}, please pick another database.")
         db_path = self.cmo_db_root / db_name
         return db_path
     
@@ -144,12 +140,42 @@ class SelectorTab:
         type_name = data[self.type_dropdown]
         event = self.selected_events[type_name]
 
-        ret = {component: gr.update() for component in self.gr_df_select_output}
-        if event.return_update is not None:
-            ret.update(event.return_update(data, _id))
-
-        return ret
+        # Outputs left out of the dict are skipped by Gradio.
+        if event.return_update is None:
+            return skip_updates([self.gr_df])
+        return event.return_update(data, _id)
     
+    def search(self, data):
+        """Debounced `update` for keystrokes: a request superseded by a newer one of the same session is dropped."""
+        # `gr.Request` has no session hash in Gradio 3.x and client addresses are shared behind proxies, so the session
+        # is told by its own `gr.State`, queued or not.
+        session = data[self.search_state]
+        token = object()
+        session["token"] = token
+        time.sleep(self.debounce)
+        if session.get("token") is not token:
+            return skip_updates([self.gr_df])
+        return self.update(data, page_target=1)
+
+    def resolve_page_index(self, data, n, page_target=None, page_offset=None):
+        page_count = math.ceil(n / self.row_per_page)
+        current_page_index = self.get_current_page_index(data)
+
+        if page_offset is None and page_target is None:
+            page_offset = 0
+
+        if page_offset is not None and page_target is None:
+            page_target = current_page_index + page_offset
+
+        if page_target < 0:
+            page_target = page_count + page_target + 1
+        if page_target > page_count:
+            page_target = page_count
+        if page_target <= 0:
+            page_target = 1
+
+        return page_target, page_count
+
     def update(self, data, page_target=None, page_offset=None):
 
         db_path = self.get_db_path(data)
@@ -158,34 +184,25 @@ class SelectorTab:
         table_info = table_info_map[type_name]
         match_str = data[self.class_text]
 
+        if self.use_index:
+            name_index = get_name_index(db_path, type_name)
+            pos = name_index.match(match_str)
+            page_index, page_count = self.resolve_page_index(data, len(pos), page_target, page_offset)
+            df = name_index.page(pos, self.row_per_page, (page_index-1) * self.row_per_page)
+            return {self.gr_df: df, self.page_index_number: page_index, self.page_count_number: page_count}
+
         with connect(db_path) as conn:
 
-            cur = conn.execute(f"SELECT COUNT(*) FROM {table_info.table_name} WHERE Name LIKE '%' || ? || '%'", (match_str,))
+            cur = conn.execute(table_info.count_command, (match_str,))
             n = cur.fetchone()[0]
-            page_count = math.ceil(n / self.row_per_page)
-            current_page_index = self.get_current_page_index(data)
-
-            if page_offset is None and page_target is None:
-                page_offset = 0
-
-            if page_offset is not None and page_target is None:
-                page_target = current_page_index + page_offset
-            
-            if page_target is not None:
-                if page_target < 0:
-                    page_target = page_count + page_target + 1
-                elif page_target == 0:
-                    page_target = 1
-                elif page_target > page_count:
-                    page_target = page_count
-                page_index = page_target
+            page_index, page_count = self.resolve_page_index(data, n, page_target, page_offset)
             
             limit = self.row_per_page
             offset = (page_index-1) * self.row_per_page
             cur = conn.execute(table_info.select_command_ranged, (match_str, limit, offset))
             res = cur.fetchall()
 
-        df = pd.DataFrame(res, columns=table_info.headers)
+        df = table_info.to_frame(res, get_enum_registry(db_path))
         ret = {self.gr_df: df, self.page_index_number: page_index, self.page_count_number: page_count}
         # print(f"ret={ret}")
         return ret
@@ -1,33 +1,33 @@
-import re
 import pandas as pd
+import numpy as np
 import sqlite3
 from typing import Protocol
 import gradio as gr
 from itertools import chain
 
-from .utils import connect, text_grid, add_text_rows, tags, inv_db, nmi
+from .utils import connect, add_text_rows, tags, inv_db, nmi, delta_updates
 from .interfaces import DbPathProvider
-from .radar_equation import IRadar
-
-unit_map = {"":1, "K":1_000, "M": 1_000_000, "G": 1_000_000_000, "T": 1_000_000_000_000, "P":1_000_000_000_000_000}
-hz_map = {
-    "Visual Light": 300e12,
-    "Near IR (0.75-8 µm)": 30e12,
-    "Far IR (8-1000 µm)": 3e12,
-    "Laser": 300e9
-}
-
+from .radar_equation import IRadar, altitude_bounds, coverage_grid, radar_horizon, cumulative_pd
+from .enums import get_enum_registry
+from .frequency import parse_band, get_frequency_catalog
+from .raw_tab import RawTableTab
+from .relations import get_relation_index
+from .radar_table import get_radar_table, get_signature_table
+from .similarity import SimilarPanel
+from .figure_cache import figure_cache
+
+# [legacy column offset, section name, first column of the section], resolved by name with `schema.resolve_sections`.
 section_arr = [
-    [0, "General"],
-    [14, "Misc"],
-    [27, "Radar (Search & Track)"],
-    [35, "Radar (Fire Control)"],
-    [43, "ESM"],
-    [46, "ECM"],
-    [52, "Sonar"],
-    [62, "Visual/IR Zoom"],
-    [66, "Mine Sweep"],
-    [70, "Other"]
+    [0, "General", "ID"],
+    [14, "Misc", "AltitudeMax"],
+    [27, "Radar (Search & Track)", "RadarHorizontalBeamwidth"],
+    [35, "Radar (Fire Control)", "FCRHorizontalBeamwidth"],
+    [43, "ESM", "ESMSensitivity"],
+    [46, "ECM", "ECMGain"],
+    [52, "Sonar", "SonarSourceLevel"],
+    [62, "Visual/IR Zoom", "VisualDetectionZoomLevel"],
+    [66, "Mine Sweep", "MCMSweepWidth"],
+    [70, "Other", None]
 ]
 
 info_map = {
@@ -40,67 +40,23 @@ info_map = {
 }
 
 def extract_Hz_value(s):
-    if s in hz_map:
-        return hz_map[s]
-    left, right, unit = re.findall(r"(\d+)-(\d+) (K|M|G)?Hz", s)[0]
-    return (int(left) + int(right)) / 2 * unit_map[unit]
-
-def split_data(*args):
-    for section_idx, section_config in enumerate(section_arr):
-        left = section_arr[section_idx][0]
-        right = section_arr[section_idx+1][0] if section_idx + 1 < len(section_arr) else None
-        yield section_config[1], *(arg[left:right] for arg in args)
-
-class SensorRawTab:
-    def __init__(self, db_path_provider: DbPathProvider, elements_per_row = 5):
-        self.db_path_provider = db_path_provider
-        self.elements_per_row = elements_per_row
-        self.name_to_component: dict[str, gr.components.Component] = {}
-        
-    def build(self):
-        with connect(self.db_path_provider.get_init_db_path()) as conn:
-            cur = conn.execute("PRAGMA table_info(DataSensor)")
-            res = cur.fetchall()
-
-        headers = [r[1] for r in res]
-        types = [r[2] for r in res]
-            
-        for section_name, indexes in split_data(headers):
-            with gr.Accordion(section_name):
-                self.name_to_component.update(text_grid(indexes, self.elements_per_row, info_map))
-        
-        return self
-    
-    def bind(self):
-        return self
-    
-    def updates(self, data, _id):
-        # print(f"_id={_id}, type=>{type(_id)}")
-        _id = int(_id)
-        with connect(self.db_path_provider.get_db_path(data)) as conn:
-            cur = conn.execute("SELECT * FROM DataSensor WHERE ID = ?", (int(_id),))
-            res = cur.fetchone()
-            # print(f"res={res}")
-        return {component: res[idx] for idx, component in enumerate(self.name_to_component.values())}
-    
-    def register_outputs(self, outputs: set):
-        for component in self.name_to_component.values():
-            outputs.add(component)
-    
-    # Gradio's outputs is assumed to be immutable. 
-    """
-    def deregister_outputs(self, outputs: set):
-        for component in self.name_to_component.values():
-            outputs.remove(component)
-    """
+    # Prefer `FrequencyCatalog` lookups, which parse every band once per DB.
+    band = parse_band(s)
+    if band is None:
+        return np.nan
+    return (band[0] + band[1]) / 2
 
-    # def transform_returns(self, returns: dict):
-    #    returns.update(self.updates())
+class SensorRawTab(RawTableTab):
+    table_name = "DataSensor"
+    section_arr = section_arr
+    info_map = info_map
 
 class RadarSearchTrack:
     def __init__(self, db_path_provider: DbPathProvider):
         self.db_path_provider = db_path_provider
         self.name_to_component: dict[str, gr.components.Component] = {}
+        self.coverage_ui: dict[str, gr.components.Component] = {}
+        self.cumulative_ui: dict[str, gr.components.Component] = {}
 
     row_name_list_left = [
         ["Role"],
@@ -116,24 +72,34 @@ class RadarSearchTrack:
         ["RadarBlindTime", "RadarPRF"]
     ]
 
+    query_command = (
+        "SELECT ID, Name, Comments, Type, Role, Generation, "
+        "RangeMin, RangeMax, AltitudeMin, AltitudeMax, AltitudeMin_ASL, AltitudeMax_ASL, ScanInterval, "
+        "ResolutionRange, ResolutionHeight, ResolutionAngle, DirectionFindingAccuracy, "
+        "MaxContactsAir, MaxContactsSurface, MaxContactsSubmarine, "
+        "RadarHorizontalBeamwidth, RadarVerticalBeamwidth, RadarSystemNoiseLevel, RadarProcessingGainLoss, "
+        "RadarPeakPower, RadarPulseWidth, RadarBlindTime, RadarPRF "
+        "FROM DataSensor WHERE ID = ?"
+    )
+
     tags_command_map = {
-        "Capabilities": 
-            "SELECT Description FROM DataSensorCapabilities "
-            "INNER JOIN EnumSensorCapability ON CodeID = EnumSensorCapability.ID "
-            "WHERE DataSensorCapabilities.ID = ?",
-
-        "FrequencySearchAndTrack": 
-            "SELECT Description FROM DataSensorFrequencySearchAndTrack "
-            "INNER JOIN EnumSensorFrequency ON Frequency=EnumSensorFrequency.ID "
-            "WHERE DataSensorFrequencySearchAndTrack.ID = ?",     
-               
-        "Codes": 
-            "SELECT Description FROM DataSensorCodes "
-            "INNER JOIN EnumSensorCode ON CodeID = EnumSensorCode.ID "
-            "WHERE DataSensorCodes.ID = ?"
+        "Capabilities": "SELECT CodeID FROM DataSensorCapabilities WHERE ID = ?",
+        "FrequencySearchAndTrack": "SELECT Frequency FROM DataSensorFrequencySearchAndTrack WHERE ID = ?",
+        "Codes": "SELECT CodeID FROM DataSensorCodes WHERE ID = ?"
+    }
+
+    # All tag queries return raw enum codes, decoded with the preloaded enum registry.
+    tags_enum_map = {
+        "Capabilities": "EnumSensorCapability",
+        "FrequencySearchAndTrack": "EnumSensorFrequency",
+        "Codes": "EnumSensorCode"
     }
 
     dbsm_arr = [-30, -20, -10, 0, 10, 20, 30]
+    coverage_dbsm_arr = [-10, 0, 10, 20]
+    cumulative_aspects = ["Front", "Side", "Rear"]
+
+    mounted_on_limit = 200
 
     def build(self):
         with gr.Row():
@@ -152,78 +118,216 @@ class RadarSearchTrack:
 
                 self.name_to_component["detection_range"] = gr.DataFrame([[]], label="Radar Equation (Experimental)", headers = ["dBsm"] + [str(n) for n in self.dbsm_arr])
 
-                for name in ["Capabilities", "FrequencySearchAndTrack", "Codes"]:
+                for name in ["Capabilities", "FrequencySearchAndTrack", "Codes", "MountedOn"]:
                     self.name_to_component[name] = tags([], label=name)
+
+        with gr.Accordion("Vertical Coverage", open=False):
+            with gr.Row():
+                self.coverage_ui["sensor_altitude"] = gr.Number(10, label="Sensor Altitude (m)")
+                self.coverage_ui["plot"] = gr.Button("Plot")
+            self.coverage_ui["figure"] = gr.Plot(show_label=False)
+
+        with gr.Accordion("Cumulative Detection Probability", open=False):
+            ui = self.cumulative_ui
+            with gr.Row():
+                ui["aircraft_id"] = gr.Number(0, label="Target Aircraft ID (0: use RCS)", precision=0)
+                ui["dbsm"] = gr.Number(0, label="RCS (dBsm)")
+                ui["plot"] = gr.Button("Plot")
+            with gr.Row():
+                ui["start_range"] = gr.Slider(5, 300, value=100, step=5, label="Start Range (nmi)")
+                ui["speed"] = gr.Slider(50, 2000, value=500, step=50, label="Closing Speed (kts)")
+                ui["offset"] = gr.Slider(0, 50, value=0, step=1, label="Lateral Offset (nmi)")
+                ui["duration"] = gr.Slider(30, 3600, value=900, step=30, label="Duration (s)")
+            ui["figure"] = gr.Plot(show_label=False)
+
+        self.similar = SimilarPanel("Radar", self.db_path_provider).build()
+
+        self.selected_id = gr.State(None)
+        self.last_values = gr.State(None)
         
         return self
 
-    def updates(self, data, _id):
-        _id = int(_id)
+    def bind(self):
+        inputs = self.db_path_provider.get_db_inputs() | {self.selected_id, self.coverage_ui["sensor_altitude"]}
+        self.coverage_ui["plot"].click(self.plot_vertical_coverage, inputs, self.coverage_ui["figure"])
+
+        ui = self.cumulative_ui
+        inputs = self.db_path_provider.get_db_inputs() | {self.selected_id} | {c for c in ui.values() if not isinstance(c, (gr.Button, gr.Plot))}
+        ui["plot"].click(self.plot_cumulative_pd, inputs, ui["figure"])
+        for name in ["start_range", "speed", "offset", "duration"]:
+            ui[name].release(self.plot_cumulative_pd, inputs, ui["figure"])
+        self.similar.bind(self.selected_id)
+        return self
+
+    def query(self, conn, enums, db_path, _id) -> dict:
+        """Plain values of the tab, shared by `updates` and the HTTP API. `detection_range` is None for a sensor
+        without a parseable band."""
+        cur = conn.execute(self.query_command, (_id,))
+        res = cur.fetchone()
+        if res is None:
+            raise KeyError(_id)
+
+        # print(f"res={res}, _id={_id}")
+        d = {k[0]: v for k, v in zip(cur.description, res)}
+        for key, enum_name in [("Type", "EnumSensorType"), ("Role", "EnumSensorRole"), ("Generation", "EnumSensorGeneration")]:
+            d[key] = enums[enum_name].get(d[key])
+        comments = "" if d["Comments"] == "-" else f"({d['Comments']})"
+        name = f"#{d['ID']} {d['Name']} ({d['Type']}, {d['Generation']})"
+
+        values = {
+            "Name": name,
+            "Range": f"{round(d['RangeMin'], 2)} nmi - {round(d['RangeMax'], 2)} nmi",
+            "Altitude": f"{round(d['AltitudeMin'], 2)} m - {round(d['AltitudeMax'], 2)} m",
+            "Altitude_ASL": f"{round(d['AltitudeMin_ASL'], 2)} m - {round(d['AltitudeMax_ASL'], 2)} m"
+        }
+
+        for name_list in chain(self.row_name_list_left, self.row_name_list_right):
+            for name in name_list:
+                if name not in values:
+                    values[name] = d[name]
+
+        for name, command in self.tags_command_map.items():
+            cur = conn.execute(command, (_id,))
+            res = cur.fetchall()
+            values[name] = enums[self.tags_enum_map[name]].decode_list([r[0] for r in res])
+
+        values["MountedOn"] = self.mounted_on(conn, get_relation_index(db_path), _id)
 
-        with connect(self.db_path_provider.get_db_path(data)) as conn:
-            cur = conn.execute(
-                "SELECT DataSensor.ID, Name, Comments, EnumSensorType.Description AS Type, "
-                "EnumSensorRole.Description as Role, EnumSensorGeneration.Description AS Generation, "
-                "RangeMin, RangeMax, AltitudeMin, AltitudeMax, AltitudeMin_ASL, AltitudeMax_ASL, ScanInterval, "
-                "ResolutionRange, ResolutionHeight, ResolutionAngle, DirectionFindingAccuracy, "
-                "MaxContactsAir, MaxContactsSurface, MaxContactsSubmarine, "
-                "RadarHorizontalBeamwidth, RadarVerticalBeamwidth, RadarSystemNoiseLevel, RadarProcessingGainLoss, "
-                "RadarPeakPower, RadarPulseWidth, RadarBlindTime, RadarPRF "
-                "FROM DataSensor "
-                "INNER JOIN EnumSensorRole ON Role=EnumSensorRole.ID "
-                "INNER JOIN EnumSensorType ON Type=EnumSensorType.ID "
-                "INNER JOIN EnumSensorGeneration ON Generation=EnumSensorGeneration.ID "
-                "WHERE DataSensor.ID = ?",
-                (_id,))
-            res = cur.fetchone()
-
-            # print(f"res={res}, _id={_id}")
-            d = {k[0]: v for k, v in zip(cur.description, res)}
-            comments = "" if d["Comments"] == "-" else f"({d['Comments']})"
-            name = f"#{d['ID']} {d['Name']} ({d['Type']}, {d['Generation']})"
-
-            _rd = {
-                "Name": name,
-                "Range": f"{round(d['RangeMin'], 2)} nmi - {round(d['RangeMax'], 2)} nmi",
-                "Altitude": f"{round(d['AltitudeMin'], 2)} m - {round(d['AltitudeMax'], 2)} m",
-                "Altitude_ASL": f"{round(d['AltitudeMin_ASL'], 2)} m - {round(d['AltitudeMax_ASL'], 2)} m"
-            }
-
-            for name_list in chain(self.row_name_list_left, self.row_name_list_right):
-                for name in name_list:
-                    if name not in _rd:
-                        _rd[name] = d[name]
-
-            rl_map = {}
-            for name, command in self.tags_command_map.items():
-                cur = conn.execute(command, (_id,))
-                res = cur.fetchall()
-                rl = [r[0] for r in res]
-                rl_map[name] = rl
-                _rd[name] = gr.update(value=rl, choices=rl)
-
-            freq_s_l = rl_map["FrequencySearchAndTrack"]
+        frequency = get_frequency_catalog(db_path).sensor_frequency(_id)
+        values["detection_range"] = None
+        if np.isfinite(frequency):
             try:
-                radar_record = RadarRecord(d, freq_s_l)
+                radar_record = RadarRecord(d, frequency)
                 ranges_m = [radar_record.detection_range(inv_db(dbsm)) for dbsm in self.dbsm_arr]
-                _rd["detection_range"] = [
+                values["detection_range"] = [
                     ["km"] + [round(r / 1000, 1) for r in ranges_m],
                     ["nmi"] + [round(r / 1000 / nmi, 1) for r in ranges_m]
                 ]
             except ZeroDivisionError: # TODO: temp workaroud for non-search-radar, in fact non-search-radar should not update this tab but the switch is not implemented yet.
-                _rd["detection_range"] = gr.update()
+                pass
 
-        return {self.name_to_component[name]: value for name, value in _rd.items()}
+        return values
+
+    def updates(self, data, _id):
+        _id = int(_id)
+
+        db_path = self.db_path_provider.get_db_path(data)
+        enums = get_enum_registry(db_path)
+
+        with connect(db_path) as conn:
+            values = self.query(conn, enums, db_path, _id)
+
+        changed, last_values = delta_updates(data.get(self.last_values), values)
+        rd = {self.name_to_component[name]: self.render(name, value) for name, value in changed.items()}
+        rd[self.selected_id] = _id
+        rd[self.last_values] = last_values
+        return rd
+
+    def plot_vertical_coverage(self, data):
+        if data[self.selected_id] is None:
+            raise gr.Error("Select a radar first.")
+        db_path = self.db_path_provider.get_db_path(data)
+        params = (int(data[self.selected_id]), float(data[self.coverage_ui["sensor_altitude"]]))
+        return figure_cache.get(db_path, "vertical_coverage", params, lambda: self.build_vertical_coverage(db_path, *params))
+
+    def build_vertical_coverage(self, db_path, _id, sensor_altitude, points=121):
+        """Detection range against target altitude for a few RCS values, with the radar horizon of the sensor altitude."""
+        import plotly.express as px
+
+        radar = get_radar_table(db_path).subset([_id])
+        if len(radar) == 0:
+            raise gr.Error("Not a radar with a parseable band, the radar equation doesn't apply.")
+        top = float(np.clip(radar.altitude_max[0, 0], 1000, 30000))
+        target_altitudes = np.linspace(0, top, points)
+        ranges = coverage_grid(radar, [sensor_altitude], target_altitudes, self.coverage_dbsm_arr)[0, 0] # (altitude, rcs)
+
+        df = pd.concat([pd.DataFrame({"Range (km)": ranges[:, j] / 1000, "Altitude (m)": target_altitudes, "Curve": f"{dbsm} dBsm"})
+                        for j, dbsm in enumerate(self.coverage_dbsm_arr)] +
+                       [pd.DataFrame({"Range (km)": radar_horizon(sensor_altitude, target_altitudes) / 1000,
+                                      "Altitude (m)": target_altitudes, "Curve": "Radar horizon"})])
+        fig = px.line(df, x="Range (km)", y="Altitude (m)", color="Curve", title=f"Vertical Coverage (sensor at {sensor_altitude:g} m)")
+        fig.update_traces(selector={"name": "Radar horizon"}, line_dash="dash")
+        return fig
+
+    def plot_cumulative_pd(self, data):
+        if data[self.selected_id] is None:
+            raise gr.Error("Select a radar first.")
+        db_path = self.db_path_provider.get_db_path(data)
+        ui = self.cumulative_ui
+        params = (int(data[self.selected_id]), int(data[ui["aircraft_id"]] or 0), float(data[ui["dbsm"]]),
+                  *(float(data[ui[name]]) for name in ["start_range", "speed", "offset", "duration"]))
+        return figure_cache.get(db_path, "cumulative_pd", params, lambda: self.build_cumulative_pd(db_path, *params))
+
+    def build_cumulative_pd(self, db_path, _id, aircraft_id, dbsm, start_range, speed, offset, duration, points=181):
+        """Cumulative Pd against time along one closing trajectory, per signature aspect of the target aircraft (or
+        the given RCS when no aircraft is set)."""
+        import plotly.express as px
+
+        radar = get_radar_table(db_path).subset([_id])
+        if len(radar) == 0:
+            raise gr.Error("Not a radar with a parseable band, the radar equation doesn't apply.")
+        curves = [f"{dbsm:g} dBsm"]
+        dbsm_arr = [[dbsm]]
+        if aircraft_id > 0:
+            signatures = get_signature_table(db_path)
+            pos = signatures.positions([aircraft_id])[0]
+            if pos < 0:
+                raise gr.Error(f"Unknown aircraft ID: {aircraft_id}")
+            j = radar.signature_columns(signatures)[0]
+            curves = self.cumulative_aspects
+            dbsm_arr = [[signatures.dbsm[aspect][pos, j] for aspect in curves]]
+            if np.isnan(dbsm_arr).any():
+                raise gr.Error(f"Aircraft #{aircraft_id} has no signature in the band of this radar.")
+
+        times = np.linspace(0, duration, points)
+        pd_ = cumulative_pd(radar, dbsm_arr, [start_range * nmi * 1000], [speed * nmi * 1000 / 3600], [offset * nmi * 1000], times)[0, :, 0]
+        df = pd.concat([pd.DataFrame({"Time (s)": times, "Cumulative Pd": pd_[j], "Aspect": curve}) for j, curve in enumerate(curves)])
+        scan = float(radar.scan_interval[0, 0]) if radar.scan_interval[0, 0] > 0 else None
+        title = f"Cumulative Pd from {start_range:g} nmi at {speed:g} kts" + (f", scan every {scan:g} s" if scan else "")
+        fig = px.line(df, x="Time (s)", y="Cumulative Pd", color="Aspect", title=title, line_shape="hv")
+        fig.update_yaxes(range=[0, 1.02])
+        return fig
+
+    def render(self, name, value):
+        if name in self.tags_command_map:
+            return gr.update(value=value, choices=value)
+        if name == "MountedOn":
+            items, count = value["items"], value["count"]
+            label = f"Mounted On ({count})" if count <= len(items) else f"Mounted On ({len(items)}/{count})"
+            return gr.update(value=items, choices=items, label=label)
+        if name == "detection_range" and value is None:
+            return gr.update() # Left untouched when no band of the sensor can be parsed.
+        return value
+
+    def mounted_on(self, conn, relation_index, _id) -> dict:
+        """Platforms carrying the sensor, from the reverse index of every `Data*Sensors` link table."""
+        rl = []
+        count = 0
+        for table_name in relation_index.tables_by_component("DataSensor"):
+            entity_table = relation_index.links[table_name].entity_table
+            ids = np.unique(relation_index.reverse(table_name, _id))
+            count += len(ids)
+            ids = ids[:max(self.mounted_on_limit - len(rl), 0)]
+            if len(ids) == 0:
+                continue
+            res = conn.execute(f"SELECT Name FROM {entity_table} WHERE ID IN ({', '.join('?' * len(ids))})", ids.tolist()).fetchall()
+            rl.extend(f"{entity_table[len('Data'):]}: {r[0]}" for r in res)
+        return {"items": rl, "count": count}
+
+    def register_inputs(self, inputs: set):
+        inputs.add(self.last_values)
 
     def register_outputs(self, outputs: set):
         for component in self.name_to_component.values():
-            outputs.add(component)
+            if not isinstance(component, gr.Button):
+                outputs.add(component)
+        outputs.update({self.selected_id, self.last_values})
 
 
 class RadarRecord(IRadar):
-    def __init__(self, d: dict, freq_s_l: list[str], minimum_power=1e-15):
+    def __init__(self, d: dict, frequency: float, minimum_power=1e-15):
         self.d = d
-        self._frequency = min(extract_Hz_value(s) for s in freq_s_l)
+        self._frequency = frequency
         self._minimum_power = minimum_power
     
     @property
@@ -257,3 +361,15 @@ class RadarRecord(IRadar):
     @property
     def processing_gain_loss(self):
         return self.d["RadarProcessingGainLoss"]
+
+    @property
+    def altitude_min(self):
+        return altitude_bounds(*(self.d[c] for c in ["AltitudeMin", "AltitudeMax", "AltitudeMin_ASL", "AltitudeMax_ASL"]))[0]
+
+    @property
+    def altitude_max(self):
+        return altitude_bounds(*(self.d[c] for c in ["AltitudeMin", "AltitudeMax", "AltitudeMin_ASL", "AltitudeMax_ASL"]))[1]
+
+    @property
+    def scan_interval(self):
+        return self.d["ScanInterval"]
@@ -0,0 +1,174 @@
+
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import time
+import warnings
+import zlib
+from functools import wraps, lru_cache
+from pathlib import Path
+from typing import Optional
+
+from .db_manager import per_db, db_cache_dir, db_fingerprint
+
+# Cross-restart cache of derived values, in a sidecar SQLite file next to the other derived data of a DB fingerprint.
+# Entries are keyed by producer name and arguments and only valid for the code version of the package, so editing any
+# module a producer depends on, directly or through other producers, invalidates its entries. WAL mode and a busy timeout make it safe for several worker processes.
+
+sidecar_name = "derived.sqlite"
+default_max_bytes = 512 * 1024 * 1024
+
+def sidecar_enabled() -> bool:
+    return os.environ.get("CMO_DB_INSPECTOR_SIDECAR", "1") != "0"
+
+@lru_cache(maxsize=None)
+def module_version(module_name: str) -> str:
+    """Hash of the module source, "unknown" when it isn't available (frozen builds)."""
+    import sys
+    try:
+        source = inspect.getsource(sys.modules[module_name])
+    except (OSError, TypeError, KeyError):
+        return "unknown"
+    return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+@lru_cache(maxsize=None)
+def package_version() -> str:
+    """Hash of the source of every module of the package, "unknown" when it isn't available (frozen builds). Derived
+    values depend on helpers of other modules (e.g. `frequency.parse_band` for `get_radar_table`), so their entries
+    are versioned by the whole package rather than by the producer's module."""
+    root = Path(__file__).parent
+    files = sorted(root.rglob("*.py"))
+    if len(files) == 0:
+        return "unknown"
+    h = hashlib.sha1()
+    for f in files:
+        h.update(f.relative_to(root).as_posix().encode())
+        h.update(f.read_bytes())
+    return h.hexdigest()[:12]
+
+
+class Sidecar:
+    def __init__(self, path, fingerprint: str, max_bytes=default_max_bytes, timeout=30.0):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        conn = self.connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, producer_version TEXT, fingerprint TEXT, "
+                "value BLOB, size INTEGER, created REAL, accessed REAL)")
+        finally:
+            conn.close()
+
+    def connect(self) -> sqlite3.Connection:
+        # A connection per call: sidecars are shared by threads, and SQLite serializes the writers of all processes.
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    def get(self, key: str, producer_version: str, ttl: Optional[float] = None) -> tuple[bool, object]:
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT producer_version, fingerprint, value, created, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False, None
+            version, fingerprint, blob, created, accessed = row
+            now = time.time()
+            if version != producer_version or fingerprint != self.fingerprint or (ttl is not None and now - created > ttl):
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False, None
+            try:
+                value = pickle.loads(zlib.decompress(blob))
+            except Exception: # Written by an incompatible version of a dependency: rebuild
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False, None
+            if now - accessed > 60: # LRU order doesn't need per-read precision, this saves most writes
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            return True, value
+        finally:
+            conn.close()
+
+    def put(self, key: str, producer_version: str, value):
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        now = time.time()
+        conn = self.connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, producer_version, self.fingerprint, blob, len(blob), now, now))
+            self.evict(conn)
+        finally:
+            conn.close()
+
+    def evict(self, conn):
+        """Drop the least recently used entries until the total size fits `max_bytes`."""
+        total, = conn.execute("SELECT IFNULL(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def expire(self, ttl: float):
+        conn = self.connect()
+        try:
+            conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - ttl,))
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self.connect()
+        try:
+            conn.execute("DELETE FROM entries")
+        finally:
+            conn.close()
+
+
+@per_db
+def get_sidecar(db_path) -> Sidecar:
+    return Sidecar(db_cache_dir(db_path) / sidecar_name, db_fingerprint(db_path))
+
+def derived(version="1", ttl: Optional[float] = None):
+    """Persist `func(db_path, *args)` in the DB's sidecar, e.g.
+
+        @per_db
+        @derived()
+        def get_schema(db_path): ...
+
+    The producer version combines `version` with `package_version`, so entries computed by edited code are not
+    reused. Arguments must have a stable `repr`. Failures of the store only cost a recomputation.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(db_path, *args):
+            if not sidecar_enabled():
+                return func(db_path, *args)
+            key = f"{func.__module__}.{func.__qualname__}{args!r}"
+            producer_version = f"{version}:{package_version()}"
+            try:
+                sidecar = get_sidecar(db_path)
+                hit, value = sidecar.get(key, producer_version, ttl)
+            except (sqlite3.Error, OSError) as e:
+                warnings.warn(f"Sidecar read failed for {key}: {e!r}", RuntimeWarning)
+                return func(db_path, *args)
+            if hit:
+                return value
+            value = func(db_path, *args)
+            try:
+                sidecar.put(key, producer_version, value)
+            except (sqlite3.Error, OSError, pickle.PicklingError) as e:
+                warnings.warn(f"Sidecar write failed for {key}: {e!r}", RuntimeWarning)
+            return value
+        return wrapper
+    return decorator
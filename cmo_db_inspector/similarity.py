@@ -0,0 +1,272 @@
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import gradio as gr
+
+from .interfaces import DbPathProvider
+from .utils import connect
+from .db_manager import per_db
+from .sidecar import derived
+from .radar_table import get_radar_table, get_signature_table
+
+# "Find similar" over a normalized feature matrix per entity type, built once per DB. Features are z-scores (heavy
+# tailed figures on a log10 scale first, missing values at the mean), so distances are in standard deviations and every
+# feature weighs the same. Single lookups walk a k-d tree; the all-pairs batch uses blocked brute force instead, since
+# a BLAS matrix product beats a per-point traversal in NumPy.
+
+# kind -> (displayed column, log10 scale)
+feature_specs = {
+    "Aircraft": [("Agility", False), ("ClimbRate", False), ("WeightEmpty", True), ("WeightMax", True),
+                 ("Front (dBsm)", False), ("Side (dBsm)", False), ("Rear (dBsm)", False)],
+    "Radar": [("PeakPower (W)", True), ("HorizontalBeamwidth", True), ("VerticalBeamwidth", True), ("PRF", True),
+              ("Frequency (MHz)", True)],
+}
+
+def aircraft_features(db_path) -> pd.DataFrame:
+    """ID, Name and the raw Aircraft features, the RCS of each aspect averaged over the radar bands."""
+    with connect(db_path) as conn:
+        df = pd.DataFrame(conn.execute("SELECT ID, Name, Agility, ClimbRate, WeightEmpty, WeightMax FROM DataAircraft ORDER BY ID").fetchall(),
+                          columns=["ID", "Name", "Agility", "ClimbRate", "WeightEmpty", "WeightMax"])
+    signatures = get_signature_table(db_path)
+    row = pd.Index(signatures.ids).get_indexer(df["ID"])
+    for aspect in ["Front", "Side", "Rear"]:
+        arr = signatures.dbsm[aspect]
+        count = np.isfinite(arr).sum(axis=1)
+        dbsm = np.where(count > 0, np.nansum(arr, axis=1) / np.maximum(count, 1), np.nan)
+        df[f"{aspect} (dBsm)"] = np.where(row >= 0, dbsm[np.maximum(row, 0)], np.nan) if len(dbsm) else np.nan
+    return df
+
+def radar_features(db_path) -> pd.DataFrame:
+    radars = get_radar_table(db_path).df
+    return pd.DataFrame({
+        "ID": radars["ID"].astype(np.int64), "Name": radars["Name"],
+        "PeakPower (W)": radars["RadarPeakPower"], "HorizontalBeamwidth": radars["RadarHorizontalBeamwidth"],
+        "VerticalBeamwidth": radars["RadarVerticalBeamwidth"], "PRF": radars["RadarPRF"],
+        "Frequency (MHz)": radars["Frequency"] / 1e6,
+    }).reset_index(drop=True)
+
+feature_builders = {
+    "Aircraft": aircraft_features,
+    "Radar": radar_features,
+}
+
+def normalize(raw: pd.DataFrame, spec: list[tuple[str, bool]]) -> np.ndarray:
+    """z-scores of the spec columns, log10 first where asked (non-positive values are missing), missing values at 0."""
+    columns = []
+    for name, log in spec:
+        x = raw[name].to_numpy(dtype=np.float64)
+        if log:
+            x = np.log10(np.where(x > 0, x, np.nan))
+        known = x[np.isfinite(x)]
+        std = known.std() if len(known) else 0.0
+        z = (x - known.mean()) / std if std > 0 else np.zeros_like(x)
+        columns.append(np.where(np.isfinite(z), z, 0.0))
+    return np.stack(columns, axis=1) if columns else np.zeros((len(raw), 0))
+
+
+class KDTree:
+    """Static k-d tree over the rows of `points`: split at the median of the widest dimension down to `leaf_size`.
+    Leaves are scanned as one array operation, so large leaves cost less than the Python walk over small ones.
+
+    Nodes are parallel arrays: `start:end` range of `order`, children (-1 for a leaf) and the bounding box, which
+    prunes a subtree once its box is farther than the current k-th neighbour.
+    """
+    def __init__(self, points: np.ndarray, leaf_size=128):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.order = np.arange(len(self.points))
+        start, end, left, right, lo, hi = [], [], [], [], [], []
+
+        def add(s, e):
+            box = self.points[self.order[s:e]]
+            start.append(s); end.append(e); left.append(-1); right.append(-1)
+            lo.append(box.min(axis=0) if e > s else np.zeros(self.points.shape[1]))
+            hi.append(box.max(axis=0) if e > s else np.zeros(self.points.shape[1]))
+            return len(start) - 1
+
+        stack = [add(0, len(self.points))]
+        while stack:
+            node = stack.pop()
+            s, e = start[node], end[node]
+            if e - s <= leaf_size or self.points.shape[1] == 0:
+                continue
+            d = int(np.argmax(hi[node] - lo[node]))
+            if hi[node][d] <= lo[node][d]: # All points equal
+                continue
+            idx = self.order[s:e]
+            mid = (e - s) // 2
+            part = np.argpartition(self.points[idx, d], mid)
+            self.order[s:e] = idx[part]
+            left[node], right[node] = add(s, s + mid), add(s + mid, e)
+            stack += [left[node], right[node]]
+
+        self.start, self.end = np.array(start), np.array(end)
+        self.left, self.right = np.array(left), np.array(right)
+        self.lo, self.hi = np.array(lo), np.array(hi)
+
+    def query(self, x, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Row indexes and distances of the `k` nearest rows to `x`, nearest first."""
+        x = np.asarray(x, dtype=np.float64)
+        best_d2, best_rows = np.full(k, np.inf), np.full(k, -1, dtype=np.int64)
+        stack = [(0.0, 0)]
+        while stack:
+            bound, node = stack.pop()
+            if bound > best_d2.max():
+                continue
+            if self.left[node] < 0:
+                rows = self.order[self.start[node]:self.end[node]]
+                d2 = np.concatenate([best_d2, ((self.points[rows] - x) ** 2).sum(axis=1)])
+                rows = np.concatenate([best_rows, rows])
+                keep = np.argpartition(d2, k - 1)[:k]
+                best_d2, best_rows = d2[keep], rows[keep]
+                continue
+            children = [self.left[node], self.right[node]]
+            gap = np.maximum(self.lo[children] - x, 0) + np.maximum(x - self.hi[children], 0)
+            near, far = np.argsort((gap ** 2).sum(axis=1))
+            stack += [(float((gap[far] ** 2).sum()), children[far]), (float((gap[near] ** 2).sum()), children[near])]
+        order = np.argsort(best_d2)
+        found = np.isfinite(best_d2[order])
+        return best_rows[order][found], np.sqrt(best_d2[order][found])
+
+
+def blocked_knn(points: np.ndarray, k: int, block=1024) -> tuple[np.ndarray, np.ndarray]:
+    """k nearest other rows of every row, as (n, k) index and distance arrays, one block of rows at a time."""
+    n = len(points)
+    k = min(k, n - 1)
+    sq = (points ** 2).sum(axis=1)
+    indexes = np.zeros((n, max(k, 0)), dtype=np.int64)
+    distances = np.zeros((n, max(k, 0)))
+    if k <= 0:
+        return indexes, distances
+    for s in range(0, n, block):
+        e = min(s + block, n)
+        d2 = np.maximum(sq[s:e, None] + sq[None, :] - 2 * points[s:e] @ points.T, 0)
+        d2[np.arange(e - s), np.arange(s, e)] = np.inf # Not its own neighbour
+        part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        d_part = np.take_along_axis(d2, part, axis=1)
+        order = np.argsort(d_part, axis=1)
+        indexes[s:e] = np.take_along_axis(part, order, axis=1)
+        distances[s:e] = np.sqrt(np.take_along_axis(d_part, order, axis=1))
+    return indexes, distances
+
+
+class FeatureIndex:
+    """Raw and normalized features of every entity of a kind, with the k-d tree over them."""
+    def __init__(self, kind: str, raw: pd.DataFrame):
+        self.kind = kind
+        self.raw = raw.reset_index(drop=True)
+        self.ids = self.raw["ID"].to_numpy(dtype=np.int64)
+        self.features = normalize(self.raw, feature_specs[kind])
+        self.tree = KDTree(self.features)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, _id):
+        return bool((self.ids == int(_id)).any())
+
+    def neighbours(self, _id, k=10) -> pd.DataFrame:
+        """The `k` entities nearest to `_id` with their distance, nearest first."""
+        i = np.flatnonzero(self.ids == int(_id))
+        if len(i) == 0:
+            raise KeyError(_id)
+        rows, dist = self.tree.query(self.features[i[0]], min(k + 1, len(self)))
+        keep = rows != i[0]
+        df = self.raw.iloc[rows[keep][:k]].copy()
+        df.insert(2, "Distance", dist[keep][:k].round(3))
+        return df.reset_index(drop=True)
+
+    def all_neighbours(self, k=5) -> pd.DataFrame:
+        """Every (entity, neighbour) pair of the k-nearest-neighbour graph, for clustering reports."""
+        indexes, distances = blocked_knn(self.features, k)
+        rows = np.repeat(np.arange(len(self)), indexes.shape[1])
+        return pd.DataFrame({
+            "ID": self.ids[rows], "Name": self.raw["Name"].to_numpy()[rows], "Rank": np.tile(np.arange(1, indexes.shape[1] + 1), len(self)),
+            "Neighbour ID": self.ids[indexes.ravel()], "Neighbour": self.raw["Name"].to_numpy()[indexes.ravel()],
+            "Distance": distances.ravel().round(3),
+        })
+
+    def clusters(self, radius=0.5, k=5) -> pd.DataFrame:
+        """Connected components of the k-nearest-neighbour graph cut at `radius`, largest first (singletons left out)."""
+        indexes, distances = blocked_knn(self.features, k)
+        parent = np.arange(len(self))
+        def find(a):
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            return a
+        for a, b in zip(*np.nonzero(distances <= radius)):
+            ra, rb = find(a), find(indexes[a, b])
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+        roots = np.array([find(a) for a in range(len(self))])
+        df = pd.DataFrame({"Root": roots, "ID": self.ids, "Name": self.raw["Name"]})
+        groups = [g for _, g in df.groupby("Root") if len(g) > 1]
+        groups.sort(key=len, reverse=True)
+        return pd.DataFrame([{"Cluster": c + 1, "Size": len(g), "IDs": ", ".join(map(str, g["ID"])), "Members": ", ".join(g["Name"].astype(str))}
+                             for c, g in enumerate(groups)], columns=["Cluster", "Size", "IDs", "Members"])
+
+@per_db
+@derived()
+def get_feature_index(db_path, kind: str) -> FeatureIndex:
+    return FeatureIndex(kind, feature_builders[kind](db_path))
+
+
+class SimilarPanel:
+    """"Similar" accordion of an entity tab: the nearest entities to the selected one in the feature space of `kind`."""
+    def __init__(self, kind: str, db_path_provider: DbPathProvider):
+        self.kind = kind
+        self.db_path_provider = db_path_provider
+
+    def build(self):
+        with gr.Accordion("Similar", open=False):
+            with gr.Row():
+                self.k_number = gr.Number(10, label="Neighbours", precision=0)
+                self.find_button = gr.Button("Find")
+            self.table = gr.DataFrame([[]], label="Nearest", interactive=False)
+        return self
+
+    def bind(self, selected_id):
+        inputs = self.db_path_provider.get_db_inputs() | {selected_id, self.k_number}
+
+        def find(data):
+            if data[selected_id] is None:
+                raise gr.Error(f"Select a {self.kind.lower()} first")
+            return self.find(self.db_path_provider.get_db_path(data), data[selected_id], int(data[self.k_number]))
+
+        self.find_button.click(find, inputs, self.table, api_name=f"similar_{self.kind.lower()}")
+        return self
+
+    def find(self, db_path, _id, k):
+        t = time.perf_counter()
+        index = get_feature_index(db_path, self.kind)
+        if _id not in index:
+            raise gr.Error(f"#{_id} has none of the {self.kind} features")
+        df = index.neighbours(_id, max(k, 1))
+        ms = (time.perf_counter() - t) * 1000
+        return gr.update(value=df, label=f"Nearest (distance in standard deviations, {ms:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="All-pairs nearest neighbours and clusters of similar entities.")
+    parser.add_argument("db_path")
+    parser.add_argument("--kind", choices=list(feature_specs), default="Aircraft")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per entity")
+    parser.add_argument("--radius", type=float, default=0.5, help="Distance (standard deviations) linking a cluster")
+    parser.add_argument("--csv", help="Write the neighbour pairs to this CSV")
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    index = get_feature_index(args.db_path, args.kind)
+    pairs = index.all_neighbours(args.k)
+    clusters = index.clusters(args.radius, args.k)
+    print(f"{len(index)} {args.kind} entities, {len(pairs)} pairs, {len(clusters)} clusters in {time.perf_counter() - t:.2f} s")
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_colwidth", 120)
+    print(clusters.head(30).to_string(index=False))
+    if args.csv:
+        pairs.to_csv(args.csv, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .db_manager import db_fingerprint, connection_hooks, retire_db
+from .sidecar import module_version
+from .query_audit import registered_queries, recommend_indexes, open_connection, resolve_params
+
+# Slim snapshot of a CMO DB for small hosts: only the tables and columns the app reads, indexed for the lookups on
+# large tables and compacted, written next to the source as `<stem>.slim.db3`. The columns are found by tracing: the
+# producers and the registered statements run on the source with an SQLite authorizer recording every column read.
+#
+# Enum descriptions are not pre-joined: the app decodes codes with the in-memory `EnumRegistry`, so the Enum* tables
+# are kept as they are instead.
+
+slim_suffix = ".slim"
+info_table = "SnapshotInfo"
+# An index costs about the size of the link table it covers, and scanning a smaller table takes about 1 ms or less.
+index_min_rows = 20_000
+
+def slim_path(db_path) -> Path:
+    p = Path(db_path)
+    return p.with_name(f"{p.stem}{slim_suffix}{p.suffix}")
+
+def is_slim(db_path) -> bool:
+    return Path(db_path).stem.endswith(slim_suffix)
+
+def read_info(db_path) -> dict[str, str]:
+    """`SnapshotInfo` of a snapshot, empty for other DBs."""
+    conn = open_connection(db_path)
+    try:
+        return dict(conn.execute(f"SELECT Key, Value FROM {info_table}").fetchall())
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+def is_fresh(snapshot_path, source_path) -> bool:
+    """True if the snapshot was built from this version of the source."""
+    info = read_info(snapshot_path)
+    return info.get("source_fingerprint") == db_fingerprint(source_path)
+
+def prefer_snapshot(db_path, db_list: list[Path]) -> Path:
+    """The fresh slim snapshot of `db_path` if the list has one, else `db_path`."""
+    slim = slim_path(db_path)
+    if slim in db_list and is_fresh(slim, db_path):
+        return slim
+    return db_path
+
+
+def warm_producers(db_path):
+    """Build every per-DB producer (what a first session triggers), those taking arguments with their defaults in the
+    UI, skipping those the DB lacks the tables for."""
+    from .db_catalog import prewarm
+    from .frequency import get_frequency_catalog
+    from .radar_table import get_radar_table, get_signature_table
+    from .relations import get_relation_index
+    from .sonar import get_sonar_ranges
+    from .electronic_warfare import get_ew_kinds, get_ew_bands, get_intercept_matrix, get_burn_through_matrix
+    from .loadouts import get_aircraft_loadouts
+    from .performance import get_performance_table
+    from .force_packages import get_candidate_table
+    from .insights_tab import get_country_groups
+    from .stats_cube import get_stats_cube
+    from .non_escape_zone import get_weapon_airframes, get_impulse_scales
+    from .similarity import get_feature_index, feature_specs
+
+    calls = [(producer, ()) for producer in [
+        prewarm, get_frequency_catalog, get_radar_table, get_signature_table, get_relation_index, get_sonar_ranges,
+        get_ew_bands, get_ew_kinds, get_intercept_matrix, get_aircraft_loadouts, get_performance_table,
+        get_candidate_table, get_country_groups, get_stats_cube, get_weapon_airframes, get_impulse_scales]]
+    calls += [(get_burn_through_matrix, (0.0, 0.0))] + [(get_feature_index, (kind,)) for kind in feature_specs]
+    for producer, args in calls:
+        try:
+            producer(db_path, *args)
+        except Exception as e:
+            print(f"{producer.__name__} failed on {Path(db_path).name}: {e!r}")
+
+@contextmanager
+def sidecar_disabled():
+    previous = os.environ.get("CMO_DB_INSPECTOR_SIDECAR")
+    os.environ["CMO_DB_INSPECTOR_SIDECAR"] = "0"
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("CMO_DB_INSPECTOR_SIDECAR")
+        else:
+            os.environ["CMO_DB_INSPECTOR_SIDECAR"] = previous
+
+def trace_reads(db_path) -> dict[str, set[str]]:
+    """Table -> columns read by the producers and the registered statements. The in-memory entries of `db_path` are
+    dropped first and the sidecar is bypassed, so every producer runs its queries again even in a warm app."""
+    reads: dict[str, set[str]] = {}
+
+    def authorizer(action, table_name, column, db_name, trigger):
+        if action == sqlite3.SQLITE_READ and db_name == "main" and table_name and not table_name.startswith("sqlite_"):
+            columns = reads.setdefault(table_name, set())
+            if column:
+                columns.add(column)
+        return sqlite3.SQLITE_OK
+
+    def hook(_db_path, conn):
+        conn.set_authorizer(authorizer)
+
+    connection_hooks.append(hook)
+    retire_db(db_path, keep_current=False) # Producers built before, and connections opened before the hook, wouldn't be traced
+    try:
+        with sidecar_disabled():
+            warm_producers(db_path)
+    finally:
+        connection_hooks.remove(hook)
+
+    conn = open_connection(db_path)
+    conn.set_authorizer(authorizer)
+    try:
+        for spec in registered_queries():
+            if spec.name.startswith("Raw."): # `SELECT *`, the raw tabs project by schema and show what the snapshot has
+                continue
+            try:
+                conn.execute(spec.sql, resolve_params(conn, spec.params)).fetchall()
+            except sqlite3.Error: # A table the DB doesn't have
+                pass
+    finally:
+        conn.close()
+    return reads
+
+
+def copy_table(conn, table_name: str, columns: set[str]) -> list[str]:
+    """Create `slim.<table>` with the traced columns in their source order, keeping an INTEGER PRIMARY KEY."""
+    info = conn.execute(f"PRAGMA main.table_info([{table_name}])").fetchall() # cid, name, type, notnull, default, pk
+    kept = [r for r in info if r[1] in columns] or info[:1]
+    pk = [r[1] for r in info if r[5]]
+    defs = [f"[{name}] {decl_type}" + (" PRIMARY KEY" if pk == [name] and decl_type.upper() == "INTEGER" else "")
+            for _, name, decl_type, *_ in kept]
+    names = ", ".join(f"[{r[1]}]" for r in kept)
+    conn.execute(f"CREATE TABLE slim.[{table_name}] ({', '.join(defs)})")
+    conn.execute(f"INSERT INTO slim.[{table_name}] SELECT {names} FROM main.[{table_name}]")
+    return [r[1] for r in kept]
+
+def build_snapshot(db_path, out_path=None, precompute=True) -> Path:
+    """Write the slim snapshot of `db_path` and, if `precompute`, fill its sidecar caches."""
+    out = Path(out_path) if out_path is not None else slim_path(db_path)
+    reads = trace_reads(db_path)
+    indexes = recommend_indexes(db_path)
+
+    tmp = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = open_connection(db_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS slim", (str(tmp),))
+        kept = {table_name: copy_table(conn, table_name, columns) for table_name, columns in sorted(reads.items())}
+        for table_name, column_sets in indexes.items():
+            if table_name not in kept or conn.execute(f"SELECT COUNT(*) FROM slim.[{table_name}]").fetchone()[0] < index_min_rows:
+                continue
+            for columns in column_sets:
+                if set(columns) <= set(kept[table_name]):
+                    conn.execute(f"CREATE INDEX slim.[ix_{table_name}_{'_'.join(columns)}] ON [{table_name}] ({', '.join(f'[{c}]' for c in columns)})")
+        conn.execute(f"CREATE TABLE slim.{info_table} (Key TEXT PRIMARY KEY, Value TEXT)")
+        conn.executemany(f"INSERT INTO slim.{info_table} VALUES (?, ?)", [
+            ("source", Path(db_path).name),
+            ("source_fingerprint", db_fingerprint(db_path)),
+            ("version", module_version(__name__)),
+            ("created", time.strftime("%Y-%m-%dT%H:%M:%S")),
+        ])
+        conn.commit()
+        conn.execute("DETACH DATABASE slim")
+    finally:
+        conn.close()
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp, out)
+
+    if precompute:
+        warm_producers(out)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a slim read-only snapshot of a CMO DB for low-memory hosting.")
+    parser.add_argument("db_path")
+    parser.add_argument("--out", help="Snapshot path, default: <stem>.slim.db3 next to the source")
+    parser.add_argument("--no-precompute", action="store_true", help="Don't fill the derived caches of the snapshot")
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    out = build_snapshot(args.db_path, args.out, precompute=not args.no_precompute)
+    source_size, slim_size = Path(args.db_path).stat().st_size, out.stat().st_size
+    print(f"{out}: {slim_size / 2 ** 20:.1f} MiB ({slim_size / source_size:.0%} of {source_size / 2 ** 20:.1f} MiB) in {time.perf_counter() - t:.1f} s")
+
+if __name__ == "__main__":
+    main()
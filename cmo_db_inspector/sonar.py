@@ -0,0 +1,198 @@
+
+import numpy as np
+import pandas as pd
+import gradio as gr
+from dataclasses import dataclass
+
+from .utils import connect, nmi, skip_updates
+from .interfaces import DbPathProvider
+from .db_manager import per_db
+from .sidecar import derived
+from .schema import get_schema
+from .enums import get_enum_registry
+from .sonar_equation import ISonar, TargetClass, sonar_grid, target_classes, sea_states
+
+# Detection ranges of every sonar against every target class and sea state, from the `ISonar` model in one broadcast
+# of shape (sonar, class, sea state, mode). Sonar types are the `EnumSensorType` entries mentioning "Sonar", their
+# description tells whether the sonar transmits ("Passive-Only") or listens ("Active-Only").
+
+sonar_columns = ["ID", "Name", "Type", "SonarSourceLevel", "SonarDirectivityIndex", "SonarRecognitionDifferentialActive",
+                 "SonarRecognitionDifferentialPassive", "SonarMinimumFrequency", "SonarMaximumFrequency"]
+modes = ["Passive", "Active"]
+
+def centre_frequency_khz(f_min: np.ndarray, f_max: np.ndarray) -> np.ndarray:
+    """Geometric centre of the band (Hz) in kHz, the known edge if only one is given."""
+    f_min = np.where(f_min > 0, f_min, np.nan)
+    f_max = np.where(f_max > 0, f_max, np.nan)
+    centre = np.sqrt(f_min * f_max)
+    return np.where(np.isnan(centre), np.fmax(f_min, f_max), centre) / 1000
+
+class SonarTable(ISonar):
+    """Columnar `ISonar` over every sonar of a DB.
+
+    Properties have shape (n, 1, 1), so ranges broadcast against target classes and sea states.
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.df)
+
+    def column(self, name) -> np.ndarray:
+        return self.df[name].to_numpy(dtype=np.float64).reshape(-1, 1, 1)
+
+    @property
+    def source_level(self):
+        return self.column("SonarSourceLevel")
+
+    @property
+    def directivity_index(self):
+        return self.column("SonarDirectivityIndex")
+
+    @property
+    def recognition_differential_active(self):
+        return self.column("SonarRecognitionDifferentialActive")
+
+    @property
+    def recognition_differential_passive(self):
+        return self.column("SonarRecognitionDifferentialPassive")
+
+    @property
+    def frequency(self):
+        return self.column("Frequency")
+
+    @property
+    def active(self):
+        return self.df["Active"].to_numpy(dtype=bool).reshape(-1, 1, 1)
+
+    @property
+    def passive(self):
+        return self.df["Passive"].to_numpy(dtype=bool).reshape(-1, 1, 1)
+
+
+@per_db
+@derived()
+def get_sonar_table(db_path) -> SonarTable:
+    """Every sonar of the DB, empty if it lacks any of the columns the engine needs."""
+    enum = get_enum_registry(db_path)["EnumSensorType"]
+    types = {code: str(desc) for code, desc in zip(enum.ids.tolist(), enum.descriptions.tolist()) if "Sonar" in str(desc)}
+    df = pd.DataFrame(columns=sonar_columns)
+    if get_schema(db_path).project("DataSensor", sonar_columns) == sonar_columns and len(types) > 0:
+        with connect(db_path) as conn:
+            res = conn.execute(f"SELECT {', '.join(sonar_columns)} FROM DataSensor WHERE Type IN ({', '.join('?' * len(types))}) ORDER BY ID",
+                               list(types)).fetchall()
+        df = pd.DataFrame(res, columns=sonar_columns)
+    df["ID"] = df["ID"].astype(np.int64)
+    description = df["Type"].map(lambda t: types.get(int(t), "")).astype(str)
+    df["Active"] = ~description.str.contains("Passive-Only")
+    df["Passive"] = ~description.str.contains("Active-Only")
+    df["Frequency"] = centre_frequency_khz(df["SonarMinimumFrequency"].to_numpy(dtype=np.float64),
+                                           df["SonarMaximumFrequency"].to_numpy(dtype=np.float64))
+    return SonarTable(df)
+
+
+@dataclass
+class SonarRanges:
+    """Detection ranges (m) of sonars against target classes and sea states."""
+    sonar_ids: np.ndarray
+    sonar_names: list[str]
+    classes: list[TargetClass]
+    sea_states: list[int]
+    ranges: np.ndarray # float32 (n_sonar, n_class, n_sea_state, 2), passive then active, NaN where the mode is absent
+
+    def row(self, sonar_id) -> int:
+        pos = np.flatnonzero(self.sonar_ids == int(sonar_id))
+        return int(pos[0]) if len(pos) else -1
+
+    def sonar_frame(self, i: int, mode: int) -> pd.DataFrame:
+        """Target classes (rows) by sea states (columns) for one sonar, in nmi."""
+        values = np.round(self.ranges[i, :, :, mode].astype(np.float64) / 1000 / nmi, 1)
+        df = pd.DataFrame(values, columns=[f"SS {s}" for s in self.sea_states])
+        df.insert(0, "Target", [c.name for c in self.classes])
+        return df
+
+    def fleet_frame(self, class_index: int, sea_state_index: int) -> pd.DataFrame:
+        """Every sonar against one target class and sea state, in nmi."""
+        values = np.round(self.ranges[:, class_index, sea_state_index].astype(np.float64) / 1000 / nmi, 1)
+        df = pd.DataFrame({"ID": self.sonar_ids, "Name": self.sonar_names})
+        for j, mode in enumerate(modes):
+            df[f"{mode} (nmi)"] = values[:, j]
+        return df
+
+
+@per_db
+@derived()
+def get_sonar_ranges(db_path) -> SonarRanges:
+    table = get_sonar_table(db_path)
+    ranges = sonar_grid(table, target_classes, sea_states).reshape(len(table), len(target_classes), len(sea_states), len(modes))
+    return SonarRanges(table.df["ID"].to_numpy(), table.df["Name"].tolist(), target_classes, sea_states, ranges.astype(np.float32))
+
+def is_sonar(db_path, _id) -> bool:
+    return get_sonar_ranges(db_path).row(_id) >= 0
+
+
+class SonarTab:
+    def __init__(self, db_path_provider: DbPathProvider, limit=200):
+        self.db_path_provider = db_path_provider
+        self.limit = limit
+        self.name_to_component: dict[str, gr.components.Component] = {}
+
+    def build(self):
+        ui = self.name_to_component
+        class_names = [c.name for c in target_classes]
+        with gr.Row():
+            with gr.Column(scale=1):
+                ui["Name"] = gr.Text("", show_label=False)
+                ui["Modes"] = gr.Text("", label="Modes")
+                ui["Frequency"] = gr.Number(label="Centre Frequency (kHz)", interactive=False)
+                ui["target_class"] = gr.Dropdown(class_names, value=class_names[0], label="Target Class (all sonars)")
+                ui["sea_state"] = gr.Slider(sea_states[0], sea_states[-1], value=3, step=1, label="Sea State (all sonars)")
+                ui["update"] = gr.Button("Update")
+            with gr.Column(scale=4):
+                ui["passive"] = gr.DataFrame([[]], label="Passive Detection Range (nmi)", interactive=False)
+                ui["active"] = gr.DataFrame([[]], label="Active Detection Range (nmi)", interactive=False)
+                ui["sonars"] = gr.DataFrame([[]], label="All Sonars", interactive=False)
+        self.selected_id = gr.State(None)
+        return self
+
+    def bind(self):
+        ui = self.name_to_component
+        inputs = self.db_path_provider.get_db_inputs() | {self.selected_id, ui["target_class"], ui["sea_state"]}
+        outputs = {ui["Name"], ui["Modes"], ui["Frequency"], ui["passive"], ui["active"], ui["sonars"], self.selected_id}
+        ui["update"].click(lambda data: self.updates(data, data[self.selected_id]), inputs, outputs)
+        return self
+
+    def fleet(self, ranges: SonarRanges, data) -> pd.DataFrame:
+        ui = self.name_to_component
+        class_index = [c.name for c in ranges.classes].index(data[ui["target_class"]])
+        sea_state_index = ranges.sea_states.index(int(data[ui["sea_state"]]))
+        df = ranges.fleet_frame(class_index, sea_state_index)
+        return df.sort_values(["Passive (nmi)", "Active (nmi)"], ascending=False).head(self.limit)
+
+    def updates(self, data, _id):
+        ui = self.name_to_component
+        if _id is None:
+            return skip_updates([ui["sonars"]])
+        db_path = self.db_path_provider.get_db_path(data)
+        ranges = get_sonar_ranges(db_path)
+        i = ranges.row(_id)
+        if i < 0:
+            return {self.selected_id: None}
+
+        row = get_sonar_table(db_path).df.iloc[i]
+        return {
+            ui["Name"]: f"#{int(_id)} {ranges.sonar_names[i]}",
+            ui["Modes"]: ", ".join(m for m in modes if row[m]),
+            ui["Frequency"]: round(float(row["Frequency"]), 2),
+            ui["passive"]: ranges.sonar_frame(i, 0),
+            ui["active"]: ranges.sonar_frame(i, 1),
+            ui["sonars"]: self.fleet(ranges, data),
+            self.selected_id: int(_id)
+        }
+
+    def register_inputs(self, inputs: set):
+        inputs.update({self.name_to_component[name] for name in ["target_class", "sea_state"]})
+
+    def register_outputs(self, outputs: set):
+        ui = self.name_to_component
+        outputs.update({ui["Name"], ui["Modes"], ui["Frequency"], ui["passive"], ui["active"], ui["sonars"], self.selected_id})
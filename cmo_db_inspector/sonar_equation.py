@@ -0,0 +1,114 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Protocol, Union
+
+T = Union[np.ndarray, float]
+
+# Noise-limited sonar equations, in spectrum levels (dB re 1 µPa²/Hz) at the sonar's centre frequency, so the
+# processing bandwidth is folded into the recognition differential:
+#
+# - Passive: SL_target - TL - (NL - DI) >= RD_passive
+# - Active (monostatic): SL + TS - 2 TL - (NL - DI) >= RD_active
+#
+# TL is spherical spreading plus Thorp absorption and NL the Knudsen wind noise of the sea state.
+
+sea_states = [0, 1, 2, 3, 4, 5, 6]
+knudsen_1khz = np.array([44.5, 55.0, 61.5, 64.5, 66.5, 68.5, 70.0]) # Spectrum level at 1 kHz per sea state
+
+@dataclass
+class TargetClass:
+    name: str
+    radiated_noise: float # Spectrum level at 1 kHz, dB re 1 µPa²/Hz at 1 m
+    target_strength: float # dB
+
+target_classes = [
+    TargetClass("Quiet SSK (battery)", 105, 10),
+    TargetClass("Modern SSN", 115, 15),
+    TargetClass("Older SSN", 130, 20),
+    TargetClass("Surface Combatant", 140, 25),
+    TargetClass("Merchant", 155, 30),
+]
+
+def noise_level(frequency_khz: T, sea_state: T) -> T:
+    """Knudsen ambient noise spectrum level, -17 dB per decade from its 1 kHz value."""
+    level_1khz = knudsen_1khz[np.clip(np.asarray(sea_state, dtype=np.int64), 0, len(knudsen_1khz) - 1)]
+    return level_1khz - 17 * np.log10(frequency_khz)
+
+def radiated_noise(level_1khz: T, frequency_khz: T) -> T:
+    """Target broadband noise, falling 20 dB per decade above 1 kHz."""
+    return level_1khz - 20 * np.log10(frequency_khz)
+
+def absorption(frequency_khz: T) -> T:
+    """Thorp absorption in dB/km."""
+    f2 = np.asarray(frequency_khz) ** 2
+    return (0.11 * f2 / (1 + f2) + 44 * f2 / (4100 + f2) + 2.75e-4 * f2 + 0.003) * 1.0936
+
+def transmission_loss(range_m: T, frequency_khz: T) -> T:
+    return 20 * np.log10(np.maximum(range_m, 1)) + absorption(frequency_khz) * range_m / 1000
+
+def range_for_loss(max_loss: T, frequency_khz: T, r_max=1_000_000.0, iterations=48) -> T:
+    """Largest range (m) whose transmission loss stays within `max_loss`, by a bisection on log range carried out
+    on the whole broadcast array at once (TL grows monotonically with range)."""
+    max_loss, frequency_khz = np.broadcast_arrays(np.asarray(max_loss, dtype=np.float64), np.asarray(frequency_khz, dtype=np.float64))
+    lo = np.zeros(max_loss.shape)
+    hi = np.full(max_loss.shape, np.log(r_max))
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        within = transmission_loss(np.exp(mid), frequency_khz) <= max_loss
+        lo = np.where(within, mid, lo)
+        hi = np.where(within, hi, mid)
+    r = np.exp(lo)
+    return np.where(np.isnan(max_loss), np.nan, np.where(max_loss >= 0, r, 0.0))
+
+
+class ISonar(Protocol):
+    @property
+    def source_level(self) -> T:
+        ...
+
+    @property
+    def directivity_index(self) -> T:
+        ...
+
+    @property
+    def recognition_differential_active(self) -> T:
+        ...
+
+    @property
+    def recognition_differential_passive(self) -> T:
+        ...
+
+    @property
+    def frequency(self) -> T:
+        """Centre frequency in kHz."""
+        ...
+
+    @property
+    def active(self) -> T:
+        ...
+
+    @property
+    def passive(self) -> T:
+        ...
+
+    def passive_range(self, target_noise_1khz: T, sea_state: T) -> T:
+        f = self.frequency
+        max_loss = radiated_noise(target_noise_1khz, f) - noise_level(f, sea_state) + self.directivity_index - self.recognition_differential_passive
+        return np.where(self.passive, range_for_loss(max_loss, f), np.nan)
+
+    def active_range(self, target_strength: T, sea_state: T) -> T:
+        f = self.frequency
+        max_two_way = self.source_level + target_strength - noise_level(f, sea_state) + self.directivity_index - self.recognition_differential_active
+        return np.where(self.active, range_for_loss(max_two_way / 2, f), np.nan)
+
+
+def sonar_grid(sonar: ISonar, classes: list[TargetClass], states: list[int]) -> np.ndarray:
+    """(n_sonar, n_class, n_sea_state, 2) detection ranges (m), passive then active. `sonar` is a single sonar or a
+    columnar table whose properties have shape (n, 1, 1)."""
+    noise = np.array([c.radiated_noise for c in classes], dtype=np.float64).reshape(1, -1, 1)
+    strength = np.array([c.target_strength for c in classes], dtype=np.float64).reshape(1, -1, 1)
+    states = np.asarray(states).reshape(1, 1, -1)
+    passive = sonar.passive_range(noise, states)
+    active = sonar.active_range(strength, states)
+    shape = np.broadcast_shapes(np.shape(passive), np.shape(active))
+    return np.stack([np.broadcast_to(passive, shape), np.broadcast_to(active, shape)], axis=-1)
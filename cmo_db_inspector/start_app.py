@@ -5,8 +5,12 @@ from . import App
 
 parser = argparse.ArgumentParser()
 parser.add_argument("cmo_db_root", help=r"Location to store CMO database files, example: D:\SteamLibrary\steamapps\common\Command - Modern Operations\DB")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=7860)
+parser.add_argument("--no-api", action="store_true", help="Don't serve the JSON API under /data/v1")
+parser.add_argument("--concurrency", type=int, help="Enable the Gradio queue with this many workers")
 args = parser.parse_args()
 
 cmo_db_root = Path(args.cmo_db_root)
 app = App(cmo_db_root).create()
-app.demo.launch()
+app.serve(args.host, args.port, api=not args.no_api, concurrency=args.concurrency)
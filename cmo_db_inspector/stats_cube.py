@@ -0,0 +1,207 @@
+
+import hashlib
+import itertools
+import sqlite3
+import warnings
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .utils import connect
+from .db_manager import per_db, cache_root
+from .sidecar import derived, Sidecar, package_version, sidecar_enabled
+from .enums import get_enum_registry
+from .radar_table import get_radar_table, get_signature_table
+from .query_audit import open_connection
+
+# Group-by aggregates materialized once per DB: every subset of a part's dimensions (a CUBE) with count, mean and
+# percentiles of each measure. Percentiles don't roll up from coarser cells, so every grouping set is stored and a
+# query is a filter on the matching one.
+#
+# Parts are stored by the content digest of the tables they read, across DB versions, so a patch that only touches
+# sensors reuses the aircraft part and vice versa.
+
+percentiles = [0.1, 0.5, 0.9]
+unknown = "Unknown"
+
+@dataclass
+class CubePart:
+    name: str
+    dimensions: list[str]
+    measures: list[str]
+    cells: dict[frozenset, pd.DataFrame] # grouping set -> one row per group, "Count" and "<measure> <stat>" columns
+
+    def query(self, group_by: list[str], filters: Optional[dict] = None, measures: Optional[list[str]] = None) -> pd.DataFrame:
+        filters = filters or {}
+        unknown_dims = (set(group_by) | set(filters)) - set(self.dimensions)
+        if unknown_dims:
+            raise KeyError(f"Unknown dimensions of {self.name}: {sorted(unknown_dims)}")
+        df = self.cells[frozenset(group_by) | frozenset(filters)]
+        for dim, value in filters.items():
+            df = df[df[dim].astype(str) == str(value)]
+        measures = self.measures if measures is None else measures
+        columns = [f"{m} {stat}" for m in measures for stat in stat_names()]
+        return df[[*group_by, "Count", *columns]].reset_index(drop=True)
+
+
+def stat_names() -> list[str]:
+    return ["N", "Mean"] + [f"P{int(p * 100)}" for p in percentiles]
+
+def aggregate(facts: pd.DataFrame, dims: list[str], measures: list[str]) -> pd.DataFrame:
+    if len(dims) == 0:
+        facts = facts.assign(_all=0)
+        group_dims = ["_all"]
+    else:
+        group_dims = dims
+    grouped = facts.groupby(group_dims, dropna=False, sort=True)
+    out = grouped.size().rename("Count").to_frame()
+    for m in measures:
+        g = grouped[m]
+        out[f"{m} N"] = g.count()
+        out[f"{m} Mean"] = g.mean()
+        q = g.quantile(percentiles).unstack()
+        for p in percentiles:
+            out[f"{m} P{int(p * 100)}"] = q[p]
+    out = out.reset_index()
+    return out.drop(columns="_all") if len(dims) == 0 else out
+
+def build_part(name: str, facts: pd.DataFrame, dimensions: list[str], measures: list[str]) -> CubePart:
+    cells = {}
+    for r in range(len(dimensions) + 1):
+        for dims in itertools.combinations(dimensions, r):
+            cells[frozenset(dims)] = aggregate(facts, list(dims), measures)
+    return CubePart(name, dimensions, measures, cells)
+
+
+def decade(years) -> np.ndarray:
+    years = pd.to_numeric(pd.Series(years), errors="coerce").to_numpy(dtype=np.float64)
+    valid = np.isfinite(years) & (years > 1000)
+    out = np.full(len(years), unknown, dtype=object)
+    out[valid] = [f"{int(y) // 10 * 10}s" for y in years[valid]]
+    return out
+
+def aircraft_facts(db_path) -> tuple[pd.DataFrame, list[str], list[str]]:
+    from .insights_tab import get_country_groups
+
+    enums = get_enum_registry(db_path)
+    with connect(db_path) as conn:
+        df = pd.DataFrame(conn.execute("SELECT ID, OperatorCountry, YearCommissioned, Type, Agility FROM DataAircraft").fetchall(),
+                          columns=["ID", "OperatorCountry", "YearCommissioned", "Type", "Agility"])
+    facts = pd.DataFrame({
+        "Country": get_country_groups(db_path).decode(df["OperatorCountry"].to_numpy(), unknown),
+        "Decade": decade(df["YearCommissioned"]),
+        "Type": enums["EnumAircraftType"].decode(df["Type"].to_numpy(), unknown),
+        "Agility": df["Agility"].to_numpy(dtype=np.float64),
+    })
+    signatures = get_signature_table(db_path)
+    pos = signatures.positions(df["ID"])
+    measures = ["Agility"]
+    for j, desc in enumerate(signatures.descriptions):
+        name = f"RCS Front {desc.replace('Radar, ', '')} (dBsm)"
+        facts[name] = np.where(pos >= 0, signatures.dbsm["Front"][pos, j], np.nan)
+        measures.append(name)
+    return facts, ["Country", "Decade", "Type"], measures
+
+def sensor_facts(db_path) -> tuple[pd.DataFrame, list[str], list[str]]:
+    from .insights_tab import get_country_groups
+
+    enums = get_enum_registry(db_path)
+    with connect(db_path) as conn:
+        df = pd.DataFrame(conn.execute("SELECT ID, OperatorCountry, YearCommissioned, Type, Generation, RangeMax, RadarPeakPower FROM DataSensor").fetchall(),
+                          columns=["ID", "OperatorCountry", "YearCommissioned", "Type", "Generation", "RangeMax", "RadarPeakPower"])
+    radars = get_radar_table(db_path)
+    range_km = pd.Series(radars.detection_ranges([0])[:, 0] / 1000, index=radars.df["ID"].to_numpy())
+    facts = pd.DataFrame({
+        "Country": get_country_groups(db_path).decode(df["OperatorCountry"].to_numpy(), unknown),
+        "Decade": decade(df["YearCommissioned"]),
+        "Type": enums["EnumSensorType"].decode(df["Type"].to_numpy(), unknown),
+        "Generation": enums["EnumSensorGeneration"].decode(df["Generation"].to_numpy(), unknown),
+        "RangeMax (nmi)": df["RangeMax"].to_numpy(dtype=np.float64),
+        "RadarPeakPower (W)": df["RadarPeakPower"].where(df["RadarPeakPower"] > 0).to_numpy(dtype=np.float64),
+        "Radar Range 0 dBsm (km)": range_km.reindex(df["ID"].to_numpy()).to_numpy(),
+    })
+    return facts, ["Country", "Decade", "Type", "Generation"], ["RangeMax (nmi)", "RadarPeakPower (W)", "Radar Range 0 dBsm (km)"]
+
+@dataclass
+class PartSpec:
+    facts: Callable
+    tables: list[str] # Every table the facts read, directly or through other producers
+
+part_specs = {
+    "Aircraft": PartSpec(aircraft_facts, ["DataAircraft", "DataAircraftSignatures", "EnumOperatorCountry", "EnumAircraftType", "EnumSignatureType"]),
+    "Sensor": PartSpec(sensor_facts, ["DataSensor", "DataSensorFrequencySearchAndTrack", "EnumSensorFrequency", "EnumOperatorCountry",
+                                      "EnumSensorType", "EnumSensorGeneration"]),
+}
+
+def table_digest(conn, table_name: str, batch=4096) -> str:
+    # `main.` skips the TEMP views of the index sidecar, which have no rowid, so the scan order is the table's own.
+    h = hashlib.sha1(table_name.encode())
+    cur = conn.execute(f"SELECT * FROM main.[{table_name}] ORDER BY rowid")
+    while rows := cur.fetchmany(batch):
+        h.update(repr(rows).encode())
+    return h.hexdigest()
+
+def get_part_store() -> Sidecar:
+    """Content-addressed store shared by every DB version (entries don't depend on a DB fingerprint)."""
+    root = cache_root()
+    root.mkdir(parents=True, exist_ok=True)
+    return Sidecar(root / "stats_cube.sqlite", fingerprint="content")
+
+
+def load_part(store: Optional[Sidecar], key: str, version: str) -> tuple[bool, Optional[CubePart]]:
+    if store is None:
+        return False, None
+    try:
+        return store.get(key, version)
+    except (sqlite3.Error, OSError) as e:
+        warnings.warn(f"Cube part read failed for {key}: {e!r}", RuntimeWarning)
+        return False, None
+
+def save_part(store: Optional[Sidecar], key: str, version: str, part: CubePart):
+    if store is None:
+        return
+    try:
+        store.put(key, version, part)
+    except (sqlite3.Error, OSError) as e:
+        warnings.warn(f"Cube part write failed for {key}: {e!r}", RuntimeWarning)
+
+
+class StatsCube:
+    def __init__(self, parts: dict[str, CubePart], reused: list[str]):
+        self.parts = parts
+        self.reused = reused # Parts taken from an earlier DB version
+
+    def __getitem__(self, name) -> CubePart:
+        return self.parts[name]
+
+    def query(self, part: str, group_by: list[str], filters: Optional[dict] = None, measures: Optional[list[str]] = None) -> pd.DataFrame:
+        return self.parts[part].query(group_by, filters, measures)
+
+
+@per_db
+@derived()
+def get_stats_cube(db_path) -> StatsCube:
+    store = get_part_store() if sidecar_enabled() else None
+    version = package_version() # Facts also come from `insights_tab.country_map`, `radar_table`, ...
+    parts, reused = {}, []
+    # A private connection: digests hash every column, which the snapshot tracer (hooked on pooled connections)
+    # must not take for columns the app reads.
+    conn = open_connection(db_path)
+    try:
+        digests = {name: hashlib.sha1("".join(table_digest(conn, t) for t in spec.tables).encode()).hexdigest()
+                   for name, spec in part_specs.items()}
+    finally:
+        conn.close()
+    for name, spec in part_specs.items():
+        key = f"{name}:{digests[name]}"
+        hit, part = load_part(store, key, version)
+        if hit:
+            reused.append(name)
+        else:
+            facts, dimensions, measures = spec.facts(db_path)
+            part = build_part(name, facts, dimensions, measures)
+            save_part(store, key, version, part)
+        parts[name] = part
+    return StatsCube(parts, reused)
@@ -1,9 +1,12 @@
 
 from contextlib import contextmanager
+import itertools
 import sqlite3
 import gradio as gr
 from typing import Optional
 
+from .db_manager import get_pool
+
 light_speed = 300_000_000 # 300_000_000 m/s
 nmi = 1.852 # 1 nmi = 1.852 km
 
@@ -13,15 +16,25 @@ def inv_db(x):
 def chunks(arr, size):
     return (arr[idx:idx+size] for idx in range(0, len(arr), size))
 
+def batched(iterable, size):
+    """Lists of `size` items from any iterable, unlike `chunks` which slices a sequence."""
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
 def show(df):
     from IPython.display import display, HTML
     return display(HTML(df.to_html()))
 
 @contextmanager
 def connect(db_path):
-    conn = sqlite3.connect(db_path)
-    yield conn
-    conn.close()
+    """Borrow a pooled read-only connection to a CMO DB."""
+    pool = get_pool(db_path)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
 
 def text_grid(indexes, elements_per_row: int, info_map=None, value_map=None, value_list=None):
     info_map = {} if info_map is None else info_map
@@ -67,3 +80,19 @@ def add_text_rows(binding: dict, name_list: list[str]):
     with gr.Row():
         for name in name_list:
             binding[name] = gr.Text("", label=name)
+
+def same_value(a, b) -> bool:
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError): # Array-likes compare elementwise
+        return False
+
+def delta_updates(last_values: Optional[dict], values: dict):
+    """Split `values` into the entries which differ from `last_values` and the merged new `last_values`."""
+    last_values = {} if last_values is None else last_values
+    changed = {k: v for k, v in values.items() if k not in last_values or not same_value(last_values[k], v)}
+    return changed, {**last_values, **values}
+
+def skip_updates(components) -> dict:
+    """Leave `components` untouched. A handler with several outputs can't return `{}`, Gradio counts the values."""
+    return {component: gr.update() for component in components}